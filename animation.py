@@ -0,0 +1,115 @@
+"""
+Анимация застройки по готовому городу.
+
+Дома берутся из CityLayout в порядке генерации — заново они не считаются, поэтому анимация
+показывает ровно тот город, что получился при том же сиде. Дороги, узлы и парк рисуются один раз
+как фон; дома — одна коллекция, в которую каждый кадр добавляется houses_per_frame путей
+(пути Path строятся заранее, кадр только продлевает срез). При показе на экране кадры блитятся,
+при сохранении в MP4/GIF используется холст Agg без окна.
+"""
+from typing import List, Optional
+
+import numpy as np
+import shapely
+
+from .models import CityLayout
+from .render import HOUSE_COLOR, NODE_COLOR, PARK_COLOR, ROAD_COLOR, layout_houses, layout_nodes, split_coords
+
+
+class CityAnimation:
+    def __init__(self, layout: CityLayout, houses_per_frame: int = 20, interval: int = 20):
+        if houses_per_frame < 1:
+            raise ValueError("houses_per_frame должно быть не меньше 1")
+        self.layout = layout
+        self.houses_per_frame = houses_per_frame
+        self.interval = interval
+        self._paths = None
+
+    @property
+    def paths(self) -> List:
+        """
+        Пути всех домов в порядке генерации.
+        """
+        if self._paths is None:
+            from matplotlib.path import Path
+
+            rings = shapely.get_exterior_ring(layout_houses(self.layout))
+            self._paths = [Path(coords, closed=True) for coords in split_coords(rings)]
+        return self._paths
+
+    @property
+    def n_frames(self) -> int:
+        return -(-len(self.paths) // self.houses_per_frame) + 1
+
+    def _draw_background(self, ax) -> None:
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        layout = self.layout
+        ax.set_aspect("equal")
+        roads = np.asarray(list(layout.all_roads), dtype=object)
+        if not layout.park_polygon.is_empty:
+            park = np.asarray([layout.park_polygon.exterior], dtype=object)
+            ax.add_collection(PolyCollection(split_coords(park), facecolors=PARK_COLOR, edgecolors=ROAD_COLOR, linewidths=2, alpha=0.7, zorder=1))
+        ax.add_collection(LineCollection(split_coords(roads), colors=ROAD_COLOR, linewidths=1, zorder=3))
+        points = layout_nodes(layout)
+        ax.scatter(points[:, 0], points[:, 1], color=NODE_COLOR, s=10, zorder=4)
+
+        xmin, ymin, xmax, ymax = shapely.total_bounds(roads)
+        pad = 0.02 * max(xmax - xmin, ymax - ymin)
+        ax.set_xlim(xmin - pad, xmax + pad)
+        ax.set_ylim(ymin - pad, ymax + pad)
+
+    def build(self, fig, blit: bool):
+        """
+        FuncAnimation на фигуре fig: кадр k показывает первые k * houses_per_frame домов.
+        """
+        from matplotlib.animation import FuncAnimation
+        from matplotlib.collections import PathCollection
+
+        ax = fig.add_subplot()
+        self._draw_background(ax)
+        houses = PathCollection([], facecolors=HOUSE_COLOR, edgecolors=ROAD_COLOR, linewidths=1, zorder=2, animated=blit)
+        ax.add_collection(houses, autolim=False)
+        paths = self.paths
+
+        def init():
+            houses.set_paths([])
+            return (houses,)
+
+        def update(frame: int):
+            houses.set_paths(paths[:frame * self.houses_per_frame])
+            return (houses,)
+
+        return FuncAnimation(
+            fig,
+            update,
+            frames=self.n_frames,
+            init_func=init,
+            interval=self.interval,
+            blit=blit,
+            repeat=False,
+        )
+
+    def show(self, size: float = 10) -> None:
+        import matplotlib.pyplot as plt
+
+        fig = plt.figure(figsize=(size, size))
+        _animation = self.build(fig, blit=True)
+        plt.show()
+
+    def save(self, path: str, fps: int = 30, size: float = 10, dpi: int = 100, writer: Optional[str] = None) -> None:
+        """
+        Сохраняет анимацию в файл без окна: .gif — через Pillow, остальное (.mp4) — через ffmpeg.
+        """
+        from matplotlib.animation import writers
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        if writer is None:
+            writer = "pillow" if path.lower().endswith(".gif") else "ffmpeg"
+        if not writers.is_available(writer):
+            raise RuntimeError(f"средство записи анимации {writer!r} недоступно")
+
+        fig = Figure(figsize=(size, size), dpi=dpi)
+        FigureCanvasAgg(fig)
+        self.build(fig, blit=False).save(path, writer=writer, fps=fps, dpi=dpi)
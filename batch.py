@@ -0,0 +1,207 @@
+"""
+Пакетная генерация городов без отрисовки.
+
+Запуск: python -m citygen.batch --count N --seed S --workers W --out DIR
+
+Каждый город считается в отдельном процессе и сразу пишется на диск воркером,
+в главный процесс возвращаются только метаданные — память не растёт с числом городов.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from .config import CityConfig
+from .export import write_binary, write_geojson, write_geojson_stream
+from .generate import CityGenerator
+from .models import StreamedBlock
+from .render import StreamRenderer, render_layout
+from .rng import SeedTree
+
+# формат -> расширение файла
+FORMATS = {"pickle": "pkl", "geojson": "geojson", "binary": "npz"}
+
+# миниатюры: 4 дюйма при 64 dpi — 256x256 пикселей
+THUMBNAIL_SIZE = 4
+THUMBNAIL_DPI = 64
+
+
+@dataclass
+class CityRecord:
+    index: int
+    seed: int
+    path: str
+    seconds: float
+    houses: int
+
+
+def _write_atomic(path: str, layout, fmt: str) -> None:
+    # np.savez сам дописывает .npz, поэтому временное имя сохраняет расширение
+    root, ext = os.path.splitext(path)
+    tmp_path = root + ".tmp" + ext
+    if fmt == "geojson":
+        write_geojson(layout, tmp_path)
+    elif fmt == "binary":
+        write_binary(layout, tmp_path)
+    else:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(layout, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _tap(blocks: Iterable[StreamedBlock], renderer: Optional[StreamRenderer], counts: Dict[str, int]) -> Iterator[StreamedBlock]:
+    # один проход по потоку кормит и файл, и миниатюру
+    for item in blocks:
+        counts["houses"] += len(item.block.houses)
+        if renderer is not None:
+            renderer.add(item)
+        yield item
+
+
+def _write_stream(config: CityConfig, seed: int, path: str, thumbnail_path: Optional[str]) -> int:
+    """
+    Город потоком кварталов прямо в GeoJSON: в памяти только текущий столбец плана. Возвращает число домов.
+    """
+    renderer = StreamRenderer() if thumbnail_path else None
+    counts = {"houses": 0}
+    root, ext = os.path.splitext(path)
+    write_geojson_stream(_tap(CityGenerator(config, seed=seed).iter_blocks(), renderer, counts), root + ".tmp" + ext)
+    os.replace(root + ".tmp" + ext, path)
+    if renderer is not None:
+        renderer.save(thumbnail_path + ".tmp", size=THUMBNAIL_SIZE, dpi=THUMBNAIL_DPI, fmt="png")
+        os.replace(thumbnail_path + ".tmp", thumbnail_path)
+    return counts["houses"]
+
+
+def generate_city(
+    config: CityConfig,
+    index: int,
+    seed: int,
+    out_dir: str,
+    fmt: str = "pickle",
+    thumbnail: bool = False,
+    stream: bool = False,
+) -> CityRecord:
+    """
+    Задача воркера: сгенерировать город и записать его в out_dir (и миниатюру рядом, если thumbnail).
+    stream — писать кварталы по мере готовности (только geojson; парк в файл не попадает).
+    """
+    start = time.perf_counter()
+    path = os.path.join(out_dir, f"city_{index:06d}.{FORMATS[fmt]}")
+    thumbnail_path = os.path.join(out_dir, f"city_{index:06d}.png") if thumbnail else None
+    if stream:
+        houses = _write_stream(config, seed, path, thumbnail_path)
+    else:
+        layout = CityGenerator(config, seed=seed).generate()
+        _write_atomic(path, layout, fmt)
+        if thumbnail_path:
+            render_layout(layout, thumbnail_path + ".tmp", size=THUMBNAIL_SIZE, dpi=THUMBNAIL_DPI, fmt="png")
+            os.replace(thumbnail_path + ".tmp", thumbnail_path)
+        houses = sum(len(block.houses) for block in layout.blocks)
+    seconds = time.perf_counter() - start
+    return CityRecord(
+        index=index,
+        seed=seed,
+        path=path,
+        seconds=seconds,
+        houses=houses,
+    )
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Перцентиль q (0..100) по методу ближайшего ранга.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_batch(
+    count: int,
+    seed: int,
+    workers: int,
+    out_dir: str,
+    config: Optional[CityConfig] = None,
+    report_every: int = 100,
+    fmt: str = "pickle",
+    thumbnails: bool = False,
+    stream: bool = False,
+) -> List[float]:
+    """
+    Генерирует count городов в пуле из workers процессов.
+    Город i получает сид, порождённый из seed и i, поэтому любой город набора воспроизводится отдельно.
+    Возвращает время генерации каждого города в секундах.
+    """
+    config = config or CityConfig(SHOW_LOCAL=False)
+    if stream and fmt != "geojson":
+        raise ValueError("потоковая запись поддерживается только для geojson")
+    os.makedirs(out_dir, exist_ok=True)
+    seeds = SeedTree(seed)
+    latencies: List[float] = []
+
+    # Ограничиваем число задач в полёте, чтобы не держать в очереди весь набор сразу
+    max_in_flight = max(1, workers) * 2
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(os.path.join(out_dir, "manifest.jsonl"), "a", encoding="utf-8") as manifest:
+        pending: Set[Future] = set()
+        next_index = 0
+        while next_index < count or pending:
+            while next_index < count and len(pending) < max_in_flight:
+                pending.add(pool.submit(generate_city, config, next_index, seeds.child_seed(next_index), out_dir, fmt, thumbnails, stream))
+                next_index += 1
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                latencies.append(record.seconds)
+                manifest.write(json.dumps(asdict(record)) + "\n")
+                if report_every and len(latencies) % report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"{len(latencies)}/{count} городов, {len(latencies) / elapsed:.2f} городов/с", flush=True)
+
+    elapsed = time.perf_counter() - start
+    _print_summary(latencies, elapsed)
+    return latencies
+
+
+def _print_summary(latencies: List[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    stats: Dict[str, float] = {
+        "cities": len(ordered),
+        "seconds": elapsed,
+        "cities_per_sec": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+    print(
+        f"готово: {stats['cities']} городов за {stats['seconds']:.2f} с, "
+        f"{stats['cities_per_sec']:.2f} городов/с, "
+        f"p50 {stats['p50_ms']:.1f} мс, p99 {stats['p99_ms']:.1f} мс"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, required=True, help="сколько городов сгенерировать")
+    parser.add_argument("--seed", type=int, default=0, help="базовый сид набора")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--out", required=True, help="каталог для результатов")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="pickle", help="формат файлов городов")
+    parser.add_argument("--thumbnails", action="store_true", help="рисовать PNG-миниатюру каждого города")
+    parser.add_argument("--stream", action="store_true", help="писать кварталы по мере готовности (только geojson)")
+    args = parser.parse_args(argv)
+    if args.stream and args.format != "geojson":
+        parser.error("--stream работает только с --format geojson")
+
+    run_batch(args.count, args.seed, args.workers, args.out, fmt=args.format, thumbnails=args.thumbnails, stream=args.stream)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,821 @@
+"""
+Бенчмарки генератора.
+
+Запуск: python -m citygen.bench <имя> [параметры]
+
+python -m citygen.bench suite --out base.json — замер всех этапов; с --compare base.json сравнивает
+с прошлым запуском и завершается с кодом 1 при замедлении или сложности выше допустимой.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Polygon
+
+from . import __version__
+from .branches import generate_branches
+from .cells import CellGrid
+from .city_border import get_city_border
+from .config import CityConfig
+from .export import read_binary, write_binary, write_geojson
+from .generate import CityGenerator
+from .generate_node import NodeGenerator
+from .graph import RoadGraph
+from .houses import HouseGenerator
+from .models import CitySkeleton, CompactCityLayout, Point2D
+from .park import _rejection_points, generate_park_polygon, random_point_in_polygon, sample_points
+from .profiling import NULL_PROFILER, Profiler
+from .render import render_layout
+from .roads import RoadBuilder
+from .spatial import GridIndex
+
+
+class _BruteForceHouseGenerator(HouseGenerator):
+    """
+    Эталон со старой квадратичной проверкой: каждый кандидат сравнивается со всеми домами квартала.
+    """
+
+    def _is_free(self, house: Polygon, index: GridIndex, spacing: float) -> bool:
+        return all(house.distance(h) > spacing for h in index.items)
+
+
+def fit_exponent(sizes: Sequence[float], times: Sequence[float]) -> float:
+    """
+    Показатель k в t ~ n^k по методу наименьших квадратов в лог-лог масштабе.
+    """
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    num = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    den = sum((x - mx) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+def _square_district(config: CityConfig, size: int, seed: int) -> List[List[Point2D]]:
+    random.seed(seed)
+    node_generator = NodeGenerator(config)
+    top = node_generator.generate_main_street_nodes(size + 1)
+    return node_generator.generate_block_nodes_from_road_down(top, rows=size)
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_houses(sizes: Sequence[int], seed: int) -> None:
+    """
+    Масштабирование HouseGenerator.generate_houses по числу домов в квартале:
+    индекс по сетке против полного перебора.
+    """
+    config = CityConfig(SHOW_LOCAL=False)
+    generators: Dict[str, HouseGenerator] = {
+        "grid-index": HouseGenerator(config),
+        "brute-force": _BruteForceHouseGenerator(config),
+    }
+    counts: List[int] = []
+    timings: Dict[str, List[float]] = {name: [] for name in generators}
+
+    print(f"{'cells':>7} {'houses':>8} " + " ".join(f"{name:>13}" for name in generators))
+    for size in sizes:
+        nodes = _square_district(config, size, seed)
+        results = {}
+        for name, generator in generators.items():
+            random.seed(seed)
+            start = time.perf_counter()
+            results[name] = generator.generate_houses(nodes, config.CELL, [])
+            timings[name].append(time.perf_counter() - start)
+
+        reference = results["brute-force"]
+        assert all(len(houses) == len(reference) for houses in results.values())
+        assert all(a.equals_exact(b, 0.0) for a, b in zip(results["grid-index"], reference)), \
+            "индекс изменил результат генерации"
+
+        counts.append(len(reference))
+        print(f"{size * size:>7} {len(reference):>8} " + " ".join(f"{timings[name][-1]:>12.3f}s" for name in generators))
+
+    for name in generators:
+        print(f"{name}: t ~ n^{fit_exponent(counts, timings[name]):.2f}")
+
+
+def bench_roadside(sizes: Sequence[int], seed: int) -> None:
+    """
+    Скалярный и векторизованный движки придорожных домов на одной сетке.
+    """
+    engines = ("scalar", "vectorized")
+    generators = {engine: HouseGenerator(CityConfig(SHOW_LOCAL=False, HOUSE_ENGINE=engine)) for engine in engines}
+
+    print(f"{'cells':>7} {'houses':>8} {'scalar':>10} {'vectorized':>11} {'speedup':>8} {'max |dxy|':>10}")
+    for size in sizes:
+        nodes = _square_district(CityConfig(), size, seed)
+        timings = {}
+        results = {}
+        for engine, generator in generators.items():
+            start = time.perf_counter()
+            _cells, results[engine] = generator.generate_roadside_houses(nodes, CityConfig.CELL)
+            timings[engine] = time.perf_counter() - start
+
+        scalar = [h for cell in results["scalar"] for h in cell]
+        vectorized = [h for cell in results["vectorized"] for h in cell]
+        assert len(scalar) == len(vectorized)
+        error = max((abs(shapely.get_coordinates(a) - shapely.get_coordinates(b)).max() for a, b in zip(scalar, vectorized)), default=0.0)
+        print(
+            f"{size * size:>7} {len(scalar):>8} {timings['scalar']:>9.3f}s {timings['vectorized']:>10.3f}s "
+            f"{timings['scalar'] / timings['vectorized']:>7.1f}x {error:>10.1e}"
+        )
+
+
+def bench_parallel(workers: Sequence[int], n_blocks: int, block_size: int, executor: str, seed: int) -> None:
+    """
+    Масштабирование CityGenerator.finalize_blocks по числу воркеров на каркасе из n_blocks кварталов.
+    """
+    config = CityConfig(SHOW_LOCAL=False)
+    skeleton = CitySkeleton(
+        streets=[],
+        park_polygon=Polygon(),
+        blocks=[(block_id, _square_district(config, block_size, seed + block_id)) for block_id in range(n_blocks)],
+    )
+    print(f"cpu: {os.cpu_count()}, кварталов: {n_blocks}, ячеек в квартале: {block_size * block_size}, executor: {executor}")
+    print(f"{'workers':>8} {'time':>9} {'speedup':>8} {'efficiency':>11}")
+
+    reference = None
+    baseline = None
+    for n_workers in workers:
+        generator = CityGenerator(CityConfig(SHOW_LOCAL=False, WORKERS=n_workers, EXECUTOR=executor), seed=seed)
+        start = time.perf_counter()
+        blocks = generator.finalize_blocks(skeleton)
+        elapsed = time.perf_counter() - start
+
+        houses = [shapely.to_wkb(h) for block in blocks for h in block.houses]
+        if reference is None:
+            reference, baseline = houses, elapsed
+        assert houses == reference, "параллельный запуск изменил результат"
+        print(f"{n_workers:>8} {elapsed:>8.3f}s {baseline / elapsed:>7.2f}x {baseline / elapsed / n_workers:>10.0%}")
+
+
+def bench_export(count: int, seed: int) -> None:
+    """
+    Размер, время записи и чтения GeoJSON и бинарного формата на наборе из count городов.
+    """
+    layouts = [CityGenerator(CityConfig(SHOW_LOCAL=False), seed=seed + i).generate() for i in range(count)]
+
+    def read_geojson(path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            shapely.from_geojson([json.dumps(feature["geometry"]) for feature in json.load(f)["features"]])
+
+    formats = {
+        "geojson": ("geojson", write_geojson, read_geojson),
+        "binary": ("npz", write_binary, read_binary),
+    }
+    print(f"городов: {count}")
+    print(f"{'format':>8} {'size':>10} {'write':>9} {'read':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (ext, write, read) in formats.items():
+            paths = [os.path.join(tmp, f"city_{i}.{ext}") for i in range(count)]
+            write_time = _timed(lambda: [write(layout, path) for layout, path in zip(layouts, paths)])
+            read_time = _timed(lambda: [read(path) for path in paths])
+            size = sum(os.path.getsize(path) for path in paths)
+            print(f"{name:>8} {size / 1e6:>8.2f}MB {write_time:>8.3f}s {read_time:>8.3f}s")
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _loaded_size(blobs: List[bytes]) -> Tuple[int, int]:
+    """
+    Прирост RSS и памяти Python-объектов (tracemalloc) после загрузки городов.
+    Выполняется в отдельном процессе, чтобы замеры не мешали друг другу.
+    """
+    gc.collect()
+    tracemalloc.start()
+    rss_before = _rss_bytes()
+    layouts = [pickle.loads(blob) for blob in blobs]
+    rss = _rss_bytes() - rss_before
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del layouts
+    return rss, traced
+
+
+def bench_memory(count: int, seed: int) -> None:
+    """
+    Память на город: CityLayout против CompactCityLayout.
+    RSS учитывает и память GEOS, tracemalloc — только объекты Python.
+    """
+    layouts = [CityGenerator(CityConfig(SHOW_LOCAL=False), seed=seed + i).generate() for i in range(count)]
+    variants = {
+        "CityLayout": [pickle.dumps(layout) for layout in layouts],
+        "CompactCityLayout": [pickle.dumps(CompactCityLayout.from_layout(layout)) for layout in layouts],
+    }
+    print(f"городов: {count}")
+    print(f"{'layout':>18} {'RSS/city':>10} {'python/city':>12}")
+    for name, blobs in variants.items():
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            rss, traced = pool.submit(_loaded_size, blobs).result()
+        print(f"{name:>18} {rss / count / 1024:>8.1f}KB {traced / count / 1024:>10.1f}KB")
+
+
+def bench_nodes(sizes: Sequence[int], seed: int) -> None:
+    """
+    Синтез сетки узлов size x size: скалярный NodeGenerator против *_array-методов.
+    """
+    config = CityConfig()
+    print(f"{'nodes':>9} {'scalar':>10} {'array':>10} {'speedup':>8}")
+    for size in sizes:
+        node_generator = NodeGenerator(config, random.Random(seed))
+        top = node_generator.generate_main_street_nodes_array(size)
+        top_rows = [tuple(point) for point in top.tolist()]
+        scalar = _timed(lambda: node_generator.generate_block_nodes_from_road_down(top_rows, rows=size - 1))
+        array = _timed(lambda: node_generator.generate_block_nodes_from_road_down_array(top, rows=size - 1))
+        print(f"{size * size:>9} {scalar:>9.4f}s {array:>9.4f}s {scalar / array:>7.1f}x")
+
+
+def bench_topology(blocks_per_street: Sequence[int], n_streets: int, seed: int) -> None:
+    """
+    Время генерации плана "tiled" в зависимости от числа кварталов; ожидается t ~ n^1.
+    """
+    counts: List[int] = []
+    timings: List[float] = []
+    print(f"{'blocks':>7} {'houses':>9} {'roads':>8} {'time':>9} {'ms/block':>9}")
+    for per_street in blocks_per_street:
+        config = CityConfig(
+            SHOW_LOCAL=False,
+            TOPOLOGY="tiled",
+            N_STREETS=n_streets,
+            BLOCKS_PER_STREET=per_street,
+            HOUSE_ENGINE="vectorized",
+        )
+        start = time.perf_counter()
+        layout = CityGenerator(config, seed=seed).generate()
+        elapsed = time.perf_counter() - start
+
+        n_blocks = len(layout.blocks)
+        counts.append(n_blocks)
+        timings.append(elapsed)
+        houses = sum(len(block.houses) for block in layout.blocks)
+        print(f"{n_blocks:>7} {houses:>9} {len(layout.all_roads):>8} {elapsed:>8.3f}s {elapsed / n_blocks * 1000:>8.1f}")
+    print(f"t ~ n^{fit_exponent(counts, timings):.2f}")
+
+
+def _render_per_object(layout, path: str) -> None:
+    """
+    Отрисовка как в CityPlotter.plot (по вызову matplotlib на объект), но в Agg и без пауз.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 10))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_aspect("equal")
+    for x, y in layout.main_street_nodes:
+        ax.scatter(x, y, color="red", s=10)
+    for block in layout.blocks:
+        for row in block.nodes:
+            for x, y in row:
+                ax.scatter(x, y, color="red", s=10)
+        for house in block.houses:
+            x, y = house.exterior.xy
+            ax.fill(x, y, color="brown", alpha=1, edgecolor="black", linewidth=1)
+    for road in layout.all_roads:
+        x, y = road.xy
+        ax.plot(x, y, color="black", linewidth=1)
+    fig.savefig(path)
+
+
+def bench_render(blocks_per_street: Sequence[int], seed: int) -> None:
+    """
+    Отрисовка города в PNG: по объекту на вызов против коллекций render_layout.
+    Интерактивный CityPlotter.plot вдобавок ждёт 0.1 с после каждого квартала и 1000 с в конце.
+    """
+    print(f"{'blocks':>7} {'houses':>8} {'per-object':>11} {'batched':>9} {'speedup':>8} {'vs plot()':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for per_street in blocks_per_street:
+            config = CityConfig(SHOW_LOCAL=False, TOPOLOGY="tiled", BLOCKS_PER_STREET=per_street, HOUSE_ENGINE="vectorized")
+            layout = CityGenerator(config, seed=seed).generate()
+            houses = sum(len(block.houses) for block in layout.blocks)
+            per_object = _timed(lambda: _render_per_object(layout, os.path.join(tmp, "per_object.png")))
+            batched = _timed(lambda: render_layout(layout, os.path.join(tmp, "batched.png")))
+            interactive = per_object + 0.1 * len(layout.blocks) + 1000
+            print(
+                f"{len(layout.blocks):>7} {houses:>8} {per_object:>10.3f}s {batched:>8.3f}s "
+                f"{per_object / batched:>7.1f}x {interactive / batched:>9.0f}x"
+            )
+
+
+def bench_park(sizes: Sequence[int], seed: int) -> None:
+    """
+    Точки внутри парка: поштучный random_point_in_polygon против sample_points
+    (триангуляция и векторизованный отбор), на обычном и на вытянутом многоугольнике.
+    """
+    park = generate_park_polygon()
+    # тонкий парк: почти весь bounding box мимо
+    thin = shapely.buffer(shapely.linestrings([(0, 0), (2000, 2000)]), 5, cap_style="flat")
+    print(f"{'polygon':>8} {'points':>8} {'loop':>9} {'triangles':>10} {'rejection':>10} {'speedup':>8}")
+    for name, polygon in (("park", park), ("thin", thin)):
+        for n in sizes:
+            rng = random.Random(seed)
+            loop = _timed(lambda: [random_point_in_polygon(polygon, rng) for _ in range(n)])
+            triangles = _timed(lambda: sample_points(polygon, n, rng))
+            rejection = _timed(lambda: _rejection_points(polygon, n, np.random.default_rng(seed)))
+            print(f"{name:>8} {n:>8} {loop:>8.3f}s {triangles:>9.4f}s {rejection:>9.4f}s {loop / triangles:>7.0f}x")
+
+
+def bench_cells(sizes: Sequence[int], points_per_cell: int, seed: int) -> None:
+    """
+    Проверки принадлежности ячейкам квартала: Polygon и .within на каждый запрос (как было в
+    generate_houses) против CellGrid — полуплоскости рёбер поштучно и пакетом.
+    """
+    print(f"{'cells':>7} {'queries':>8} {'within':>9} {'scalar':>9} {'batch':>9} {'speedup':>8}")
+    sq_size = CityConfig.CELL * 0.11
+    for size in sizes:
+        nodes = _square_district(CityConfig(), size, seed)
+        cells = CellGrid(nodes)
+        rng = np.random.default_rng(seed)
+        cell = np.repeat(np.arange(len(cells)), points_per_cell)
+        lo, hi = cells.bounds[cell, :2], cells.bounds[cell, 2:]
+        xy = lo + rng.random((len(cell), 2)) * (hi - lo)
+        x, y = xy[:, 0], xy[:, 1]
+
+        def within() -> List[bool]:
+            polygons = [Polygon(ring) for ring in cells.rings.tolist()]
+            return [
+                Polygon([(hx, hy), (hx + sq_size, hy), (hx + sq_size, hy + sq_size), (hx, hy + sq_size)]).within(polygons[c])
+                for c, hx, hy in zip(cell.tolist(), x.tolist(), y.tolist())
+            ]
+
+        def scalar() -> List[bool]:
+            grid = CellGrid(nodes)
+            return [grid.contains_box(c, hx, hy, sq_size) for c, hx, hy in zip(cell.tolist(), x.tolist(), y.tolist())]
+
+        def batch() -> np.ndarray:
+            return CellGrid(nodes).contains_points(cell, x, y)
+
+        assert within() == scalar(), "CellGrid.contains_box расходится с Polygon.within"
+        timings = [_timed(fn) for fn in (within, scalar, batch)]
+        print(f"{len(cells):>7} {len(cell):>8} " + " ".join(f"{t:>8.4f}s" for t in timings) + f" {timings[0] / timings[1]:>7.1f}x")
+
+
+def bench_interior(sizes: Sequence[int], spacings: Sequence[float], seed: int) -> None:
+    """
+    Дома внутри ячеек: случайные попытки против выборки Бриджсона при разных зазорах.
+    Для poisson проверяется, что никакие два внутренних дома не ближе зазора.
+    """
+    modes = [("random", None)] + [("poisson", spacing) for spacing in spacings]
+    print(f"{'cells':>7} " + " ".join(f"{mode + ('' if spacing is None else f'@{spacing:g}'):>22}" for mode, spacing in modes))
+    timings: Dict[int, List[float]] = {i: [] for i in range(len(modes))}
+    counts: Dict[int, List[int]] = {i: [] for i in range(len(modes))}
+    square_area = (CityConfig.CELL * 0.11) ** 2
+    for size in sizes:
+        nodes = _square_district(CityConfig(), size, seed)
+        row = []
+        for i, (mode, spacing) in enumerate(modes):
+            config = CityConfig(SHOW_LOCAL=False, INTERIOR_MODE=mode, INTERIOR_SPACING=spacing)
+            generator = HouseGenerator(config, random.Random(seed))
+            start = time.perf_counter()
+            houses = np.asarray(generator.generate_houses(nodes, config.CELL, []), dtype=object)
+            timings[i].append(time.perf_counter() - start)
+            interior = houses[np.isclose(shapely.area(houses), square_area)]
+            counts[i].append(len(interior))
+            if mode == "poisson":
+                left, right = shapely.STRtree(interior).query(interior, predicate="dwithin", distance=spacing * (1 - 1e-9))
+                assert not np.any(left != right), "дома Бриджсона ближе заданного зазора"
+            row.append(f"{len(interior):>8} {timings[i][-1]:>8.3f}s")
+        print(f"{size * size:>7} " + " ".join(f"{cell:>22}" for cell in row))
+    for i, (mode, spacing) in enumerate(modes):
+        print(f"{mode}{'' if spacing is None else f'@{spacing:g}'}: t ~ n^{fit_exponent(counts[i], timings[i]):.2f}")
+
+
+def _scalar_branches(roads, city_polygon, config: CityConfig, rng: random.Random) -> List[LineString]:
+    """
+    Прежний generate_branches: по дороге за итерацию, contains на неподготовленном многоугольнике.
+    """
+    builder = RoadBuilder(rng)
+    branches = []
+    for road in roads:
+        mid = road.interpolate(0.4, normalized=True)
+        if rng.random() > config.BRANCH_PROB:
+            continue
+        dx = road.coords[1][0] - road.coords[0][0]
+        dy = road.coords[1][1] - road.coords[0][1]
+        length = math.hypot(dx, dy)
+        nx, ny = -dy / length, dx / length
+        offset = config.CELL * rng.uniform(config.BRANCH_MIN, config.BRANCH_MAX) * (-1 if rng.random() < 0.5 else 1)
+        branch = builder.slightly_noisy_curve((mid.x, mid.y), (mid.x + nx * offset, mid.y + ny * offset), rate=rng.randint(0, 6))
+        if city_polygon.contains(branch):
+            branches.append(branch)
+    return branches
+
+
+def bench_branches(sizes: Sequence[int], seed: int) -> None:
+    """
+    Ответвления для квартала size x size, проверяемые по его контуру: поштучно и массивами.
+    """
+    config = CityConfig()
+    print(f"{'roads':>8} {'scalar':>9} {'vectorized':>11} {'us/road':>8} {'speedup':>8}")
+    for size in sizes:
+        nodes = _square_district(config, size, seed)
+        roads = RoadBuilder().generate_roads_from_grid(nodes)
+        border = get_city_border(nodes)
+        scalar = _timed(lambda: _scalar_branches(roads, border, config, random.Random(seed)))
+        vectorized = _timed(lambda: generate_branches(roads, border, config, random.Random(seed)))
+        print(f"{len(roads):>8} {scalar:>8.3f}s {vectorized:>10.4f}s {vectorized / len(roads) * 1e6:>8.2f} {scalar / vectorized:>7.1f}x")
+
+
+def bench_graph(blocks_per_street: Sequence[int], sources: int, seed: int) -> None:
+    """
+    Построение RoadGraph и пакетные кратчайшие пути из sources узлов.
+    """
+    print(f"{'roads':>8} {'nodes':>8} {'edges':>8} {'build':>9} {'dijkstra':>9} {'components':>11}")
+    for per_street in blocks_per_street:
+        config = CityConfig(SHOW_LOCAL=False, TOPOLOGY="tiled", N_STREETS=4, BLOCKS_PER_STREET=per_street, HOUSE_ENGINE="vectorized", BRANCHES=True)
+        layout = CityGenerator(config, seed=seed).generate()
+        start = time.perf_counter()
+        graph = RoadGraph.from_layout(layout)
+        build = time.perf_counter() - start
+        picked = np.random.default_rng(seed).choice(graph.n_nodes, size=min(sources, graph.n_nodes), replace=False)
+        dijkstra = _timed(lambda: graph.shortest_paths(picked))
+        n_components, _labels = graph.components()
+        n_roads = len(layout.all_roads) + len(layout.branches)
+        print(f"{n_roads:>8} {graph.n_nodes:>8} {graph.n_edges:>8} {build:>8.3f}s {dijkstra:>8.3f}s {n_components:>11}")
+
+
+def bench_profile(blocks_per_street: int, repeats: int, seed: int, trace: Optional[str]) -> None:
+    """
+    Отчёт профилировщика для одного города и цена профилирования: генерация с NULL_PROFILER и с Profiler.
+    """
+    config = CityConfig(SHOW_LOCAL=False, TOPOLOGY="tiled", BLOCKS_PER_STREET=blocks_per_street, BRANCHES=True)
+    generator = CityGenerator(config, seed=seed, profiler=Profiler())
+    generator.generate()
+    print(generator.profiler.report().format())
+    if trace:
+        generator.profiler.write_chrome_trace(trace)
+        print(f"trace: {trace}")
+
+    timings: Dict[str, List[float]] = {"disabled": [], "enabled": []}
+    for _ in range(repeats):
+        for name, profiler in (("disabled", NULL_PROFILER), ("enabled", Profiler())):
+            timings[name].append(_timed(lambda: CityGenerator(config, seed=seed, profiler=profiler).generate()))
+    disabled, enabled = min(timings["disabled"]), min(timings["enabled"])
+    print(f"disabled {disabled:.3f}s, enabled {enabled:.3f}s, overhead {enabled / disabled - 1:+.1%}")
+
+
+# модули ядра генерации: их импорт не должен тянуть отрисовку (импортирует каждый воркер пула)
+CORE_MODULES = ("config", "models", "generate_node", "roads", "block", "houses", "park", "generate")
+PLOTTING_MODULES = ("matplotlib", "scipy")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": sorted({{name.split(".")[0] for name in sys.modules}})}}))
+"""
+
+
+def _cold_import(module: str) -> Dict[str, object]:
+    # отдельный интерпретатор на каждый замер: в текущем всё уже импортировано
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE.format(module=module)],
+        cwd=root, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out)
+
+
+def bench_imports(modules: Sequence[str], repeats: int, max_seconds: float) -> int:
+    """
+    Холодный импорт модулей ядра в чистом интерпретаторе. Ошибка (код 1), если модуль
+    подгружает matplotlib/scipy или импортируется дольше max_seconds (лучший из repeats).
+    """
+    problems = []
+    for name in modules:
+        module = f"{__package__}.{name}"
+        probes = [_cold_import(module) for _ in range(repeats)]
+        seconds = min(probe["seconds"] for probe in probes)
+        plotting = sorted(set(PLOTTING_MODULES) & set(probes[0]["loaded"]))
+        print(f"{module:<28} {seconds * 1000:7.1f}ms  {', '.join(plotting)}")
+        if plotting:
+            problems.append(f"{module} импортирует {', '.join(plotting)}")
+        if seconds > max_seconds:
+            problems.append(f"{module}: импорт {seconds * 1000:.0f}ms, допустимо {max_seconds * 1000:.0f}ms")
+    for problem in problems:
+        print(f"РЕГРЕССИЯ {problem}")
+    return 1 if problems else 0
+
+
+# ==============================
+# НАБОР ДЛЯ СРАВНЕНИЯ МЕЖДУ КОММИТАМИ
+# ==============================
+
+# подготовка замера: (size, seed) -> (замеряемая функция, объём работы n для t ~ n^k)
+Prepared = Tuple[Callable[[], object], int]
+
+
+def _case_nodes(size: int, seed: int) -> Prepared:
+    node_generator = NodeGenerator(CityConfig(), random.Random(seed))
+    top = node_generator.generate_main_street_nodes(size + 1)
+    return (lambda: node_generator.generate_block_nodes_from_road_down(top, rows=size)), size * size
+
+
+def _case_roads(size: int, seed: int) -> Prepared:
+    nodes = _square_district(CityConfig(), size, seed)
+    return (lambda: RoadBuilder().generate_roads_from_grid(nodes)), size * size
+
+
+def _case_houses(size: int, seed: int) -> Prepared:
+    config = CityConfig()
+    nodes = _square_district(config, size, seed)
+    roads = RoadBuilder().generate_roads_from_grid(nodes)
+    return (lambda: HouseGenerator(config, random.Random(seed)).generate_houses(nodes, config.CELL, roads)), size * size
+
+
+def _case_park(size: int, seed: int) -> Prepared:
+    park = generate_park_polygon()
+    return (lambda: sample_points(park, size, random.Random(seed))), size
+
+
+def _case_city_border(size: int, seed: int) -> Prepared:
+    nodes = _square_district(CityConfig(), size, seed)
+    return (lambda: get_city_border(nodes)), size
+
+
+def _case_branches(size: int, seed: int) -> Prepared:
+    config = CityConfig()
+    nodes = _square_district(config, size, seed)
+    roads = RoadBuilder().generate_roads_from_grid(nodes)
+    border = get_city_border(nodes)
+    return (lambda: generate_branches(roads, border, config, random.Random(seed))), len(roads)
+
+
+def _case_generate(size: int, seed: int) -> Prepared:
+    config = CityConfig(SHOW_LOCAL=False, TOPOLOGY="tiled", BLOCKS_PER_STREET=size, BRANCHES=True)
+    return (lambda: CityGenerator(config, seed=seed).generate()), size
+
+
+# имя -> (подготовка, размеры, допустимый показатель сложности)
+SUITE: Dict[str, Tuple[Callable[[int, int], Prepared], Sequence[int], float]] = {
+    "nodes": (_case_nodes, (16, 32, 64, 128), 1.3),
+    "roads": (_case_roads, (16, 32, 64, 128), 1.3),
+    "houses": (_case_houses, (4, 8, 12, 16), 1.3),
+    "park": (_case_park, (1_000, 10_000, 100_000), 1.3),
+    "city_border": (_case_city_border, (64, 256, 1024), 1.3),
+    "branches": (_case_branches, (16, 32, 64, 128), 1.3),
+    "generate": (_case_generate, (2, 4, 8, 16), 1.3),
+}
+
+
+# замеры короче этого — шум таймера и планировщика: они не сравниваются с baseline и не входят в показатель
+MIN_TIMED_SECONDS = 0.005
+# показатель сложности — по стольким наибольшим размерам, на малых доминируют постоянные расходы
+FIT_SIZES = 3
+
+
+def _reference() -> int:
+    """
+    Эталонная нагрузка: её время между повторами показывает текущую скорость машины.
+    """
+    total = 0
+    for i in range(100_000):
+        total += i * i
+    return total
+
+
+def _measure(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """
+    Время — медиана повторов; units — медиана времени повтора в долях соседних замеров эталона.
+    На общей виртуальной машине скорость плавает в полтора раза за секунды, и units между
+    запусками стабильнее секунд.
+    """
+    fn()  # прогрев: ленивые импорты и кэши первого вызова не должны попадать в замер
+    gc.collect()
+    gc.disable()
+    try:
+        reference = [_timed(_reference)]
+        times = []
+        for _ in range(repeats):
+            times.append(_timed(fn))
+            reference.append(_timed(_reference))
+    finally:
+        gc.enable()
+    units = sorted(t / ((before + after) / 2) for t, before, after in zip(times, reference, reference[1:]))
+    times.sort()
+    # пик памяти — отдельным прогоном: tracemalloc заметно замедляет код
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": times[0], "median_seconds": times[len(times) // 2], "median_units": units[len(units) // 2], "peak_bytes": peak}
+
+
+def run_suite(names: Sequence[str], seed: int, repeats: int, quick: bool = False) -> Dict[str, object]:
+    """
+    Замеры выбранных случаев на всех размерах и показатель сложности по каждому.
+    quick — только два меньших размера (для быстрой проверки, показатель грубее).
+    """
+    results: Dict[str, object] = {}
+    for name in names:
+        prepare, sizes, max_exponent = SUITE[name]
+        sizes = sizes[:2] if quick else sizes
+        runs = []
+        for size in sizes:
+            fn, work = prepare(size, seed)
+            runs.append({"size": size, "work": work, **_measure(fn, repeats)})
+        timed = [run for run in runs if run["median_seconds"] >= MIN_TIMED_SECONDS][-FIT_SIZES:]
+        exponent = fit_exponent([run["work"] for run in timed], [run["median_seconds"] for run in timed]) if len(timed) >= 2 else None
+        results[name] = {"runs": runs, "exponent": exponent, "max_exponent": max_exponent}
+        print(
+            f"{name:<12} " + "  ".join(f"n={run['work']}: {run['median_seconds'] * 1000:.2f}ms/{run['peak_bytes'] / 1e6:.1f}MB" for run in runs)
+            + (f"  k={exponent:.2f}" if exponent is not None else "  k=—"),
+            flush=True,
+        )
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "seed": seed,
+        "repeats": repeats,
+        "cases": results,
+    }
+
+
+def check_suite(report: Dict[str, object], baseline: Optional[Dict[str, object]], threshold: float) -> List[str]:
+    """
+    Нарушения: показатель сложности выше допустимого и, при наличии baseline,
+    замедление медианы или рост пика памяти больше чем в threshold раз на одинаковом объёме работы.
+    Время сравнивается в эталонных единицах (median_units, если они есть в обоих отчётах), только
+    для замеров не короче MIN_TIMED_SECONDS и только если медиана выросла больше чем на MIN_TIMED_SECONDS.
+    """
+    problems: List[str] = []
+    for name, case in report["cases"].items():
+        if case["exponent"] is not None and case["exponent"] > case["max_exponent"]:
+            problems.append(f"{name}: t ~ n^{case['exponent']:.2f}, допустимо n^{case['max_exponent']}")
+        base_case = (baseline or {}).get("cases", {}).get(name)
+        if base_case is None:
+            continue
+        base_runs = {run["work"]: run for run in base_case["runs"]}
+        for run in case["runs"]:
+            base = base_runs.get(run["work"])
+            if base is None:
+                continue
+            timed = base["median_seconds"] >= MIN_TIMED_SECONDS and run["median_seconds"] - base["median_seconds"] >= MIN_TIMED_SECONDS
+            speed = "median_units" if "median_units" in base and "median_units" in run else "median_seconds"
+            for metric in ((speed,) if timed else ()) + ("peak_bytes",):
+                if base[metric] and run[metric] / base[metric] > threshold:
+                    problems.append(f"{name} n={run['work']}: {metric} {base[metric]:.4g} -> {run[metric]:.4g} ({run[metric] / base[metric]:.2f}x)")
+    return problems
+
+
+def bench_suite(names: Sequence[str], seed: int, repeats: int, quick: bool, out: Optional[str], compare: Optional[str], threshold: float) -> int:
+    report = run_suite(names, seed, repeats, quick)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    baseline = None
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check_suite(report, baseline, threshold)
+    for problem in problems:
+        print(f"РЕГРЕССИЯ {problem}")
+    return 1 if problems else 0
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    houses = sub.add_parser("houses", help="масштабирование расстановки домов")
+    houses.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 6, 8, 12])
+    houses.add_argument("--seed", type=int, default=0)
+
+    roadside = sub.add_parser("roadside", help="скалярный и векторизованный движки придорожных домов")
+    roadside.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200])
+    roadside.add_argument("--seed", type=int, default=0)
+
+    parallel = sub.add_parser("parallel", help="масштабирование достройки кварталов по числу воркеров")
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parallel.add_argument("--blocks", type=int, default=16)
+    parallel.add_argument("--block-size", type=int, default=8)
+    parallel.add_argument("--executor", choices=["process", "thread"], default="process")
+    parallel.add_argument("--seed", type=int, default=0)
+
+    export = sub.add_parser("export", help="GeoJSON против бинарного формата")
+    export.add_argument("--count", type=int, default=20)
+    export.add_argument("--seed", type=int, default=0)
+
+    memory = sub.add_parser("memory", help="память на город: обычное и компактное представление")
+    memory.add_argument("--count", type=int, default=200)
+    memory.add_argument("--seed", type=int, default=0)
+
+    nodes = sub.add_parser("nodes", help="синтез сетки узлов: скалярно и массивами")
+    nodes.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 300, 1000])
+    nodes.add_argument("--seed", type=int, default=0)
+
+    topology = sub.add_parser("topology", help="масштабирование плана tiled по числу кварталов")
+    topology.add_argument("--blocks-per-street", type=int, nargs="+", default=[2, 8, 32, 128])
+    topology.add_argument("--streets", type=int, default=4)
+    topology.add_argument("--seed", type=int, default=0)
+
+    render = sub.add_parser("render", help="отрисовка в файл: по объекту и коллекциями")
+    render.add_argument("--blocks-per-street", type=int, nargs="+", default=[2, 8, 32])
+    render.add_argument("--seed", type=int, default=0)
+
+    park = sub.add_parser("park", help="выборка точек внутри парка")
+    park.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 50_000])
+    park.add_argument("--seed", type=int, default=0)
+
+    cells = sub.add_parser("cells", help="проверки принадлежности ячейкам: shapely против CellGrid")
+    cells.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32])
+    cells.add_argument("--points-per-cell", type=int, default=20)
+    cells.add_argument("--seed", type=int, default=0)
+
+    interior = sub.add_parser("interior", help="дома внутри ячеек: случайные попытки и выборка Бриджсона")
+    interior.add_argument("--sizes", type=int, nargs="+", default=[4, 8, 16])
+    interior.add_argument("--spacings", type=float, nargs="+", default=[6.0, 2.0])
+    interior.add_argument("--seed", type=int, default=0)
+
+    branches = sub.add_parser("branches", help="ответвления дорог: поштучно и массивами")
+    branches.add_argument("--sizes", type=int, nargs="+", default=[20, 80, 230])
+    branches.add_argument("--seed", type=int, default=0)
+
+    graph = sub.add_parser("graph", help="граф дорог: построение и кратчайшие пути")
+    graph.add_argument("--blocks-per-street", type=int, nargs="+", default=[4, 16, 64])
+    graph.add_argument("--sources", type=int, default=64)
+    graph.add_argument("--seed", type=int, default=0)
+
+    profile = sub.add_parser("profile", help="отчёт профилировщика и его накладные расходы")
+    profile.add_argument("--blocks-per-street", type=int, default=8)
+    profile.add_argument("--repeats", type=int, default=5)
+    profile.add_argument("--seed", type=int, default=0)
+    profile.add_argument("--trace", help="куда записать Chrome trace")
+
+    imports = sub.add_parser("imports", help="холодный импорт ядра: без matplotlib/scipy и в пределах бюджета")
+    imports.add_argument("--modules", nargs="+", default=list(CORE_MODULES))
+    imports.add_argument("--repeats", type=int, default=5)
+    imports.add_argument("--max-seconds", type=float, default=0.5)
+
+    suite = sub.add_parser("suite", help="все этапы: JSON для сравнения между коммитами и проверка сложности")
+    suite.add_argument("--cases", nargs="+", choices=sorted(SUITE), default=list(SUITE))
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--repeats", type=int, default=7)
+    suite.add_argument("--quick", action="store_true", help="только два меньших размера")
+    suite.add_argument("--out", help="куда записать JSON с результатами")
+    suite.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    suite.add_argument("--threshold", type=float, default=1.25, help="допустимое замедление относительно --compare")
+
+    args = parser.parse_args(argv)
+    if args.name == "houses":
+        bench_houses(args.sizes, args.seed)
+    elif args.name == "roadside":
+        bench_roadside(args.sizes, args.seed)
+    elif args.name == "parallel":
+        bench_parallel(args.workers, args.blocks, args.block_size, args.executor, args.seed)
+    elif args.name == "export":
+        bench_export(args.count, args.seed)
+    elif args.name == "memory":
+        bench_memory(args.count, args.seed)
+    elif args.name == "nodes":
+        bench_nodes(args.sizes, args.seed)
+    elif args.name == "topology":
+        bench_topology(args.blocks_per_street, args.streets, args.seed)
+    elif args.name == "render":
+        bench_render(args.blocks_per_street, args.seed)
+    elif args.name == "park":
+        bench_park(args.sizes, args.seed)
+    elif args.name == "interior":
+        bench_interior(args.sizes, args.spacings, args.seed)
+    elif args.name == "cells":
+        bench_cells(args.sizes, args.points_per_cell, args.seed)
+    elif args.name == "branches":
+        bench_branches(args.sizes, args.seed)
+    elif args.name == "graph":
+        bench_graph(args.blocks_per_street, args.sources, args.seed)
+    elif args.name == "profile":
+        bench_profile(args.blocks_per_street, args.repeats, args.seed, args.trace)
+    elif args.name == "imports":
+        raise SystemExit(bench_imports(args.modules, args.repeats, args.max_seconds))
+    elif args.name == "suite":
+        raise SystemExit(bench_suite(args.cases, args.seed, args.repeats, args.quick, args.out, args.compare, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Tuple
 
 from shapely import LineString
 
@@ -6,51 +6,103 @@ from .config import CityConfig
 from .houses import HouseGenerator
 from .models import Block
 from .generate_node import NodeGenerator
+from .profiling import NULL_PROFILER, Profiler
+from .rng import BLOCK_HOUSES, BLOCK_NODES, STREAM_BLOCKS, STREAM_UNNAMED_BLOCKS, SeedTree
 from .roads import RoadBuilder
 
 
 class BlockBuilder:
-    def __init__(self, config: CityConfig):
+    def __init__(self, config: CityConfig, seeds: Optional[SeedTree] = None, profiler: Optional[Profiler] = None):
         self.config = config
-        self.node_generator = NodeGenerator(config)
+        self.seeds = seeds
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.node_generator = NodeGenerator(config, seeds.random(STREAM_UNNAMED_BLOCKS, BLOCK_NODES) if seeds else None)
         self.road_builder = RoadBuilder()
-        self.house_generator = HouseGenerator(config)
+        self.house_generator = HouseGenerator(config, seeds.random(STREAM_UNNAMED_BLOCKS, BLOCK_HOUSES) if seeds else None, self.profiler)
 
-    def _finalize_block(self, nodes: List[List[tuple]]) -> Block:
-        roads: List[LineString] = self.road_builder.generate_roads_from_grid(nodes)
-        houses = [] if self.config.ANIMATE_HOUSES else self.house_generator.generate_houses(nodes, self.config.CELL, roads)
+    def _generators(self, block_id: Optional[int]) -> Tuple[NodeGenerator, HouseGenerator]:
+        """
+        Генераторы узлов и домов для квартала block_id.
+        С деревом сидов у каждого квартала свои потоки, и его результат зависит только от
+        сида города и block_id, а не от того, какие кварталы строились до него.
+        """
+        if self.seeds is None or block_id is None:
+            return self.node_generator, self.house_generator
+        return (
+            NodeGenerator(self.config, self.seeds.random(STREAM_BLOCKS, block_id, BLOCK_NODES)),
+            HouseGenerator(self.config, self.seeds.random(STREAM_BLOCKS, block_id, BLOCK_HOUSES), self.profiler),
+        )
+
+    def finalize_block(self, nodes: List[List[tuple]], block_id: Optional[int] = None) -> Block:
+        """
+        Дороги и дома по готовой сетке узлов — дорогая часть построения квартала.
+        """
+        _node_generator, house_generator = self._generators(block_id)
+        with self.profiler.stage("roads", block=block_id) as span:
+            roads: List[LineString] = self.road_builder.generate_roads_from_grid(nodes)
+            span["roads"] = len(roads)
+        houses = house_generator.generate_houses(nodes, self.config.CELL, roads, block_id=block_id)
         return Block(nodes=nodes, roads=roads, houses=houses)
 
-    def create_block_down(self, top_side: LineString) -> Block:
-        block_nodes = self.node_generator.generate_block_nodes_from_road_down(top_side=list(top_side.coords), rows=2)
-        return self._finalize_block(block_nodes)
+    # Узлы кварталов: дешёвый последовательный этап, от которого зависят соседние кварталы
 
-    def create_block_up(self, bottom_side: LineString) -> Block:
-        block_nodes = self.node_generator.generate_block_nodes_from_road_up(bottom_side=list(bottom_side.coords), rows=2)
-        return self._finalize_block(block_nodes)
+    def _nodes(self, method: str, block_id: Optional[int], rows: int, spacing: Optional[Tuple[float, float]], **sides: LineString) -> List[List[tuple]]:
+        """
+        Вызывает generate_block_nodes_<method> (или его *_array-вариант при config.VECTORIZED_NODES).
+        spacing — (min_d, max_d) для методов, которые их принимают; None — их значения по умолчанию.
+        """
+        node_generator, _house_generator = self._generators(block_id)
+        kwargs = {name: list(side.coords) for name, side in sides.items()}
+        if spacing is not None:
+            kwargs["min_d"], kwargs["max_d"] = spacing
+        with self.profiler.stage("nodes", block=block_id) as span:
+            if self.config.VECTORIZED_NODES:
+                nodes = node_generator.to_rows(getattr(node_generator, f"generate_block_nodes_{method}_array")(rows=rows, **kwargs))
+            else:
+                nodes = getattr(node_generator, f"generate_block_nodes_{method}")(rows=rows, **kwargs)
+            span["nodes"] = sum(len(row) for row in nodes)
+        return nodes
 
-    def create_block_right_down(self, top_side: LineString, left_side: LineString) -> Block:
-        block_nodes = self.node_generator.generate_block_nodes_from_road_right_down(top_side=list(top_side.coords), left_side=list(left_side.coords), rows=2)
-        return self._finalize_block(block_nodes)
+    def nodes_down(self, top_side: LineString, block_id: Optional[int] = None, rows: int = 2, spacing: Optional[Tuple[float, float]] = None) -> List[List[tuple]]:
+        return self._nodes("from_road_down", block_id, rows, spacing, top_side=top_side)
+
+    def nodes_up(self, bottom_side: LineString, block_id: Optional[int] = None, rows: int = 2, spacing: Optional[Tuple[float, float]] = None) -> List[List[tuple]]:
+        return self._nodes("from_road_up", block_id, rows, spacing, bottom_side=bottom_side)
+
+    def nodes_right_down(self, top_side: LineString, left_side: LineString, block_id: Optional[int] = None, rows: int = 2, spacing: Optional[Tuple[float, float]] = None) -> List[List[tuple]]:
+        return self._nodes("from_road_right_down", block_id, rows, spacing, top_side=top_side, left_side=left_side)
+
+    def nodes_up_right(self, bottom_side: LineString, left_side: LineString, block_id: Optional[int] = None, rows: int = 2, spacing: Optional[Tuple[float, float]] = None) -> List[List[tuple]]:
+        return self._nodes("from_road_up_right", block_id, rows, spacing, bottom_side=bottom_side, left_side=left_side)
+
+    def nodes_between_roads(self, top_side: LineString, bottom_side: LineString, block_id: Optional[int] = None, rows: int = 2) -> List[List[tuple]]:
+        return self._nodes("between_top_bottom", block_id, rows, None, top_side=top_side, bottom_side=bottom_side)
+
+    def create_block_down(self, top_side: LineString, block_id: Optional[int] = None) -> Block:
+        return self.finalize_block(self.nodes_down(top_side, block_id), block_id)
+
+    def create_block_up(self, bottom_side: LineString, block_id: Optional[int] = None) -> Block:
+        return self.finalize_block(self.nodes_up(bottom_side, block_id), block_id)
+
+    def create_block_right_down(self, top_side: LineString, left_side: LineString, block_id: Optional[int] = None) -> Block:
+        return self.finalize_block(self.nodes_right_down(top_side, left_side, block_id), block_id)
+
+    def create_block_up_right(self, bottom_side: LineString, left_side: LineString, block_id: Optional[int] = None) -> Block:
+        return self.finalize_block(self.nodes_up_right(bottom_side, left_side, block_id), block_id)
 
-    def create_block_up_right(self, bottom_side: LineString, left_side: LineString) -> Block:
-        block_nodes = self.node_generator.generate_block_nodes_from_road_up_right(
-            bottom_side=list(bottom_side.coords),
-            left_side=list(left_side.coords),
-            rows=2,
-        )
-        return self._finalize_block(block_nodes)
-    
     def create_block_between_roads(
         self,
         top_side: LineString,
         bottom_side: LineString,
+        block_id: Optional[int] = None,
     ) -> Block:
-        block_nodes = self.node_generator.generate_block_nodes_between_top_bottom(
-            top_side=list(top_side.coords),
-            bottom_side=list(bottom_side.coords),
-            rows=2,
-        )
-        return self._finalize_block(block_nodes)
+        return self.finalize_block(self.nodes_between_roads(top_side, bottom_side, block_id), block_id)
+
+
+def finalize_block(config: CityConfig, seeds: Optional[SeedTree], block_id: Optional[int], nodes: List[List[tuple]]) -> Block:
+    """
+    Точка входа для пула процессов: всё, что нужно кварталу, передаётся аргументами.
+    """
+    return BlockBuilder(config, seeds).finalize_block(nodes, block_id)
 
 
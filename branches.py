@@ -1,45 +1,55 @@
-import math
 import random
+from typing import List, Optional, Sequence
 
-from shapely import LineString
+import numpy as np
+import shapely
+from shapely import LineString, Polygon
 
 from .config import CityConfig
-from .roads import RoadBuilder
 
 
-config = CityConfig()
-road_builder = RoadBuilder()
-
-
-def generate_branches(roads, city_polygon):
-    branches = []
-
-    for road in roads:
-        if not isinstance(road, LineString):
-            continue
-
-        mid = road.interpolate(0.4, normalized=True)
-        x, y = mid.x, mid.y
-
-        if random.random() > config.BRANCH_PROB:
-            continue
-
-        dx = road.coords[1][0] - road.coords[0][0]
-        dy = road.coords[1][1] - road.coords[0][1]
-        nx, ny = -dy, dx
-        length = math.sqrt(nx * nx + ny * ny)
-        nx, ny = nx / length, ny / length
-
-        length_multiplier = config.CELL * random.uniform(config.BRANCH_MIN, config.BRANCH_MAX)
-        if random.random() < 0.5:
-            length_multiplier = -length_multiplier
-
-        p2 = (x + nx * length_multiplier, y + ny * length_multiplier)
-        branch = LineString(road_builder.slightly_noisy_curve((x, y), p2, rate=random.randint(0, 6)))
-
-        if not city_polygon.contains(branch):
-            continue
-
-        branches.append(branch)
-
-    return branches
+def generate_branches(
+    roads: Sequence[LineString],
+    city_polygon: Polygon,
+    config: Optional[CityConfig] = None,
+    rng: Optional[random.Random] = None,
+) -> List[LineString]:
+    """
+    Тупиковые ответвления от дорог: из точки на 0.4 длины дороги по нормали к ней.
+    Все дороги обрабатываются разом массивами; ответвление остаётся, только если целиком
+    лежит внутри city_polygon (многоугольник подготавливается один раз для всей пачки).
+    """
+    config = config if config is not None else CityConfig()
+    np_rng = np.random.default_rng((rng if rng is not None else random).getrandbits(64))
+
+    roads = np.asarray(list(roads), dtype=object)
+    if len(roads):
+        roads = roads[shapely.get_type_id(roads) == shapely.GeometryType.LINESTRING]
+    n = len(roads)
+    if not n:
+        return []
+
+    roads = roads[np_rng.random(n) <= config.BRANCH_PROB]
+    n = len(roads)
+    if not n:
+        return []
+
+    start = shapely.get_coordinates(shapely.get_point(roads, 0))
+    direction = shapely.get_coordinates(shapely.get_point(roads, 1)) - start
+    normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+    normal /= np.hypot(normal[:, 0], normal[:, 1])[:, None]
+
+    origin = shapely.get_coordinates(shapely.line_interpolate_point(roads, 0.4, normalized=True))
+    length = config.CELL * np_rng.uniform(config.BRANCH_MIN, config.BRANCH_MAX, n)
+    length[np_rng.random(n) < 0.5] *= -1
+    end = origin + normal * length[:, None]
+
+    # изгиб как в RoadBuilder.slightly_noisy_curve: середина со случайным сдвигом на 1..4 и на rate
+    angle = np_rng.uniform(0, 2 * np.pi, n)
+    dist = np_rng.uniform(1, 4, n)
+    rate = np_rng.integers(0, 6, n, endpoint=True)
+    mid = (origin + end) / 2 + np.column_stack((np.cos(angle), np.sin(angle))) * dist[:, None] + rate[:, None]
+
+    branches = shapely.simplify(shapely.linestrings(np.stack((origin, mid, end), axis=1)), 0.5)
+    shapely.prepare(city_polygon)
+    return list(branches[shapely.contains(city_polygon, branches)])
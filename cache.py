@@ -0,0 +1,166 @@
+"""
+Кэш генерации на диске.
+
+Ключ — sha256 от версии библиотеки, сида и полей CityConfig, влияющих на результат. Кэшируются
+и города целиком (повторный запуск с тем же конфигом и сидом — чтение одного файла), и отдельные
+кварталы: ключ квартала зависит только от его узлов, block_id и полей BLOCK_FIELDS, поэтому при
+изменении одного квартала остальные берутся из кэша.
+
+Записи — pickle-файлы в каталоге кэша; время доступа отмечается mtime, при превышении max_bytes
+удаляются самые давно использованные, пока размер не опустится до LOW_WATER * max_bytes. Общий
+размер хранится рядом в USAGE_FILE, поэтому открытие кэша и запись не обходят каталог; обход
+(и индекс путь -> (mtime, размер) в памяти) нужен только при вытеснении.
+"""
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import __version__
+from .config import CityConfig
+
+# поля, не влияющие на геометрию города
+NEUTRAL_FIELDS = frozenset({
+    "SEED", "SHOW_LOCAL", "ANIMATE_HOUSES", "HOUSES_PER_FRAME", "WORKERS", "EXECUTOR",
+    "COMPACT_LAYOUT", "CACHE_DIR", "CACHE_MAX_BYTES", "PROFILE",
+})
+# поля, от которых зависят дороги и дома квартала при заданных узлах
+BLOCK_FIELDS = ("CELL", "HOUSE_ENGINE", "INTERIOR_MODE", "INTERIOR_DENSITY", "INTERIOR_SPACING")
+
+USAGE_FILE = "usage.json"
+# вытеснение освобождает место с запасом, чтобы следующие записи не запускали его снова
+LOW_WATER = 0.9
+
+
+def _digest(*parts: Any) -> str:
+    h = hashlib.sha256(__version__.encode())
+    for part in parts:
+        h.update(b"\0")
+        h.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def layout_key(config: CityConfig, entropy: int) -> str:
+    fields = {name: value for name, value in asdict(config).items() if name not in NEUTRAL_FIELDS}
+    return _digest("layout", fields, str(entropy))
+
+
+def block_key(config: CityConfig, entropy: int, block_id: Optional[int], nodes: List[List[tuple]]) -> str:
+    grid = np.ascontiguousarray(nodes, dtype=np.float64)
+    fields = {name: getattr(config, name) for name in BLOCK_FIELDS}
+    return _digest("block", fields, str(entropy), block_id, list(grid.shape), grid.tobytes())
+
+
+class GenerationCache:
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        # оба читаются лениво: размер — из USAGE_FILE при первой записи, индекс — при вытеснении
+        self._size: Optional[int] = None
+        self._index: Optional[Dict[str, Tuple[float, int]]] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _load_index(self) -> Dict[str, Tuple[float, int]]:
+        if self._index is None:
+            self._index = {path: (mtime, size) for path, mtime, size in self._entries()}
+        return self._index
+
+    def _usage(self) -> int:
+        """
+        Размер кэша в байтах. Без USAGE_FILE (новый или старый каталог) — один обход каталога.
+        Записи из других процессов учитываются приблизительно и уточняются при вытеснении.
+        """
+        if self._size is None:
+            try:
+                with open(os.path.join(self.directory, USAGE_FILE)) as f:
+                    self._size = int(json.load(f)["bytes"])
+            except (FileNotFoundError, ValueError, KeyError, TypeError):
+                self._size = sum(size for _mtime, size in self._load_index().values())
+                self._save_usage()
+        return self._size
+
+    def _save_usage(self) -> None:
+        path = os.path.join(self.directory, USAGE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"bytes": self._size}, f)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        if self._index is not None and path in self._index:
+            self._index[path] = (os.path.getmtime(path), self._index[path][1])
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        usage = self._usage()
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+        os.replace(tmp_path, path)
+        if self._index is not None:
+            self._index[path] = (os.path.getmtime(path), size)
+        self._size = usage + size - previous
+        if self._size > self.max_bytes:
+            self._evict()
+        else:
+            self._save_usage()
+
+    def _evict(self) -> None:
+        """
+        Удаляет давно использованные записи, пока кэш не станет меньше LOW_WATER * max_bytes.
+        Каталог обходится один раз на экземпляр, дальше индекс ведётся в памяти.
+        """
+        index = self._load_index()
+        self._size = sum(size for _mtime, size in index.values())
+        target = self.max_bytes * LOW_WATER
+        for path, (_mtime, size) in sorted(index.items(), key=lambda item: item[1][0]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            del index[path]
+            self._size -= size
+        self._save_usage()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._usage()}
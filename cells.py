@@ -0,0 +1,123 @@
+"""
+Геометрия ячеек квартала массивами.
+
+CellGrid строит все ячейки сетки узлов одним пакетным вызовом и подготавливает их (shapely.prepare)
+один раз на квартал. Рёбра ячеек — начала, единичные направления, нормали и длины — хранятся
+массивами (n_cells, 4, ...). Для выпуклых ячеек (почти все: узлы кварталов лишь слегка сдвинуты
+от прямой сетки) проверки принадлежности идут по полуплоскостям рёбер — арифметикой, без создания
+геометрий; невыпуклые проверяются подготовленным многоугольником.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from .models import Point2D
+
+
+def _quads_to_polygons(quads: np.ndarray) -> np.ndarray:
+    """
+    Массив (n, 4, 2) четырёхугольников -> массив полигонов без дыр.
+    Через ragged-представление это заметно быстрее, чем shapely.polygons.
+    """
+    n = len(quads)
+    closed = np.concatenate([quads, quads[:, :1]], axis=1).reshape(-1, 2)
+    offsets = (np.arange(0, 5 * n + 1, 5), np.arange(n + 1))
+    return shapely.from_ragged_array(shapely.GeometryType.POLYGON, closed, offsets)
+
+
+class CellGrid:
+    """
+    Ячейки сетки nodes в порядке обхода по строкам; вершины ячейки — tl, tr, br, bl.
+
+    rings — (n, 4, 2) вершины, polygons — подготовленные многоугольники, bounds — (n, 4) bbox;
+    starts, units, normals — (n, 4, 2) начала рёбер, единичные направления и левые нормали
+    (у вырожденных рёбер нулевые), lengths — (n, 4) длины рёбер.
+    """
+
+    def __init__(self, nodes: Sequence[Sequence[Point2D]]):
+        grid = np.asarray(nodes, dtype=np.float64)
+        self.rows, self.cols = grid.shape[0] - 1, grid.shape[1] - 1
+        n_cells = self.rows * self.cols
+
+        self.rings = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=2).reshape(n_cells, 4, 2)
+        self.polygons = _quads_to_polygons(self.rings)
+        shapely.prepare(self.polygons)
+        self.bounds = np.concatenate([self.rings.min(axis=1), self.rings.max(axis=1)], axis=1)
+
+        self.starts = self.rings
+        directions = np.roll(self.rings, -1, axis=1) - self.rings
+        self.lengths = np.hypot(directions[..., 0], directions[..., 1])
+        self.units = directions / np.where(self.lengths > 0, self.lengths, 1.0)[..., None]
+        self.normals = np.stack([-self.units[..., 1], self.units[..., 0]], axis=-1)
+
+        # ячейка выпукла, если повороты на всех вершинах одного знака; знак задаёт обход
+        following = np.roll(directions, -1, axis=1)
+        turns = directions[..., 0] * following[..., 1] - directions[..., 1] * following[..., 0]
+        orientation = np.sign(turns.sum(axis=1))
+        self.convex = (np.all(turns * orientation[:, None] > 0, axis=1)) & (orientation != 0)
+
+        # полуплоскости рёбер a*x + b*y + c >= 0 внутри ячейки (нормаль к внутренней стороне)
+        inward = self.normals * orientation[:, None, None]
+        offsets = -np.einsum("cek,cek->ce", inward, self.starts)
+        self.half_planes = np.concatenate([inward, offsets[..., None]], axis=-1)
+
+        # питоновские копии для скалярных проверок в горячих циклах: индексация numpy там дороже арифметики
+        self._planes: List[List[List[float]]] = self.half_planes.tolist()
+        self._convex: List[bool] = self.convex.tolist()
+        self._inner: Dict[Tuple[int, float], Polygon] = {}
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    def polygon(self, cell: int) -> Polygon:
+        return self.polygons[cell]
+
+    def contains_point(self, cell: int, x: float, y: float) -> bool:
+        """
+        Точка строго внутри ячейки (как Point.within).
+        """
+        if not self._convex[cell]:
+            return bool(shapely.contains_properly(self.polygons[cell], shapely.Point(x, y)))
+        for a, b, c in self._planes[cell]:
+            if a * x + b * y + c <= 0:
+                return False
+        return True
+
+    def contains_box(self, cell: int, x: float, y: float, size: float, inset: float = 0.0) -> bool:
+        """
+        Квадрат [x, x + size] x [y, y + size] целиком в ячейке (как box.within(cell)).
+        У выпуклой ячейки для этого достаточно, чтобы внутри были все четыре угла.
+        inset — квадрат должен отстоять от рёбер ячейки не меньше чем на inset.
+        """
+        if not self._convex[cell]:
+            return bool(shapely.within(shapely.box(x, y, x + size, y + size), self._inner_polygon(cell, inset)))
+        x2, y2 = x + size, y + size
+        for a, b, c in self._planes[cell]:
+            c -= inset
+            if a * x + b * y + c < 0 or a * x2 + b * y + c < 0 or a * x2 + b * y2 + c < 0 or a * x + b * y2 + c < 0:
+                return False
+        return True
+
+    def _inner_polygon(self, cell: int, inset: float) -> Polygon:
+        if not inset:
+            return self.polygons[cell]
+        key = (cell, inset)
+        if key not in self._inner:
+            self._inner[key] = shapely.buffer(self.polygons[cell], -inset, join_style="mitre")
+            shapely.prepare(self._inner[key])
+        return self._inner[key]
+
+    def contains_points(self, cells: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Пакетная проверка: точка (x[i], y[i]) строго внутри ячейки cells[i].
+        """
+        planes = self.half_planes[cells]
+        values = planes[..., 0] * x[:, None] + planes[..., 1] * y[:, None] + planes[..., 2]
+        inside = np.all(values > 0, axis=1)
+        slow = ~self.convex[cells]
+        if slow.any():
+            points = shapely.points(x[slow], y[slow])
+            inside[slow] = shapely.contains_properly(self.polygons[cells[slow]], points)
+        return inside
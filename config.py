@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class CityConfig:
@@ -9,11 +10,43 @@ class CityConfig:
     MAX_D: float = 500
     CURVED_PROB: float = 0.5
 
+    BRANCHES: bool = False  # тупиковые ответвления внутри кварталов (CityLayout.branches)
     BRANCH_PROB: float = 0.65
     BRANCH_MIN: float = 0.2
     BRANCH_MAX: float = 0.45
 
     HOUSE_INSIDE_MIN: tuple = (3,6)
 
+    # "classic" — исходный город из пяти кварталов и парка, "tiled" — сетка из плана ниже
+    TOPOLOGY: str = "classic"
+    N_STREETS: int = 2
+    BLOCKS_PER_STREET: int = 2
+    ROWS_PER_BLOCK: int = 2
+    STREET_SPACING: float = 1550
+    # содержимое парка считается лениво, при первом обращении к CityLayout.park_contents
+    PARK_TREES: int = 80
+    PARK_LAWNS: int = 3
+    PARK_PATHS: int = 4
+    PARK_LAWN_WIDTH: tuple = (40, 75)
+    PARK_LAWN_HEIGHT: tuple = (30, 60)
+
+    HOUSE_ENGINE: str = "scalar"  # "scalar" | "vectorized"
+    # дома внутри ячеек: "random" — до 15 случайных попыток на дом, "poisson" — выборка Бриджсона
+    # вне придорожной полосы с зазором INTERIOR_SPACING (None — CELL * 0.02)
+    # и долей INTERIOR_DENSITY от насыщенной упаковки
+    INTERIOR_MODE: str = "random"
+    INTERIOR_DENSITY: float = 1.0
+    INTERIOR_SPACING: Optional[float] = None
+    VECTORIZED_NODES: bool = False  # узлы кварталов через *_array-методы NodeGenerator
+
+    SEED: Optional[int] = None
+    WORKERS: int = 1           # >1 — кварталы достраиваются в пуле
+    EXECUTOR: str = "process"  # "process" | "thread"
+    COMPACT_LAYOUT: bool = False  # CompactCityLayout вместо CityLayout
+    CACHE_DIR: Optional[str] = None  # кэш городов и кварталов на диске (только при заданном сиде)
+    CACHE_MAX_BYTES: int = 1 << 30
+    PROFILE: bool = False  # CityGenerator.profiler собирает время этапов и счётчики
+
     SHOW_LOCAL: bool = True
     ANIMATE_HOUSES: bool = False
+    HOUSES_PER_FRAME: int = 20
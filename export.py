@@ -0,0 +1,231 @@
+"""
+Экспорт CityLayout.
+
+GeoJSON пишется потоково, по одному Feature за раз, поэтому большой город не собирается
+в один словарь в памяти. Бинарный формат — npz с плоскими массивами координат и смещений
+(ragged-представление shapely 2) по слоям: он в разы компактнее и быстрее читается обратно.
+"""
+import json
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
+
+from .city_border import get_city_border
+from .models import Block, CityLayout, CompactCityLayout, ParkContents, StreamedBlock
+
+Feature = Tuple[Dict[str, object], BaseGeometry]
+
+# Слои бинарного формата и тип геометрии в каждом
+LAYER_TYPES = {
+    "houses": shapely.GeometryType.POLYGON,
+    "side_roads": shapely.GeometryType.LINESTRING,
+    "main_roads": shapely.GeometryType.LINESTRING,
+    "blocks": shapely.GeometryType.POLYGON,
+    "park": shapely.GeometryType.POLYGON,
+    "branches": shapely.GeometryType.LINESTRING,
+}
+
+
+def main_roads(layout: CityLayout) -> List[BaseGeometry]:
+    """
+    Дороги магистралей: всё из all_roads, что не принадлежит ни одному кварталу.
+    """
+    if isinstance(layout, CompactCityLayout):
+        return layout.street_roads
+    block_roads = {id(road) for block in layout.blocks for road in block.roads}
+    return [road for road in layout.all_roads if id(road) not in block_roads]
+
+
+def block_features(block: Block, block_id: int) -> Iterator[Feature]:
+    yield {"kind": "block", "block": block_id}, get_city_border(block.nodes)
+    for road in block.roads:
+        yield {"kind": "side_road", "block": block_id}, road
+    for house in block.houses:
+        yield {"kind": "house", "block": block_id}, house
+
+
+def park_features(contents: ParkContents) -> Iterator[Feature]:
+    for lawn in contents.lawns:
+        yield {"kind": "lawn"}, lawn
+    for path in contents.paths:
+        yield {"kind": "park_path"}, path
+    for tree in shapely.points(contents.trees):
+        yield {"kind": "tree"}, tree
+
+
+def layout_features(layout: CityLayout, park_contents: bool = False) -> Iterator[Feature]:
+    """
+    Все объекты города в виде пар (свойства, геометрия).
+    park_contents — добавить деревья, лужайки и дорожки парка (считаются при первом обращении).
+    """
+    for road in main_roads(layout):
+        yield {"kind": "main_road"}, road
+    for block_id, block in enumerate(layout.blocks):
+        yield from block_features(block, block_id)
+    for branch in layout.branches:
+        yield {"kind": "branch"}, branch
+    if not layout.park_polygon.is_empty:
+        yield {"kind": "park"}, layout.park_polygon
+    if park_contents and layout.park_contents is not None:
+        yield from park_features(layout.park_contents)
+
+
+def stream_features(blocks: Iterable[StreamedBlock]) -> Iterator[Feature]:
+    """
+    Объекты потока CityGenerator.iter_blocks: магистрали, квартал и его ответвления по мере поступления.
+    Кварталы нумеруются так же, как в layout_features (StreamedBlock.index).
+    """
+    for item in blocks:
+        for road in item.street_roads:
+            yield {"kind": "main_road"}, road
+        yield from block_features(item.block, item.index)
+        for branch in item.branches:
+            yield {"kind": "branch"}, branch
+
+
+COLLECTION_HEADER = '{"type": "FeatureCollection", "features": [\n'
+COLLECTION_FOOTER = "\n]}\n"
+FEATURE_SEPARATOR = ",\n"
+
+
+def feature_json(properties: Dict[str, object], geometry: BaseGeometry) -> str:
+    return '{"type": "Feature", "properties": ' + json.dumps(properties) + ', "geometry": ' + shapely.to_geojson(geometry) + "}"
+
+
+def write_features(features: Iterable[Feature], fp: IO[str]) -> int:
+    """
+    Пишет FeatureCollection в текстовый поток по одному объекту. Возвращает число объектов.
+    """
+    fp.write(COLLECTION_HEADER)
+    count = 0
+    for properties, geometry in features:
+        if count:
+            fp.write(FEATURE_SEPARATOR)
+        fp.write(feature_json(properties, geometry))
+        count += 1
+    fp.write(COLLECTION_FOOTER)
+    return count
+
+
+def write_geojson(layout: CityLayout, target: Union[str, IO[str]], park_contents: bool = False) -> int:
+    features = layout_features(layout, park_contents)
+    if isinstance(target, str):
+        with open(target, "w", encoding="utf-8") as fp:
+            return write_features(features, fp)
+    return write_features(features, target)
+
+
+def write_geojson_stream(blocks: Iterable[StreamedBlock], target: Union[str, IO[str]]) -> int:
+    """
+    Пишет поток кварталов в GeoJSON, не собирая город в памяти.
+    """
+    features = stream_features(blocks)
+    if isinstance(target, str):
+        with open(target, "w", encoding="utf-8") as fp:
+            return write_features(features, fp)
+    return write_features(features, target)
+
+
+# ==============================
+# БИНАРНЫЙ ФОРМАТ
+# ==============================
+
+def to_ragged(geometries: Sequence[BaseGeometry], geometry_type: shapely.GeometryType) -> Tuple[np.ndarray, Tuple[np.ndarray, ...]]:
+    if len(geometries):
+        _type, coords, offsets = shapely.to_ragged_array(np.asarray(geometries, dtype=object))
+        return coords, offsets
+    depth = 2 if geometry_type == shapely.GeometryType.POLYGON else 1
+    return np.empty((0, 2)), tuple(np.zeros(1, dtype=np.int32) for _ in range(depth))
+
+
+def layout_layers(layout: CityLayout) -> Dict[str, Tuple[List[BaseGeometry], List[int]]]:
+    """
+    Геометрии по слоям бинарного формата вместе с номером квартала (-1 — вне кварталов).
+    """
+    layers: Dict[str, Tuple[List[BaseGeometry], List[int]]] = {name: ([], []) for name in LAYER_TYPES}
+
+    def add(name: str, geometries: Sequence[BaseGeometry], block_id: int) -> None:
+        layers[name][0].extend(geometries)
+        layers[name][1].extend([block_id] * len(geometries))
+
+    add("main_roads", main_roads(layout), -1)
+    for block_id, block in enumerate(layout.blocks):
+        add("blocks", [get_city_border(block.nodes)], block_id)
+        add("side_roads", block.roads, block_id)
+        add("houses", block.houses, block_id)
+    if not layout.park_polygon.is_empty:
+        add("park", [layout.park_polygon], -1)
+    add("branches", layout.branches, -1)
+    return layers
+
+
+def write_binary(layout: CityLayout, path: str, compressed: bool = False) -> None:
+    """
+    Сохраняет город в npz: для каждого слоя — coords (n, 2) float64, смещения колец/геометрий
+    и номер квартала; плюс сетки узлов кварталов одним массивом с формами.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    for name, (geometries, block_ids) in layout_layers(layout).items():
+        coords, offsets = to_ragged(geometries, LAYER_TYPES[name])
+        arrays[f"{name}/coords"] = coords
+        for level, offset in enumerate(offsets):
+            arrays[f"{name}/offsets{level}"] = offset
+        arrays[f"{name}/block"] = np.asarray(block_ids, dtype=np.int32)
+
+    grids = [np.asarray(block.nodes, dtype=float) for block in layout.blocks]
+    arrays["nodes/shapes"] = np.asarray([grid.shape[:2] for grid in grids], dtype=np.int64).reshape(-1, 2)
+    arrays["nodes/coords"] = np.concatenate([grid.reshape(-1, 2) for grid in grids]) if grids else np.empty((0, 2))
+    arrays["main_street_nodes"] = np.asarray(layout.main_street_nodes, dtype=float).reshape(-1, 2)
+    arrays["main_street_roads"] = np.asarray([len(layout.main_street_roads)], dtype=np.int64)
+
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+
+def _from_ragged(data, name: str) -> np.ndarray:
+    geometry_type = LAYER_TYPES[name]
+    depth = 2 if geometry_type == shapely.GeometryType.POLYGON else 1
+    offsets = tuple(data[f"{name}/offsets{level}"] for level in range(depth))
+    if len(offsets[-1]) <= 1:
+        return np.empty(0, dtype=object)
+    return shapely.from_ragged_array(geometry_type, data[f"{name}/coords"], offsets)
+
+
+def read_binary(path: str) -> CityLayout:
+    """
+    Обратная операция к write_binary.
+    """
+    with np.load(path) as data:
+        # в файлах без ответвлений (записанных до их появления в формате) слоя может не быть
+        layers = {name: (_from_ragged(data, name), data[f"{name}/block"]) for name in LAYER_TYPES if f"{name}/block" in data}
+        shapes = data["nodes/shapes"]
+        node_coords = data["nodes/coords"]
+        main_street_nodes = [tuple(p) for p in data["main_street_nodes"].tolist()]
+        n_main_street_roads = int(data["main_street_roads"][0])
+
+    n_blocks = len(shapes)
+    blocks: List[Block] = []
+    start = 0
+    for rows, cols in shapes:
+        grid = node_coords[start:start + rows * cols].reshape(rows, cols, 2)
+        start += rows * cols
+        blocks.append(Block(nodes=[[tuple(p) for p in row] for row in grid.tolist()], roads=[], houses=[]))
+
+    for name, attr in (("side_roads", "roads"), ("houses", "houses")):
+        geometries, block_ids = layers[name]
+        bounds = np.searchsorted(block_ids, np.arange(n_blocks + 1))
+        for block_id, block in enumerate(blocks):
+            setattr(block, attr, list(geometries[bounds[block_id]:bounds[block_id + 1]]))
+
+    roads = list(layers["main_roads"][0])
+    park: Optional[BaseGeometry] = layers["park"][0][0] if len(layers["park"][0]) else Polygon()
+    return CityLayout(
+        main_street_nodes=main_street_nodes,
+        main_street_roads=roads[:n_main_street_roads],
+        blocks=blocks,
+        park_polygon=park,
+        all_roads=[road for block in blocks for road in block.roads] + roads,
+        branches=list(layers["branches"][0]) if "branches" in layers else [],
+    )
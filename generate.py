@@ -1,113 +1,264 @@
-from typing import List, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import Callable, ContextManager, Iterator, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
-from shapely.geometry import LineString
+from shapely.geometry import LineString, Polygon
 
-from .block import BlockBuilder
+from .block import BlockBuilder, finalize_block
+from .cache import GenerationCache, block_key, layout_key
 from .branches import generate_branches
+from .city_border import get_city_border
 from .config import CityConfig
 from .houses import HouseGenerator
-from .models import CityLayout
-from .park import ParkGenerator, draw_polygon
+from .models import Block, CityLayout, CitySkeleton, CompactCityLayout, ParkContents, Point2D, StreamedBlock
+from .generate_node import NodeGenerator
+from .park import ParkGenerator, generate_park_contents
+from .plan import Nodes, TiledPlan
+from .profiling import Profiler, make_profiler
+from .rng import STREAM_BRANCHES, STREAM_PARK, STREAM_PARK_CONTENTS, STREAM_STREETS, SeedTree
 from  .roads import RoadBuilder
 
 
 class CityGenerator:
     """
     Собирает все части генерации в единый пайплайн: магистраль, кварталы, парк.
+    Все случайные решения берутся из потоков, порождённых сидом (seed или config.SEED),
+    поэтому город воспроизводим, а генераторы можно запускать параллельно в потоках.
     """
 
-    def __init__(self, config: CityConfig):
+    def __init__(
+        self,
+        config: CityConfig,
+        seed: Optional[int] = None,
+        cache: Optional[GenerationCache] = None,
+        profiler: Optional[Profiler] = None,
+    ):
         self.config = config
-        self.block_builder = BlockBuilder(config)
+        # отчёт: generator.profiler.report(); выключенный профилировщик почти ничего не стоит
+        self.profiler = profiler if profiler is not None else make_profiler(config.PROFILE)
+        self.seed = seed if seed is not None else config.SEED
+        self.seeds = SeedTree(self.seed)
+        if cache is None and config.CACHE_DIR is not None:
+            cache = GenerationCache(config.CACHE_DIR, config.CACHE_MAX_BYTES)
+        # без сида город случаен, и кэшировать его бессмысленно
+        self.cache = cache if self.seed is not None else None
+        self.block_builder = BlockBuilder(config, self.seeds, self.profiler)
         self.road_builder = RoadBuilder()
         self.house_generator = HouseGenerator(config)
-        self.park_generator = ParkGenerator()
+        self.park_generator = ParkGenerator(self.seeds.random(STREAM_PARK))
+        if config.TOPOLOGY not in ("classic", "tiled"):
+            raise ValueError(f"неизвестная TOPOLOGY: {config.TOPOLOGY!r}")
 
-    def generate(self) -> CityLayout:
-        main_street_nodes: List[Tuple[float, float]] = self.block_builder.node_generator.generate_main_street_nodes(10)
-        main_street_roads: List[LineString] = self.road_builder.generate_road_from_points(main_street_nodes)
+    def _street_generator(self, street_id: int) -> NodeGenerator:
+        return NodeGenerator(self.config, self.seeds.random(STREAM_STREETS, street_id))
+
+    def resolve_skeleton(self) -> CitySkeleton:
+        """
+        Последовательный и дешёвый этап: магистрали, парк и узлы всех кварталов.
+        Кварталы зависят друг от друга только граничными рядами узлов.
+        """
+        if self.config.TOPOLOGY == "tiled":
+            return TiledPlan(self.config, self.block_builder, self.seeds).resolve()
 
-        first_block = self.block_builder.create_block_down(top_side=LineString(main_street_nodes[5:-1]))
-        park_right_side: List[Tuple[float, float]] = [line[0] for line in first_block.nodes]
+        main_street_nodes: List[Tuple[float, float]] = self._street_generator(0).generate_main_street_nodes(10)
 
-        park_polygon = self.park_generator.generate_polygon_from_sides(LineString(park_right_side), LineString(main_street_nodes[3:5]))
+        first_nodes = self.block_builder.nodes_down(top_side=LineString(main_street_nodes[5:-1]), block_id=0)
+        park_right_side: List[Tuple[float, float]] = [line[0] for line in first_nodes]
+
+        with self.profiler.stage("park"):
+            park_polygon = self.park_generator.generate_polygon_from_sides(LineString(park_right_side), LineString(main_street_nodes[3:5]))
         bottom_park_side = list(reversed(park_polygon.exterior.coords[-5:-1]))
 
-        second_block = self.block_builder.create_block_down(top_side=LineString(bottom_park_side))
-        third_block = self.block_builder.create_block_right_down(left_side=LineString(line[-1] for line in second_block.nodes), top_side=LineString(first_block.nodes[-1]))
+        second_nodes = self.block_builder.nodes_down(top_side=LineString(bottom_park_side), block_id=1)
+        third_nodes = self.block_builder.nodes_right_down(left_side=LineString(line[-1] for line in second_nodes), top_side=LineString(first_nodes[-1]), block_id=2)
 
-        fourth_block = self.block_builder.create_block_up(bottom_side=LineString(main_street_nodes[3:6]))
+        fourth_nodes = self.block_builder.nodes_up(bottom_side=LineString(main_street_nodes[3:6]), block_id=3)
 
-        fifth_block = self.block_builder.create_block_up_right(bottom_side=LineString(main_street_nodes[5:9]), left_side=LineString(line[-1] for line in fourth_block.nodes))
+        fifth_nodes = self.block_builder.nodes_up_right(bottom_side=LineString(main_street_nodes[5:9]), left_side=LineString(line[-1] for line in fourth_nodes), block_id=4)
 
-        new_main_street_nodes = self.block_builder.node_generator.generate_main_street_nodes_from(10, (0, -1550))
-        new_main_street_roads = self.road_builder.generate_road_from_points(new_main_street_nodes)
+        new_main_street_nodes = self._street_generator(1).generate_main_street_nodes_from(10, (0, -1550))
 
-        fourth_block = self.block_builder.create_block_between_roads(LineString(second_block.nodes[-1]), LineString(new_main_street_nodes[3:7]))
-        blocks = [first_block, second_block, third_block, fourth_block, fifth_block]
-        all_roads = [road for block in blocks for road in block.roads]
-        all_roads += main_street_roads
-        all_roads += new_main_street_roads
+        # квартал над магистралью нужен только как левая граница пятого, его место занимает квартал между магистралями
+        fourth_nodes = self.block_builder.nodes_between_roads(LineString(second_nodes[-1]), LineString(new_main_street_nodes[3:7]), block_id=5)
 
-        return CityLayout(
-            main_street_nodes=main_street_nodes + new_main_street_nodes,
-            main_street_roads=main_street_roads,
-            blocks=blocks,
+        return CitySkeleton(
+            streets=[main_street_nodes, new_main_street_nodes],
             park_polygon=park_polygon,
-            all_roads=all_roads,
+            blocks=[(0, first_nodes), (1, second_nodes), (2, third_nodes), (5, fourth_nodes), (4, fifth_nodes)],
         )
 
+    def _executor(self) -> ContextManager[Optional[Executor]]:
+        if self.config.WORKERS <= 1:
+            return nullcontext()
+        if self.config.EXECUTOR == "thread":
+            return ThreadPoolExecutor(max_workers=self.config.WORKERS)
+        return ProcessPoolExecutor(max_workers=self.config.WORKERS)
 
-class CityPlotter:
-    """
-    Отвечает только за отрисовку результата.
-    """
+    def finalize_blocks(self, skeleton: CitySkeleton) -> List[Block]:
+        """
+        Дороги и дома всех кварталов. При config.WORKERS > 1 кварталы считаются в пуле;
+        потоки случайности привязаны к block_id, поэтому результат совпадает с последовательным.
+        С кэшем считаются только кварталы, которых в нём нет.
+        """
+        with self._executor() as pool:
+            return self._finalize(skeleton.blocks, pool)
 
-    def __init__(self, config: CityConfig, house_generator: HouseGenerator):
-        self.config = config
-        self.house_generator = house_generator
+    def _finalize(self, block_nodes: List[Tuple[int, Nodes]], pool: Optional[Executor]) -> List[Block]:
+        blocks: List[Optional[Block]] = [None] * len(block_nodes)
+        keys: List[Optional[str]] = [None] * len(block_nodes)
+        if self.cache is not None:
+            for i, (block_id, nodes) in enumerate(block_nodes):
+                keys[i] = block_key(self.config, self.seeds.entropy, block_id, nodes)
+                blocks[i] = self.cache.get(keys[i])
+            self.profiler.count("cache.block_hits", sum(block is not None for block in blocks))
+        missing = [i for i, block in enumerate(blocks) if block is None]
+
+        if pool is None:
+            for i in missing:
+                block_id, nodes = block_nodes[i]
+                blocks[i] = self.block_builder.finalize_block(nodes, block_id)
+        elif isinstance(pool, ThreadPoolExecutor):
+            # потоки делят self.block_builder, и с ним — профилировщик
+            futures = {i: pool.submit(self.block_builder.finalize_block, block_nodes[i][1], block_nodes[i][0]) for i in missing}
+            for i, future in futures.items():
+                blocks[i] = future.result()
+        else:
+            # в процессах профилировщика нет: в отчёт попадает только общее время finalize_blocks
+            futures = {i: pool.submit(finalize_block, self.config, self.seeds, *block_nodes[i]) for i in missing}
+            for i, future in futures.items():
+                blocks[i] = future.result()
+
+        if self.cache is not None:
+            for i in missing:
+                self.cache.put(keys[i], blocks[i])
+        return blocks
+
+    def _block_branches(self, block_id: int, nodes: Nodes, block: Block) -> List[LineString]:
+        with self.profiler.stage("branches", block=block_id) as span:
+            rng = self.seeds.random(STREAM_BRANCHES, block_id)
+            branches = generate_branches(block.roads, get_city_border(nodes), self.config, rng)
+            span["branches"] = len(branches)
+        return branches
 
-    def plot(self, layout: CityLayout):
-        if not self.config.SHOW_LOCAL:
+    def generate_branches(self, skeleton: CitySkeleton, blocks: List[Block]) -> List[LineString]:
+        """
+        Ответвления внутри кварталов: каждое проверяется по контуру своего квартала,
+        поэтому стоимость проверки не растёт с размером города.
+        """
+        branches: List[LineString] = []
+        for (block_id, nodes), block in zip(skeleton.blocks, blocks):
+            branches += self._block_branches(block_id, nodes, block)
+        return branches
+
+    def _iter_plan(self) -> Iterator[Tuple[int, List[List[Point2D]], List[Tuple[int, Nodes]]]]:
+        """
+        Каркас по частям: (номер части, участки магистралей, кварталы). В плиточном городе — по столбцу
+        плана, в классическом — весь каркас одной частью (он из пяти кварталов).
+        """
+        if self.config.TOPOLOGY == "classic":
+            skeleton = self.resolve_skeleton()
+            yield 0, skeleton.streets, skeleton.blocks
             return
+        for plan_column in TiledPlan(self.config, self.block_builder, self.seeds).iter_columns():
+            yield plan_column.index, plan_column.street_chunks, plan_column.blocks
 
-        plt.ion()
-        fig, ax = plt.subplots(figsize=(10, 10))
-        ax.set_aspect("equal")
-        m = 3000
-        ax.set_xlim(-m, m)
-        ax.set_ylim(-m, m)
+    def iter_blocks(self) -> Iterator[StreamedBlock]:
+        """
+        Кварталы по одному, как только готовы их дороги и дома (и ответвления при config.BRANCHES).
 
-        for node in layout.main_street_nodes:
-            x, y = node
-            ax.scatter(x, y, color="red", s=10)
+        В плиточном городе план строится столбцами, и между столбцами хранятся только граничные
+        столбцы узлов, поэтому память не растёт с config.BLOCKS_PER_STREET: поток можно сразу писать
+        в файл (export.write_geojson_stream) или рисовать (render.render_stream). Кварталы совпадают
+        с кварталами generate() при том же сиде. Парк и его содержимое в поток не входят.
+        С пулом (config.WORKERS > 1) параллельно считаются кварталы одного столбца.
+        """
+        position = 0
+        with self._executor() as pool:
+            for index, street_chunks, block_nodes in self._iter_plan():
+                with self.profiler.stage("streets") as span:
+                    street_roads = [road for chunk in street_chunks for road in self.road_builder.generate_road_from_points(chunk)]
+                    span["roads"] = len(street_roads)
+                with self.profiler.stage("finalize_blocks"):
+                    blocks = self._finalize(block_nodes, pool)
+                # соседние участки магистрали делят узел; в поток он попадает один раз
+                street_nodes = [node for chunk in street_chunks for node in (chunk[1:] if index else chunk)]
+                for i, ((block_id, nodes), block) in enumerate(zip(block_nodes, blocks)):
+                    yield StreamedBlock(
+                        block_id=block_id,
+                        index=position,
+                        block=block,
+                        street_nodes=street_nodes if i == 0 else [],
+                        street_roads=street_roads if i == 0 else [],
+                        branches=self._block_branches(block_id, nodes, block) if self.config.BRANCHES else [],
+                    )
+                    position += 1
 
+    def _park_factory(self, park_polygon: Polygon) -> Callable[[], ParkContents]:
+        config = self.config
+        return partial(
+            generate_park_contents,
+            park_polygon,
+            config.PARK_TREES,
+            config.PARK_LAWNS,
+            config.PARK_PATHS,
+            config.PARK_LAWN_WIDTH,
+            config.PARK_LAWN_HEIGHT,
+            self.seeds.child_seed(STREAM_PARK_CONTENTS),
+        )
 
-        for block in layout.blocks:
-            for row in block.nodes:
-                for x, y in row:
-                    ax.scatter(x, y, color="red", s=10)
+    def generate(self) -> CityLayout:
+        with self.profiler.stage("generate"):
+            key = layout_key(self.config, self.seeds.entropy) if self.cache is not None else None
+            layout = self.cache.get(key) if key is not None else None
+            if key is not None:
+                self.profiler.count("cache.layout_hits", layout is not None)
+            if layout is None:
+                layout = self._generate()
+                if key is not None:
+                    self.cache.put(key, layout)
+            return CompactCityLayout.from_layout(layout) if self.config.COMPACT_LAYOUT else layout
 
-            if self.config.ANIMATE_HOUSES:
-                self.house_generator.generate_houses(block.nodes, self.config.CELL, layout.all_roads, ax)
-            else:
-                for house in block.houses:
-                    x, y = house.exterior.xy
-                    ax.fill(x, y, color="brown", alpha=1, edgecolor="black", linewidth=1)
-            plt.show()
-            plt.pause(0.1)
+    def _generate(self) -> CityLayout:
+        profiler = self.profiler
+        with profiler.stage("skeleton") as span:
+            skeleton = self.resolve_skeleton()
+            span["blocks"] = len(skeleton.blocks)
+        with profiler.stage("streets") as span:
+            street_roads = [self.road_builder.generate_road_from_points(street) for street in skeleton.streets]
+            span["roads"] = sum(len(roads) for roads in street_roads)
+        # в классическом городе main_street_roads — только первая магистраль
+        main_street_roads: List[LineString] = street_roads[0] if self.config.TOPOLOGY == "classic" else [road for roads in street_roads for road in roads]
 
-        for road in layout.all_roads:
-            x, y = road.xy
-            ax.plot(x, y, color="black", linewidth=1)
+        with profiler.stage("finalize_blocks"):
+            blocks = self.finalize_blocks(skeleton)
+        all_roads = [road for block in blocks for road in block.roads]
+        for roads in street_roads:
+            all_roads += roads
+
+        return CityLayout(
+            main_street_nodes=[node for street in skeleton.streets for node in street],
+            main_street_roads=main_street_roads,
+            blocks=blocks,
+            park_polygon=skeleton.park_polygon,
+            all_roads=all_roads,
+            branches=self.generate_branches(skeleton, blocks) if self.config.BRANCHES else [],
+            park_factory=self._park_factory(skeleton.park_polygon),
+        )
 
-        draw_polygon(ax=ax, poly=layout.park_polygon)
-        plt.draw()
-        plt.pause(1000)
+
+def __getattr__(name: str):
+    # CityPlotter переехал в plotting; импорт из generate продолжает работать без matplotlib в ядре
+    if name == "CityPlotter":
+        from .plotting import CityPlotter
+
+        return CityPlotter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def main():
+    from .plotting import CityPlotter
+
     config = CityConfig()
     city_generator = CityGenerator(config)
     layout = city_generator.generate()
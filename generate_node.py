@@ -1,12 +1,26 @@
 import random
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from .config import CityConfig
 
 
 class NodeGenerator:
-    def __init__(self, config: CityConfig):
+    def __init__(self, config: CityConfig, rng: Optional[random.Random] = None, np_rng: Optional[np.random.Generator] = None):
         self.config = config
+        self.rng = rng if rng is not None else random
+        self._np_rng = np_rng
+
+    @property
+    def np_rng(self) -> np.random.Generator:
+        """
+        Генератор NumPy для *_array-методов. Если не передан явно, порождается из rng
+        при первом обращении, так что скалярные методы его поток не трогают.
+        """
+        if self._np_rng is None:
+            self._np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        return self._np_rng
 
     def generate_main_street_nodes(self, grid: int, base: float = 300.0, spread: float = 107.0) -> List[Tuple[float, float]]:
         """
@@ -15,13 +29,13 @@ class NodeGenerator:
         """
         xs = [0]
         for _ in range(grid - 1):
-            step = base + random.uniform(-spread, spread)
+            step = base + self.rng.uniform(-spread, spread)
             xs.append(xs[-1] + step)
 
         main_nodes = []
         for x in xs:
-            nx = x + random.uniform(-self.config.OFFSET, self.config.OFFSET)
-            ny = random.uniform(-self.config.OFFSET, self.config.OFFSET)
+            nx = x + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
+            ny = self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
             main_nodes.append((nx, ny))
         return main_nodes
 
@@ -41,13 +55,13 @@ class NodeGenerator:
 
         xs = [0.0]
         for _ in range(grid - 1):
-            step = base + random.uniform(-spread, spread)
+            step = base + self.rng.uniform(-spread, spread)
             xs.append(xs[-1] + step)
 
         main_nodes = []
         for x in xs:
-            nx = x0 + x + random.uniform(-self.config.OFFSET, self.config.OFFSET)
-            ny = y0 + random.uniform(-self.config.OFFSET, self.config.OFFSET)
+            nx = x0 + x + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
+            ny = y0 + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
             main_nodes.append((nx, ny))
 
         return main_nodes
@@ -66,10 +80,10 @@ class NodeGenerator:
 
             for j in range(grid):
                 px, py = prev_row[j]
-                dy = random.uniform(min_d, max_d)
+                dy = self.rng.uniform(min_d, max_d)
                 y = py - dy
-                x = px + random.uniform(-self.config.OFFSET, self.config.OFFSET)
-                y = y + random.uniform(-self.config.OFFSET, self.config.OFFSET)
+                x = px + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
+                y = y + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
 
                 if j > 0:
                     prev_x, _prev_y = new_row[j - 1]
@@ -96,10 +110,10 @@ class NodeGenerator:
 
             for j in range(grid):
                 px, py = prev_row[j]
-                dy = random.uniform(min_d, max_d)
+                dy = self.rng.uniform(min_d, max_d)
                 y = py + dy
-                x = px + random.uniform(-self.config.OFFSET, self.config.OFFSET)
-                y = y + random.uniform(-self.config.OFFSET, self.config.OFFSET)
+                x = px + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
+                y = y + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
 
                 if j > 0:
                     prev_x, _prev_y = new_row[j - 1]
@@ -132,8 +146,8 @@ class NodeGenerator:
             for _ in range(1, len(top_side)):
                 x_prev, y_prev = new_row[-1]
                 new_point = (
-                    x_prev + random.uniform(min_d, max_d),
-                    y_prev + random.uniform(-self.config.OFFSET, self.config.OFFSET),
+                    x_prev + self.rng.uniform(min_d, max_d),
+                    y_prev + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET),
                 )
                 new_row.append(new_point)
             nodes.append(new_row)
@@ -162,8 +176,8 @@ class NodeGenerator:
             for _ in range(1, len(bottom_side)):
                 x_prev, y_prev = new_row[-1]
                 new_point = (
-                    x_prev + random.uniform(min_d, max_d),      # вправо
-                    y_prev + random.uniform(-self.config.OFFSET, self.config.OFFSET),
+                    x_prev + self.rng.uniform(min_d, max_d),      # вправо
+                    y_prev + self.rng.uniform(-self.config.OFFSET, self.config.OFFSET),
                 )
                 new_row.append(new_point)
 
@@ -200,7 +214,7 @@ class NodeGenerator:
 
                 # лёгкая неровность для внутренних рядов
                 if 0 < r < total_rows:
-                    y += random.uniform(-self.config.OFFSET, self.config.OFFSET)
+                    y += self.rng.uniform(-self.config.OFFSET, self.config.OFFSET)
 
                 row.append((x, y))
 
@@ -208,3 +222,123 @@ class NodeGenerator:
 
         return nodes
 
+    # ==============================
+    # ВЕКТОРИЗОВАННЫЕ ВАРИАНТЫ
+    # ==============================
+    # Все смещения квартала берутся одним вызовом генератора, результат — массив (rows + 1, cols, 2).
+    # Поток случайности другой, чем у скалярных методов, поэтому сетки совпадают по распределению, а не поточечно.
+
+    @staticmethod
+    def to_rows(nodes: np.ndarray) -> List[List[Tuple[float, float]]]:
+        """
+        Массив узлов -> списки кортежей, как у скалярных методов.
+        """
+        return [[tuple(point) for point in row] for row in nodes.tolist()]
+
+    @staticmethod
+    def _clamp_spacing(xs: np.ndarray, min_d: float, max_d: float) -> np.ndarray:
+        """
+        Ограничивает шаг между соседними узлами ряда отрезком [min_d, max_d] так же, как скалярные
+        методы: каждый узел сравнивается с уже исправленным левым соседом. Цикл идёт по столбцам,
+        все ведущие оси (ряды) обрабатываются разом.
+        """
+        out = np.array(xs, dtype=float)
+        for j in range(1, out.shape[-1]):
+            np.clip(out[..., j], out[..., j - 1] + min_d, out[..., j - 1] + max_d, out=out[..., j])
+        return out
+
+    def generate_main_street_nodes_array(
+        self,
+        grid: int,
+        start: Tuple[float, float] = (0.0, 0.0),
+        base: float = 300.0,
+        spread: float = 107.0,
+    ) -> np.ndarray:
+        """
+        Магистраль из grid узлов, начиная с точки start. Результат — массив (grid, 2).
+        """
+        offset = self.config.OFFSET
+        steps = base + self.np_rng.uniform(-spread, spread, grid - 1)
+        xs = np.concatenate([[0.0], np.cumsum(steps)])
+        jitter = self.np_rng.uniform(-offset, offset, (grid, 2))
+        return np.stack([start[0] + xs, np.full(grid, float(start[1]))], axis=-1) + jitter
+
+    def _block_nodes_vertical_array(self, side: Sequence[Tuple[float, float]], rows: int, min_d: float, max_d: float, direction: float) -> np.ndarray:
+        side_arr = np.asarray(side, dtype=float)
+        cols = len(side_arr)
+        offset = self.config.OFFSET
+
+        dy = self.np_rng.uniform(min_d, max_d, (rows, cols))
+        jitter_x = self.np_rng.uniform(-offset, offset, (rows, cols))
+        jitter_y = self.np_rng.uniform(-offset, offset, (rows, cols))
+
+        dy *= direction
+        dy += jitter_y
+
+        nodes = np.empty((rows + 1, cols, 2))
+        nodes[0] = side_arr
+        nodes[1:, :, 1] = side_arr[:, 1] + np.cumsum(dy, axis=0)
+        # следующий ряд строится от уже исправленного, как в скалярном варианте
+        for i in range(1, rows + 1):
+            nodes[i, :, 0] = self._clamp_spacing(nodes[i - 1, :, 0] + jitter_x[i - 1], min_d, max_d)
+        return nodes
+
+    def generate_block_nodes_from_road_down_array(self, top_side: Sequence[Tuple[float, float]], rows: int, min_d: float = 200, max_d: float = 300) -> np.ndarray:
+        return self._block_nodes_vertical_array(top_side, rows, min_d, max_d, direction=-1.0)
+
+    def generate_block_nodes_from_road_up_array(self, bottom_side: Sequence[Tuple[float, float]], rows: int, min_d: float = 200, max_d: float = 300) -> np.ndarray:
+        return self._block_nodes_vertical_array(bottom_side, rows, min_d, max_d, direction=1.0)
+
+    def _block_nodes_rightward_array(self, first_row: Sequence[Tuple[float, float]], left_side: Sequence[Tuple[float, float]], rows: int, min_d: float, max_d: float) -> np.ndarray:
+        first = np.asarray(first_row, dtype=float)
+        left = np.asarray(left_side, dtype=float)[1:rows + 1]
+        cols = len(first)
+        offset = self.config.OFFSET
+
+        steps = np.empty((rows, cols - 1, 2))
+        steps[..., 0] = self.np_rng.uniform(min_d, max_d, (rows, cols - 1))
+        steps[..., 1] = self.np_rng.uniform(-offset, offset, (rows, cols - 1))
+
+        nodes = np.empty((rows + 1, cols, 2))
+        nodes[0] = first
+        nodes[1:, 0] = left
+        nodes[1:, 1:] = left[:, None, :] + np.cumsum(steps, axis=1)
+        return nodes
+
+    def generate_block_nodes_from_road_right_down_array(
+        self,
+        top_side: Sequence[Tuple[float, float]],
+        left_side: Sequence[Tuple[float, float]],
+        rows: int,
+        min_d: float = 200,
+        max_d: float = 300,
+    ) -> np.ndarray:
+        return self._block_nodes_rightward_array(top_side, left_side, rows, min_d, max_d)
+
+    def generate_block_nodes_from_road_up_right_array(
+        self,
+        bottom_side: Sequence[Tuple[float, float]],
+        left_side: Sequence[Tuple[float, float]],
+        rows: int,
+        min_d: float = 200,
+        max_d: float = 300,
+    ) -> np.ndarray:
+        return self._block_nodes_rightward_array(bottom_side, left_side, rows, min_d, max_d)
+
+    def generate_block_nodes_between_top_bottom_array(
+        self,
+        top_side: Sequence[Tuple[float, float]],
+        bottom_side: Sequence[Tuple[float, float]],
+        rows: int,
+    ) -> np.ndarray:
+        top = np.asarray(top_side, dtype=float)
+        bottom = np.asarray(bottom_side, dtype=float)
+        assert top.shape == bottom.shape, \
+            "top_side и bottom_side должны иметь одинаковое число точек"
+
+        t = np.arange(rows + 1, dtype=float)[:, None, None] / rows
+        nodes = top + (bottom - top) * t
+        # лёгкая неровность для внутренних рядов
+        offset = self.config.OFFSET
+        nodes[1:-1, :, 1] += self.np_rng.uniform(-offset, offset, (rows - 1, len(top)))
+        return nodes
@@ -0,0 +1,200 @@
+"""
+Граф дорожной сети.
+
+Концы дорог привязываются к целочисленным номерам узлов через хэш-сетку с шагом tolerance:
+точки из одной или соседних ячеек ближе tolerance считаются одним узлом; дорога, внутри которой
+оказался чужой узел (Т-образное примыкание ответвления), режется в нём. Дороги вдоль общих
+границ кварталов приходят в all_roads дважды — после привязки такие рёбра совпадают и
+схлопываются в одно. Смежность хранится в CSR (indptr, indices, weights), запросы кратчайших
+путей и связности идут через scipy.sparse.csgraph (scipy импортируется только при запросе).
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+
+from .models import CityLayout
+
+# соседние ячейки хэш-сетки, которые нужно сравнить с текущей (каждая пара — один раз)
+_NEIGHBOURS = ((0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    # две координаты ячейки в одно int64; для городов в пределах ±2^31 ячеек коллизий нет
+    return (cells[:, 0] << 32) + (cells[:, 1] & 0xFFFFFFFF)
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def snap_points(points: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Привязка точек (n, 2) к узлам. Возвращает координаты узлов (k, 2) и номер узла каждой точки (n,).
+    """
+    cells = np.floor(points / tolerance).astype(np.int64)
+    keys = _cell_keys(cells)
+    unique_keys, first, cell_of_point = np.unique(keys, return_index=True, return_inverse=True)
+    representatives = points[first]
+
+    # склейка ячеек, представители которых ближе tolerance, через соседей по хэш-сетке
+    parent = np.arange(len(unique_keys))
+    unique_cells = cells[first]
+    for dx, dy in _NEIGHBOURS:
+        neighbour_keys = _cell_keys(unique_cells + (dx, dy))
+        position = np.minimum(np.searchsorted(unique_keys, neighbour_keys), len(unique_keys) - 1)
+        found = np.nonzero(unique_keys[position] == neighbour_keys)[0]
+        close = np.hypot(*(representatives[found] - representatives[position[found]]).T) <= tolerance
+        for a, b in zip(found[close].tolist(), position[found[close]].tolist()):
+            root_a, root_b = _find(parent, a), _find(parent, b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    # сжатие путей для всех ячеек разом: родитель всегда меньше потомка, так что процесс сходится
+    while np.any(parent[parent] != parent):
+        parent = parent[parent]
+    node_roots, node_of_cell = np.unique(parent, return_inverse=True)
+    return representatives[node_roots], node_of_cell[cell_of_point]
+
+
+def _split_at_junctions(roads: np.ndarray, nodes: np.ndarray, ends: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Рёбра (u, v) и их длины с учётом Т-образных примыканий: если узел лежит внутри чужой дороги
+    (например, начало ответвления), дорога режется в нём на части.
+    """
+    points = shapely.points(nodes)
+    node_index, road_index = shapely.STRtree(roads).query(points, predicate="dwithin", distance=tolerance)
+    interior = (ends[road_index, 0] != node_index) & (ends[road_index, 1] != node_index)
+    node_index, road_index = node_index[interior], road_index[interior]
+    lengths = shapely.length(roads)
+    if not len(road_index):
+        return ends, lengths
+
+    # остановки вдоль каждой дороги: оба конца и внутренние узлы, упорядоченные по расстоянию от начала
+    n = len(roads)
+    stop_road = np.concatenate([np.arange(n), road_index, np.arange(n)])
+    stop_node = np.concatenate([ends[:, 0], node_index, ends[:, 1]])
+    stop_at = np.concatenate([np.zeros(n), shapely.line_locate_point(roads[road_index], points[node_index]), lengths])
+    order = np.lexsort((stop_at, stop_road))
+    stop_road, stop_node, stop_at = stop_road[order], stop_node[order], stop_at[order]
+    same_road = stop_road[1:] == stop_road[:-1]
+    pairs = np.column_stack((stop_node[:-1], stop_node[1:]))[same_road]
+    return pairs, np.diff(stop_at)[same_road]
+
+
+class RoadGraph:
+    """
+    Неориентированный граф дорог. nodes — координаты узлов (n, 2), edges — пары (u, v) с u < v,
+    lengths — длины рёбер по геометрии дороги; indptr/indices/weights — та же смежность в CSR,
+    каждое ребро в обе стороны.
+    """
+
+    def __init__(self, nodes: np.ndarray, edges: np.ndarray, lengths: np.ndarray):
+        self.nodes = nodes
+        self.edges = edges
+        self.lengths = lengths
+
+        n = len(nodes)
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.argsort(sources, kind="stable")
+        self.indices = targets[order].astype(np.int32)
+        self.weights = np.concatenate([lengths, lengths])[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n))]).astype(np.int64)
+        self._csgraph = None
+
+    @classmethod
+    def from_roads(cls, roads: Iterable[LineString], tolerance: float = 1e-6) -> "RoadGraph":
+        roads = np.asarray(list(roads), dtype=object)
+        if not len(roads):
+            return cls(np.empty((0, 2)), np.empty((0, 2), dtype=np.int32), np.empty(0))
+
+        ends = np.concatenate([
+            shapely.get_coordinates(shapely.get_point(roads, 0)),
+            shapely.get_coordinates(shapely.get_point(roads, -1)),
+        ])
+        nodes, node_ids = snap_points(ends, tolerance)
+        pairs, lengths = _split_at_junctions(roads, nodes, node_ids.reshape(2, -1).T, tolerance)
+
+        # петли выбрасываем, из совпадающих рёбер оставляем самое короткое
+        keep = pairs[:, 0] != pairs[:, 1]
+        pairs, lengths = np.sort(pairs[keep], axis=1), lengths[keep]
+        order = np.lexsort((lengths, pairs[:, 1], pairs[:, 0]))
+        pairs, lengths = pairs[order], lengths[order]
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = np.any(pairs[1:] != pairs[:-1], axis=1)
+        return cls(nodes, pairs[first].astype(np.int32), lengths[first])
+
+    @classmethod
+    def from_layout(cls, layout: CityLayout, tolerance: float = 1e-6) -> "RoadGraph":
+        """
+        Граф всех дорог города вместе с ответвлениями.
+        """
+        return cls.from_roads(list(layout.all_roads) + list(layout.branches), tolerance)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edges)
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbours(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def to_csgraph(self):
+        """
+        Матрица смежности scipy.sparse.csr_matrix (n, n) с длинами рёбер.
+        """
+        if self._csgraph is None:
+            from scipy.sparse import csr_matrix
+
+            self._csgraph = csr_matrix((self.weights, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+        return self._csgraph
+
+    def nearest_nodes(self, points: np.ndarray) -> np.ndarray:
+        """
+        Ближайший узел для каждой точки (m, 2) — например, для привязки домов к сети.
+        """
+        from scipy.spatial import cKDTree
+
+        _distance, index = cKDTree(self.nodes).query(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        return index
+
+    def shortest_paths(self, sources: Sequence[int], return_predecessors: bool = False, limit: float = np.inf):
+        """
+        Длины кратчайших путей из каждого узла sources во все узлы: массив (len(sources), n),
+        недостижимые — inf. Все источники считаются одним вызовом dijkstra.
+        """
+        from scipy.sparse.csgraph import dijkstra
+
+        return dijkstra(self.to_csgraph(), directed=False, indices=np.asarray(sources), return_predecessors=return_predecessors, limit=limit)
+
+    def path(self, source: int, target: int) -> Optional[List[int]]:
+        """
+        Узлы кратчайшего пути source -> target или None, если target недостижим.
+        """
+        _distances, predecessors = self.shortest_paths([source], return_predecessors=True)
+        predecessors = predecessors[0]
+        if source != target and predecessors[target] < 0:
+            return None
+        nodes = [target]
+        while nodes[-1] != source:
+            nodes.append(int(predecessors[nodes[-1]]))
+        return nodes[::-1]
+
+    def components(self) -> Tuple[int, np.ndarray]:
+        """
+        Компоненты связности: их число и номер компоненты каждого узла.
+        """
+        from scipy.sparse.csgraph import connected_components
+
+        return connected_components(self.to_csgraph(), directed=False)
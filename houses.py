@@ -1,105 +1,287 @@
 import math
 import random
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
-from shapely.geometry import LineString, Point, Polygon
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
 
+from .cells import CellGrid, _quads_to_polygons
 from .config import CityConfig
 from .models import Point2D
+from .poisson import POISSON_STATS, poisson_squares
+from .profiling import NULL_PROFILER, Profiler
+from .spatial import GridIndex
+
+HOUSE_ENGINES = ("scalar", "vectorized")
+INTERIOR_MODES = ("random", "poisson")
 
 
 class HouseGenerator:
-    def __init__(self, config: CityConfig):
+    def __init__(self, config: CityConfig, rng: Optional[random.Random] = None, profiler: Optional[Profiler] = None):
         self.config = config
+        self.rng = rng if rng is not None else random
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        if config.HOUSE_ENGINE not in HOUSE_ENGINES:
+            raise ValueError(f"неизвестный HOUSE_ENGINE: {config.HOUSE_ENGINE!r}, ожидается один из {HOUSE_ENGINES}")
+        if config.INTERIOR_MODE not in INTERIOR_MODES:
+            raise ValueError(f"неизвестный INTERIOR_MODE: {config.INTERIOR_MODE!r}, ожидается один из {INTERIOR_MODES}")
+
+    def _is_free(self, house: Polygon, index: GridIndex, spacing: float) -> Tuple[bool, int]:
+        """
+        Проверка, что house отстоит от всех уже поставленных домов квартала дальше spacing.
+        Точные расстояния считаются только до соседей из индекса; второе значение — сколько
+        вызовов shapely distance понадобилось.
+        """
+        neighbours = index.query(house.bounds, spacing)
+        for calls, other in enumerate(neighbours, 1):
+            if house.distance(other) <= spacing:
+                return False, calls
+        return True, len(neighbours)
+
+    def generate_roadside_houses(self, nodes: List[List[Point2D]], cell_size: float, cells: Optional[CellGrid] = None) -> Tuple[List[Polygon], List[List[Polygon]]]:
+        """
+        Дома вдоль рёбер ячеек выбранным движком (config.HOUSE_ENGINE).
+        Возвращает полигоны ячеек и списки домов по ячейкам в порядке обхода сетки по строкам.
+        cells — уже построенная геометрия ячеек тех же nodes.
+        """
+        cells = cells if cells is not None else CellGrid(nodes)
+        if self.config.HOUSE_ENGINE == "vectorized":
+            roadside = self._roadside_vectorized(cells, cell_size)
+        else:
+            roadside = self._roadside_scalar(cells, cell_size)
+        return list(cells.polygons), roadside
+
+    def _roadside_scalar(self, cells: CellGrid, cell_size: float) -> List[List[Polygon]]:
+        edge_len = cell_size * 0.27
+        edge_height = cell_size * 0.12
+        road_offset = cell_size * 0.14
+
+        # углы домов копятся списками и превращаются в полигоны одним вызовом в конце
+        corners: List[Tuple[Tuple[float, float], ...]] = []
+        counts: List[int] = []
+        for c, ring in enumerate(cells.rings.tolist()):
+            n_before = len(corners)
+            for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                dx, dy = x2 - x1, y2 - y1
+                length = math.hypot(dx, dy)
+                if length == 0:
+                    continue
+
+                ux, uy = dx / length, dy / length
+                nx, ny = -uy, ux
+
+                step = 0.023 * length
+                house_len = edge_len
+                total = 0.3 * length
+
+                while total + house_len < length * 0.95:
+                    bx = x1 + ux * total
+                    by = y1 + uy * total
+
+                    if not cells.contains_point(c, bx + nx * road_offset, by + ny * road_offset):
+                        nx, ny = -nx, -ny
+
+                    hx = bx + nx * road_offset
+                    hy = by + ny * road_offset
+                    corners.append((
+                        (hx - ux * edge_len / 2 - nx * edge_height / 2, hy - uy * edge_len / 2 - ny * edge_height / 2),
+                        (hx + ux * edge_len / 2 - nx * edge_height / 2, hy + uy * edge_len / 2 + -ny * edge_height / 2),
+                        (hx + ux * edge_len / 2 + nx * edge_height / 2, hy + uy * edge_len / 2 + ny * edge_height / 2),
+                        (hx - ux * edge_len / 2 + nx * edge_height / 2, hy - uy * edge_len / 2 + ny * edge_height / 2),
+                    ))
+                    total += house_len + step
+            counts.append(len(corners) - n_before)
+
+        houses = _quads_to_polygons(np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2))
+        bounds = np.concatenate([[0], np.cumsum(counts)]).tolist()
+        return [list(houses[bounds[c]:bounds[c + 1]]) for c in range(len(cells))]
+
+    def _roadside_vectorized(self, cells: CellGrid, cell_size: float) -> List[List[Polygon]]:
+        """
+        Тот же алгоритм, что и _roadside_scalar, но для всех рёбер сразу:
+        центры, ориентации и углы домов считаются массивами NumPy,
+        проверка стороны — пакетная CellGrid.contains_points, полигоны строятся одним вызовом.
+        Цикл остаётся только по номеру дома на ребре (их единицы).
+        """
+        n_cells = len(cells)
+
+        edge_len = cell_size * 0.27
+        edge_height = cell_size * 0.12
+        road_offset = cell_size * 0.14
+
+        start = cells.starts.reshape(-1, 2)
+        edge_cell = np.repeat(np.arange(n_cells), 4)
+        x1, y1 = start[:, 0], start[:, 1]
+        ux, uy = cells.units[..., 0].ravel(), cells.units[..., 1].ravel()
+        length = cells.lengths.ravel()
+        valid = length != 0
+        nx, ny = cells.normals[..., 0].ravel(), cells.normals[..., 1].ravel()
 
-    def generate_houses(self, nodes: List[List[Point2D]], cell_size: float, roads, ax=None):
+        step = 0.023 * length
+        house_len = edge_len
+        total = 0.3 * length
+
+        edge_ids: List[np.ndarray] = []
+        slots: List[np.ndarray] = []
+        corners: List[np.ndarray] = []
+        k = 0
+        active = valid & (total + house_len < length * 0.95)
+        while active.any():
+            e = np.flatnonzero(active)
+            bx = x1[e] + ux[e] * total[e]
+            by = y1[e] + uy[e] * total[e]
+
+            # нормаль переворачивается и остаётся перевёрнутой для следующих домов ребра
+            outside = ~cells.contains_points(edge_cell[e], bx + nx[e] * road_offset, by + ny[e] * road_offset)
+            nx[e[outside]] = -nx[e[outside]]
+            ny[e[outside]] = -ny[e[outside]]
+
+            enx, eny, eux, euy = nx[e], ny[e], ux[e], uy[e]
+            hx = bx + enx * road_offset
+            hy = by + eny * road_offset
+            corners.append(
+                np.stack(
+                    [
+                        np.stack([hx - eux * edge_len / 2 - enx * edge_height / 2, hy - euy * edge_len / 2 - eny * edge_height / 2], axis=-1),
+                        np.stack([hx + eux * edge_len / 2 - enx * edge_height / 2, hy + euy * edge_len / 2 + -eny * edge_height / 2], axis=-1),
+                        np.stack([hx + eux * edge_len / 2 + enx * edge_height / 2, hy + euy * edge_len / 2 + eny * edge_height / 2], axis=-1),
+                        np.stack([hx - eux * edge_len / 2 + enx * edge_height / 2, hy - euy * edge_len / 2 + eny * edge_height / 2], axis=-1),
+                    ],
+                    axis=1,
+                )
+            )
+            edge_ids.append(e)
+            slots.append(np.full(len(e), k))
+
+            total = total + (house_len + step)
+            active = valid & (total + house_len < length * 0.95)
+            k += 1
+
+        roadside: List[List[Polygon]] = [[] for _ in range(n_cells)]
+        if not edge_ids:
+            return roadside
+
+        edge_ids_all = np.concatenate(edge_ids)
+        order = np.lexsort((np.concatenate(slots), edge_ids_all))
+        houses = _quads_to_polygons(np.concatenate(corners)[order])
+        house_cells = edge_ids_all[order] // 4
+        bounds = np.searchsorted(house_cells, np.arange(n_cells + 1))
+        for c in range(n_cells):
+            roadside[c] = list(houses[bounds[c]:bounds[c + 1]])
+        return roadside
+
+    def _poisson_houses(self, cells: CellGrid, roadside: List[List[Polygon]], cell_size: float, sq_size: float, block_id: Optional[int]) -> List[Polygon]:
+        """
+        Дома внутри ячеек выборкой Пуассоновского диска: квадраты не ближе spacing друг к другу
+        и к придорожной полосе (отступ от дороги плюс половина глубины придорожного дома), так что
+        проверять расстояния до придорожных домов не нужно. Из насыщенной выборки остаётся доля
+        config.INTERIOR_DENSITY.
+        """
+        config = self.config
+        spacing = config.INTERIOR_SPACING if config.INTERIOR_SPACING is not None else cell_size * 0.02
+        inset = cell_size * (0.14 + 0.12 / 2) + spacing
         houses: List[Polygon] = []
+        scattered: List[int] = []
+        corners: List[Tuple[float, ...]] = []
+        stats: Dict[str, int] = dict.fromkeys(POISSON_STATS, 0)
+        thinned = 0
+        with self.profiler.stage("houses.scatter", block=block_id) as span:
+            for cell, cell_bounds in enumerate(cells.bounds.tolist()):
+                houses += roadside[cell]
+                points = poisson_squares(
+                    cell_bounds, sq_size, spacing,
+                    lambda x, y: cells.contains_box(cell, x, y, sq_size, inset),
+                    self.rng,
+                    stats=stats,
+                )
+                for hx, hy in points:
+                    if config.INTERIOR_DENSITY < 1.0 and self.rng.random() >= config.INTERIOR_DENSITY:
+                        thinned += 1
+                        continue
+                    scattered.append(len(houses))
+                    corners.append((hx, hy, hx + sq_size, hy, hx + sq_size, hy + sq_size, hx, hy + sq_size))
+                    houses.append(None)
+            if scattered:
+                for position, house in zip(scattered, _quads_to_polygons(np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2))):
+                    houses[position] = house
+            span["houses"] = len(scattered)
+        for name, n in stats.items():
+            self.profiler.count(f"houses.{name}", n)
+        self.profiler.count("houses.thinned", thinned)
+        return houses
+
+    def generate_houses(self, nodes: List[List[Point2D]], cell_size: float, roads, *, block_id: Optional[int] = None):
+        houses: List[Polygon] = []
+        index = GridIndex(cell_size * 0.25)
 
         rows = len(nodes) - 1
         cols = len(nodes[0]) - 1
 
         sq_size = cell_size * 0.11
         sq_spacing = cell_size * 0.02
-        edge_len = cell_size * 0.27
-        edge_height = cell_size * 0.12
-        road_offset = cell_size * 0.14
 
-        for i in range(rows):
-            for j in range(cols):
-                p_tl = nodes[i][j]
-                p_tr = nodes[i][j + 1]
-                p_br = nodes[i + 1][j + 1]
-                p_bl = nodes[i + 1][j]
-                cell = Polygon([p_tl, p_tr, p_br, p_bl])
-
-                edges = [
-                    LineString([p_tl, p_tr]),
-                    LineString([p_tr, p_br]),
-                    LineString([p_br, p_bl]),
-                    LineString([p_bl, p_tl]),
-                ]
-
-                for edge in edges:
-                    (x1, y1), (x2, y2) = edge.coords[:2]
-                    dx, dy = x2 - x1, y2 - y1
-                    length = math.hypot(dx, dy)
-                    if length == 0:
-                        continue
+        with self.profiler.stage("houses.roadside", block=block_id) as span:
+            cells = CellGrid(nodes)
+            _polygons, roadside = self.generate_roadside_houses(nodes, cell_size, cells)
+            n_roadside = sum(len(cell_houses) for cell_houses in roadside)
+            span["houses"] = n_roadside
 
-                    ux, uy = dx / length, dy / length
-                    nx, ny = -uy, ux
-
-                    step = 0.023 * length
-                    house_len = edge_len
-                    total = 0.3 * length
-
-                    while total + house_len < length * 0.95:
-                        bx = x1 + ux * total
-                        by = y1 + uy * total
-
-                        testx = bx + nx * road_offset
-                        testy = by + ny * road_offset
-                        if not Point(testx, testy).within(cell):
-                            nx, ny = -nx, -ny
-
-                        hx = bx + nx * road_offset
-                        hy = by + ny * road_offset
-                        house = Polygon(
-                            [
-                                (hx - ux * edge_len / 2 - nx * edge_height / 2, hy - uy * edge_len / 2 - ny * edge_height / 2),
-                                (hx + ux * edge_len / 2 - nx * edge_height / 2, hy + uy * edge_len / 2 + -ny * edge_height / 2),
-                                (hx + ux * edge_len / 2 + nx * edge_height / 2, hy + uy * edge_len / 2 + ny * edge_height / 2),
-                                (hx - ux * edge_len / 2 + nx * edge_height / 2, hy - uy * edge_len / 2 + ny * edge_height / 2),
-                            ]
-                        )
+        if self.config.INTERIOR_MODE == "poisson":
+            return self._poisson_houses(cells, roadside, cell_size, sq_size, block_id)
 
+        cell_bounds = cells.bounds.tolist()
+        scattered: List[int] = []
+        corners: List[Tuple[float, ...]] = []
+        # счётчики копятся локально и уходят в профилировщик один раз на квартал
+        attempts = outside = overlapping = given_up = distance_calls = 0
+        with self.profiler.stage("houses.scatter", block=block_id) as span:
+            for i in range(rows):
+                for j in range(cols):
+                    cell = i * cols + j
+
+                    for house in roadside[cell]:
                         houses.append(house)
-                        if self.config.SHOW_LOCAL and self.config.ANIMATE_HOUSES:
-                            x, y = house.exterior.xy
-                            ax.fill(x, y, color="brown", alpha=1, edgecolor="black", linewidth=1)
-                            ax.figure.canvas.draw_idle()
-                            plt.pause(0.001)
-                        total += house_len + step
-
-                num_sq = random.randint(5,9)
-                min_x = min(p_tl[0], p_tr[0], p_bl[0], p_br[0])
-                max_x = max(p_tl[0], p_tr[0], p_bl[0], p_br[0])
-                min_y = min(p_tl[1], p_tr[1], p_bl[1], p_br[1])
-                max_y = max(p_tl[1], p_tr[1], p_bl[1], p_br[1])
-
-                for _ in range(num_sq):
-                    for _attempt in range(15):
-                        hx = random.uniform(min_x + sq_spacing, max_x - sq_size - sq_spacing)
-                        hy = random.uniform(min_y + sq_spacing, max_y - sq_size - sq_spacing)
-                        house = Polygon([(hx, hy), (hx + sq_size, hy), (hx + sq_size, hy + sq_size), (hx, hy + sq_size)])
-
-                        if house.within(cell) and all(house.distance(h) > sq_spacing for h in houses):
-                            houses.append(house)
-                            if self.config.SHOW_LOCAL and self.config.ANIMATE_HOUSES:
-                                x, y = house.exterior.xy
-                                ax.fill(x, y, color="brown", alpha=1, edgecolor="black", linewidth=1)
-                                ax.figure.canvas.draw_idle()
-                                plt.pause(0.001)
-                            break
+                        index.insert(house)
+
+                    num_sq = self.rng.randint(5,9)
+                    min_x, min_y, max_x, max_y = cell_bounds[cell]
+
+                    for _ in range(num_sq):
+                        for _attempt in range(15):
+                            attempts += 1
+                            hx = self.rng.uniform(min_x + sq_spacing, max_x - sq_size - sq_spacing)
+                            hy = self.rng.uniform(min_y + sq_spacing, max_y - sq_size - sq_spacing)
+                            # геометрия нужна только кандидату внутри ячейки, и для проверки
+                            # расстояний хватает дешёвого shapely.box
+                            if not cells.contains_box(cell, hx, hy, sq_size):
+                                outside += 1
+                                continue
+                            house = shapely.box(hx, hy, hx + sq_size, hy + sq_size)
+                            free, calls = self._is_free(house, index, sq_spacing)
+                            distance_calls += calls
+                            if not free:
+                                overlapping += 1
+                            else:
+                                scattered.append(len(houses))
+                                corners.append((hx, hy, hx + sq_size, hy, hx + sq_size, hy + sq_size, hx, hy + sq_size))
+                                houses.append(house)
+                                index.insert(house)
+                                break
+                        else:
+                            given_up += 1
+            # итоговые полигоны (обход вершин как у придорожных домов) — одним вызовом на квартал
+            if scattered:
+                for position, house in zip(scattered, _quads_to_polygons(np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2))):
+                    houses[position] = house
+            span["houses"] = len(houses) - n_roadside
+
+        profiler = self.profiler
+        profiler.count("houses.attempts", attempts)
+        profiler.count("houses.rejected_outside", outside)
+        profiler.count("houses.rejected_overlap", overlapping)
+        profiler.count("houses.given_up", given_up)
+        # contains_box — арифметика по полуплоскостям ячейки; из shapely остаются только distance
+        profiler.count("houses.contains_checks", attempts)
+        profiler.count("shapely.distance", distance_calls)
         return houses
@@ -0,0 +1,112 @@
+"""
+Нагрузочный тест сервиса генерации (service.py).
+
+Запуск: python -m citygen.loadtest --url http://127.0.0.1:8080 --requests 200 --concurrency 16 --seeds 20
+
+Запросы /city идут с concurrency одновременных соединений; сиды берутся по кругу из --seeds
+различных, поэтому одинаковые запросы попадают на одну задачу сервиса. Для каждого ответа
+замеряются время до первого байта и полное время; в конце — перцентили, статусы и /stats сервиса.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .batch import percentile
+
+
+@dataclass
+class Sample:
+    status: int
+    first_byte: float
+    seconds: float
+    size: int
+    complete: bool
+
+
+async def fetch(host: str, port: int, target: str) -> Tuple[int, float, bytes]:
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        first_byte = time.perf_counter() - start
+        body = await reader.read()
+    finally:
+        writer.close()
+    parts = status_line.split()
+    return (int(parts[1]) if len(parts) > 1 else 0), first_byte, body
+
+
+async def _request(host: str, port: int, target: str) -> Sample:
+    start = time.perf_counter()
+    try:
+        status, first_byte, body = await fetch(host, port, target)
+    except ConnectionError:
+        return Sample(0, 0.0, time.perf_counter() - start, 0, False)
+    # chunked-ответ цел, только если завершён нулевым chunk
+    complete = status != 200 or body.endswith(b"0\r\n\r\n")
+    return Sample(status, first_byte, time.perf_counter() - start, len(body), complete)
+
+
+async def run(url: str, requests: int, concurrency: int, seeds: int, query: str) -> List[Sample]:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    samples: List[Sample] = []
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        for i in counter:
+            target = f"/city?seed={i % seeds}" + (f"&{query}" if query else "")
+            samples.append(await _request(host, port, target))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples
+
+
+def report(samples: List[Sample], elapsed: float, stats: Optional[dict]) -> None:
+    ok = [s for s in samples if s.status == 200 and s.complete]
+    seconds = sorted(s.seconds for s in ok)
+    first = sorted(s.first_byte for s in ok)
+    print(f"{len(samples)} запросов за {elapsed:.2f} с, {len(ok) / elapsed:.1f} успешных/с")
+    print("статусы: " + ", ".join(f"{status}: {n}" for status, n in sorted(Counter(s.status for s in samples).items())))
+    broken = sum(not s.complete for s in samples)
+    if broken:
+        print(f"оборванных ответов: {broken}")
+    for name, values in (("полное время", seconds), ("первый байт", first)):
+        print(f"{name:<14} " + "  ".join(f"p{q} {percentile(values, q) * 1000:7.1f} мс" for q in (50, 90, 99)) + f"  max {(values[-1] if values else 0) * 1000:7.1f} мс")
+    if stats is not None:
+        print("сервис: " + json.dumps(stats, ensure_ascii=False))
+
+
+async def _stats(url: str) -> Optional[dict]:
+    parts = urlsplit(url)
+    try:
+        status, _first, body = await fetch(parts.hostname or "127.0.0.1", parts.port or 80, "/stats")
+    except ConnectionError:
+        return None
+    return json.loads(body.split(b"\r\n\r\n", 1)[1]) if status == 200 else None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seeds", type=int, default=10, help="сколько различных сидов (повторы объединяются сервисом)")
+    parser.add_argument("--query", default="", help="дополнительные параметры, например topology=tiled&blocks_per_street=8")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    samples = asyncio.run(run(args.url, args.requests, args.concurrency, args.seeds, args.query))
+    elapsed = time.perf_counter() - start
+    report(samples, elapsed, asyncio.run(_stats(args.url)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
-from dataclasses import dataclass
-from typing import List, Tuple
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
+import shapely
 from shapely.geometry import LineString, Polygon
 
 Point2D = Tuple[float, float]
@@ -14,9 +17,232 @@ class Block:
 
 
 @dataclass
-class CityLayout:
+class CitySkeleton:
+    """
+    Узловой каркас города до построения дорог и домов.
+    blocks — пары (block_id, сетка узлов) в порядке выдачи в CityLayout.
+    """
+    streets: List[List[Point2D]]
+    park_polygon: Polygon
+    blocks: List[Tuple[int, List[List[Point2D]]]]
+
+
+@dataclass
+class StreamedBlock:
+    """
+    Элемент потока CityGenerator.iter_blocks: готовый квартал и всё, что появилось в городе вместе
+    с ним, — участки магистралей (узлы и дороги, у первого квартала каждого столбца плана)
+    и ответвления квартала.
+    block_id — номер квартала в плане (от него зависят его потоки случайности), index — его место
+    в CityLayout.blocks того же города; экспорт и хранилище нумеруют кварталы по index.
+    """
+    block_id: int
+    index: int
+    block: Block
+    street_nodes: List[Point2D] = field(default_factory=list)
+    street_roads: List[LineString] = field(default_factory=list)
+    branches: List[LineString] = field(default_factory=list)
+
+
+@dataclass
+class ParkContents:
+    """
+    Содержимое парка: деревья — массив координат (n, 2), лужайки и дорожки уже обрезаны по парку.
+    """
+    trees: np.ndarray
+    lawns: List[Polygon]
+    paths: List[LineString]
+
+
+class _LazyParkContents:
+    """
+    Ленивое содержимое парка: park_factory вызывается при первом обращении к park_contents.
+    """
+
+    __slots__ = ()
+
+    @property
+    def park_contents(self) -> Optional[ParkContents]:
+        """
+        None — если городу не передан генератор содержимого (например, город прочитан из файла).
+        """
+        if self._park_contents is None and self.park_factory is not None:
+            self._park_contents = self.park_factory()
+        return self._park_contents
+
+
+@dataclass
+class CityLayout(_LazyParkContents):
     main_street_nodes: List[Point2D]
     main_street_roads: List[LineString]
     blocks: List[Block]
     park_polygon: Polygon
     all_roads: List[LineString]
+    branches: List[LineString] = field(default_factory=list)
+    park_factory: Optional[Callable[[], ParkContents]] = field(default=None, repr=False, compare=False)
+    _park_contents: Optional[ParkContents] = field(default=None, init=False, repr=False, compare=False)
+
+
+class ChainedSequence(Sequence):
+    """
+    Несколько последовательностей как одна, без копирования элементов.
+    """
+
+    def __init__(self, *parts: Sequence):
+        self.parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        for part in self.parts:
+            if item < len(part):
+                return part[item]
+            item -= len(part)
+        raise IndexError("индекс вне диапазона")
+
+    def __iter__(self) -> Iterator:
+        for part in self.parts:
+            yield from part
+
+
+def _index_segments(segments: Sequence[LineString], points: np.ndarray) -> np.ndarray:
+    """
+    Отрезки -> пары индексов их концов в массиве точек points (n, 2).
+    """
+    lookup: Dict[Point2D, int] = {point: i for i, point in enumerate(map(tuple, points.tolist()))}
+    if not len(segments):
+        return np.empty((0, 2), dtype=np.int32)
+    coords = shapely.get_coordinates(np.asarray(segments, dtype=object)).reshape(len(segments), 2, 2)
+    try:
+        return np.asarray([[lookup[tuple(a)], lookup[tuple(b)]] for a, b in coords.tolist()], dtype=np.int32)
+    except KeyError as error:
+        raise ValueError(f"конец дороги {error.args[0]} не совпадает ни с одним узлом") from None
+
+
+def _segments(points: np.ndarray, index: np.ndarray) -> List[LineString]:
+    if not len(index):
+        return []
+    return list(shapely.linestrings(points[index]))
+
+
+class CompactBlock:
+    """
+    Компактный квартал: узлы — массив (rows, cols, 2), дороги — пары индексов узлов.
+    LineString дорог создаются только при обращении к roads.
+    """
+
+    __slots__ = ("nodes", "road_index", "houses")
+
+    def __init__(self, nodes: np.ndarray, road_index: np.ndarray, houses: List[Polygon]):
+        self.nodes = nodes
+        self.road_index = road_index
+        self.houses = houses
+
+    @classmethod
+    def from_block(cls, block: Block) -> "CompactBlock":
+        nodes = np.asarray(block.nodes, dtype=np.float64)
+        return cls(nodes, _index_segments(block.roads, nodes.reshape(-1, 2)), block.houses)
+
+    @property
+    def roads(self) -> List[LineString]:
+        return _segments(self.nodes.reshape(-1, 2), self.road_index)
+
+
+class _RoadsView(Sequence):
+    """
+    all_roads компактного города: дороги кварталов и магистралей собираются на лету.
+    """
+
+    def __init__(self, layout: "CompactCityLayout"):
+        self._layout = layout
+
+    def _parts(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        parts = [(block.nodes.reshape(-1, 2), block.road_index) for block in self._layout.blocks]
+        parts.append((self._layout.street_nodes, self._layout.street_road_index))
+        return parts
+
+    def __len__(self) -> int:
+        return sum(len(index) for _points, index in self._parts())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        for points, index in self._parts():
+            if item < len(index):
+                return LineString(points[index[item]])
+            item -= len(index)
+        raise IndexError("индекс дороги вне диапазона")
+
+    def __iter__(self) -> Iterator[LineString]:
+        for points, index in self._parts():
+            yield from _segments(points, index)
+
+
+class CompactCityLayout(_LazyParkContents):
+    """
+    Компактный вариант CityLayout с тем же интерфейсом для потребителей (CityPlotter, экспорт).
+    Узлы магистралей — один массив, дороги магистралей — пары индексов,
+    all_roads — представление, а не скопированный список.
+    """
+
+    __slots__ = ("street_nodes", "street_road_index", "n_main_street_roads", "blocks", "park_polygon", "branches", "park_factory", "_park_contents")
+
+    def __init__(
+        self,
+        street_nodes: np.ndarray,
+        street_road_index: np.ndarray,
+        n_main_street_roads: int,
+        blocks: List[CompactBlock],
+        park_polygon: Polygon,
+        branches: Optional[List[LineString]] = None,
+        park_factory: Optional[Callable[[], ParkContents]] = None,
+    ):
+        self.street_nodes = street_nodes
+        self.street_road_index = street_road_index
+        self.n_main_street_roads = n_main_street_roads
+        self.blocks = blocks
+        self.park_polygon = park_polygon
+        self.branches = branches if branches is not None else []
+        self.park_factory = park_factory
+        self._park_contents = None
+
+    @classmethod
+    def from_layout(cls, layout: CityLayout) -> "CompactCityLayout":
+        block_road_ids = {id(road) for block in layout.blocks for road in block.roads}
+        street_roads = [road for road in layout.all_roads if id(road) not in block_road_ids]
+        street_nodes = np.asarray(layout.main_street_nodes, dtype=np.float64).reshape(-1, 2)
+        return cls(
+            street_nodes=street_nodes,
+            street_road_index=_index_segments(street_roads, street_nodes),
+            n_main_street_roads=len(layout.main_street_roads),
+            blocks=[CompactBlock.from_block(block) for block in layout.blocks],
+            park_polygon=layout.park_polygon,
+            branches=layout.branches,
+            park_factory=layout.park_factory,
+        )
+
+    @property
+    def main_street_nodes(self) -> List[Point2D]:
+        return [tuple(point) for point in self.street_nodes.tolist()]
+
+    @property
+    def street_roads(self) -> List[LineString]:
+        """
+        Все дороги магистралей (в CityLayout они есть только в all_roads).
+        """
+        return _segments(self.street_nodes, self.street_road_index)
+
+    @property
+    def main_street_roads(self) -> List[LineString]:
+        return _segments(self.street_nodes, self.street_road_index[:self.n_main_street_roads])
+
+    @property
+    def all_roads(self) -> Sequence[LineString]:
+        return _RoadsView(self)
@@ -1,33 +1,101 @@
 from __future__ import annotations
 
 import random
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
-import matplotlib.pyplot as plt
+import numpy as np
+import shapely
 from shapely.geometry import Polygon, Point, LineString
 
+from .models import ParkContents
+
 
 # ==============================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ==============================
 
-def random_point_in_polygon(poly: Polygon) -> Point:
+def random_point_in_polygon(poly: Polygon, rng: Optional[random.Random] = None) -> Point:
+    rng = rng if rng is not None else random
     min_x, min_y, max_x, max_y = poly.bounds
     while True:
-        x = random.uniform(min_x, max_x)
-        y = random.uniform(min_y, max_y)
+        x = rng.uniform(min_x, max_x)
+        y = rng.uniform(min_y, max_y)
         p = Point(x, y)
         if poly.contains(p):
             return p
 
 
+@lru_cache(maxsize=64)
+def _triangulation(wkb: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Треугольники многоугольника (n, 3, 2) и накопленные площади (n,).
+    None — если в GEOS нет ограниченной триангуляции.
+    """
+    if not hasattr(shapely, "constrained_delaunay_triangles"):
+        return None
+    triangles = shapely.get_parts(shapely.constrained_delaunay_triangles(shapely.from_wkb(wkb)))
+    corners = shapely.get_coordinates(triangles).reshape(len(triangles), 4, 2)[:, :3]
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    areas = np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / 2
+    return corners, np.cumsum(areas)
+
+
+def polygon_triangles(poly: Polygon) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Триангуляция многоугольника, кэшируется по его WKB: повторные выборки из того же парка её не пересчитывают.
+    """
+    return _triangulation(poly.wkb)
+
+
+def _numpy_rng(rng: Optional[random.Random]) -> np.random.Generator:
+    return np.random.default_rng((rng if rng is not None else random).getrandbits(64))
+
+
+def _rejection_points(poly: Polygon, n: int, np_rng: np.random.Generator) -> np.ndarray:
+    """
+    Векторизованный отбор: кандидаты из bounding box пачками, проверка одним contains_xy на пачку.
+    """
+    min_x, min_y, max_x, max_y = poly.bounds
+    fill = poly.area / ((max_x - min_x) * (max_y - min_y))
+    shapely.prepare(poly)
+    found: List[np.ndarray] = []
+    missing = n
+    while missing > 0:
+        batch = int(missing / fill * 1.2) + 16
+        candidates = np.column_stack((np_rng.uniform(min_x, max_x, batch), np_rng.uniform(min_y, max_y, batch)))
+        inside = candidates[shapely.contains_xy(poly, candidates[:, 0], candidates[:, 1])][:missing]
+        found.append(inside)
+        missing -= len(inside)
+    return np.concatenate(found)
+
+
+def sample_points(poly: Polygon, n: int, rng: Optional[random.Random] = None) -> np.ndarray:
+    """
+    n равномерно распределённых точек внутри poly массивом (n, 2), без поштучных попыток:
+    треугольник выбирается пропорционально площади, точка в нём — барицентрически.
+    """
+    np_rng = _numpy_rng(rng)
+    if n <= 0:
+        return np.empty((0, 2))
+    triangulation = polygon_triangles(poly)
+    if triangulation is None:
+        return _rejection_points(poly, n, np_rng)
+
+    corners, cumulative = triangulation
+    chosen = np.minimum(np.searchsorted(cumulative, np_rng.uniform(0, cumulative[-1], n), side="right"), len(corners) - 1)
+    a, b, c = corners[chosen, 0], corners[chosen, 1], corners[chosen, 2]
+    r1, r2 = np_rng.random((2, n))
+    # точки из второй половины параллелограмма отражаются обратно в треугольник
+    flip = r1 + r2 > 1
+    r1[flip], r2[flip] = 1 - r1[flip], 1 - r2[flip]
+    return a + r1[:, None] * (b - a) + r2[:, None] * (c - a)
+
+
 # ==============================
 # ГЕНЕРАЦИЯ ПАРКА
 # ==============================
 
-import numpy as np
-from shapely.geometry import Polygon
-
 
 def generate_park_polygon() -> Polygon:
     m = 50
@@ -64,148 +132,74 @@ def generate_park_polygon_from(right_side: LineString, top_side: LineString):
     return Polygon(points)
 
 
-def generate_trees(park: Polygon, n_trees: int = 80) -> List[Point]:
-    return [random_point_in_polygon(park) for _ in range(n_trees)]
-
-
-def generate_lawns(park: Polygon, n_lawns: int = 3) -> List[Polygon]:
-    lawns: List[Polygon] = []
-    for _ in range(n_lawns):
-        center = random_point_in_polygon(park)
-        w = random.uniform(0.8, 1.5)
-        h = random.uniform(0.6, 1.2)
-        cx, cy = center.x, center.y
-
-        rect = Polygon(
-            [
-                (cx - w / 2, cy - h / 2),
-                (cx + w / 2, cy - h / 2),
-                (cx + w / 2, cy + h / 2),
-                (cx - w / 2, cy + h / 2),
-            ]
-        )
-
-        if park.contains(rect):
-            lawns.append(rect)
-        else:
-            clipped = rect.intersection(park)
-            if clipped and not clipped.is_empty:
-                if isinstance(clipped, Polygon):
-                    lawns.append(clipped)
-                else:
-                    for geom in clipped.geoms:
-                        if isinstance(geom, Polygon):
-                            lawns.append(geom)
-    return lawns
-
-
-def generate_paths(park: Polygon, n_paths: int = 4) -> List[LineString]:
-    paths: List[LineString] = []
-    for _ in range(n_paths):
-        k = random.randint(3, 5)
-        pts = [random_point_in_polygon(park) for _ in range(k)]
-        line = LineString([(p.x, p.y) for p in pts])
-        clipped = line.intersection(park)
-        if clipped.is_empty:
-            continue
-        if isinstance(clipped, LineString):
-            paths.append(clipped)
-        else:
-            for geom in clipped.geoms:
-                if isinstance(geom, LineString):
-                    paths.append(geom)
-    return paths
-
-
-# ==============================
-# ОТДЕЛЬНЫЕ ФУНКЦИИ ОТРИСОВКИ
-# ==============================
-
-def draw_polygon(ax: plt.Axes, poly: Polygon) -> None:
-    """
-    Отрисовать многоугольник: точки, рёбра, заливка.
-    """
-    # точки
-    coords = list(poly.exterior.coords)[:-1]
-    vx = [p[0] for p in coords]
-    vy = [p[1] for p in coords]
-    ax.scatter(vx, vy, color="red", s=10, zorder=3)
-
-    # рёбра
-    x, y = poly.exterior.xy
-    ax.plot(x, y, color="black", linewidth=2, zorder=2)
-
-    # заливка
-    ax.fill(x, y, color="#c8f7c5", alpha=0.7, zorder=1)
-
-
-def draw_lawns(ax: plt.Axes, lawns: List[Polygon]) -> None:
-    """
-    Отрисовать все лужайки.
-    """
-    for lawn in lawns:
-        if lawn.is_empty:
-            continue
-        x, y = lawn.exterior.xy
-        ax.fill(x, y, color="#a8e6a3", alpha=0.9, zorder=1.5)
+def generate_trees(park: Polygon, n_trees: int = 80, rng: Optional[random.Random] = None) -> List[Point]:
+    return list(shapely.points(sample_points(park, n_trees, rng)))
 
 
-def draw_paths(ax: plt.Axes, paths: List[LineString]) -> None:
+def _clip_parts(geometries: np.ndarray, park: Polygon, geometry_type: shapely.GeometryType) -> list:
     """
-    Отрисовать тропинки.
+    Обрезка всех геометрий по парку одним вызовом shapely.intersection; составные результаты
+    раскладываются на части, остаются непустые части нужного типа.
     """
-    for path in paths:
-        if path.is_empty:
-            continue
-        x, y = path.xy
-        ax.plot(x, y, color="gray", linewidth=2, linestyle="--", zorder=2.5)
-
-
-def draw_trees(ax: plt.Axes, trees: List[Point]) -> None:
+    if not len(geometries):
+        return []
+    shapely.prepare(park)
+    parts = shapely.get_parts(shapely.intersection(geometries, park))
+    keep = (shapely.get_type_id(parts) == geometry_type) & ~shapely.is_empty(parts)
+    return list(parts[keep])
+
+
+def generate_lawns(
+    park: Polygon,
+    n_lawns: int = 3,
+    rng: Optional[random.Random] = None,
+    width: Tuple[float, float] = (0.8, 1.5),
+    height: Tuple[float, float] = (0.6, 1.2),
+) -> List[Polygon]:
+    rng = rng if rng is not None else random
+    centers = sample_points(park, n_lawns, rng)
+    np_rng = _numpy_rng(rng)
+    w = np_rng.uniform(*width, n_lawns)
+    h = np_rng.uniform(*height, n_lawns)
+    rects = shapely.box(centers[:, 0] - w / 2, centers[:, 1] - h / 2, centers[:, 0] + w / 2, centers[:, 1] + h / 2)
+    return _clip_parts(rects, park, shapely.GeometryType.POLYGON)
+
+
+def generate_paths(park: Polygon, n_paths: int = 4, rng: Optional[random.Random] = None) -> List[LineString]:
+    rng = rng if rng is not None else random
+    counts = [rng.randint(3, 5) for _ in range(n_paths)]
+    points = sample_points(park, sum(counts), rng)
+    lines = shapely.linestrings(points, indices=np.repeat(np.arange(n_paths), counts)) if n_paths else np.empty(0, dtype=object)
+    return _clip_parts(lines, park, shapely.GeometryType.LINESTRING)
+
+
+def generate_park_contents(
+    park: Polygon,
+    n_trees: int,
+    n_lawns: int,
+    n_paths: int,
+    lawn_width: Tuple[float, float],
+    lawn_height: Tuple[float, float],
+    seed: int,
+) -> ParkContents:
     """
-    Отрисовать деревья.
+    Деревья, лужайки и дорожки парка. Функция уровня модуля: functools.partial от неё
+    хранится в CityLayout.park_factory и переживает pickle.
     """
-    tx = [t.x for t in trees]
-    ty = [t.y for t in trees]
-    ax.scatter(tx, ty, color="green", s=15, zorder=3)
-
-
-# ==============================
-# ГЛАВНАЯ ФУНКЦИЯ
-# ==============================
-
-def plot_park() -> None:
-    park = generate_park_polygon()
-    trees = generate_trees(park, n_trees=80)
-    lawns = generate_lawns(park, n_lawns=4)
-    paths = generate_paths(park, n_paths=4)
-
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.set_aspect("equal", "box")
-
-    draw_polygon(ax, park)
-    draw_lawns(ax, lawns)
-    draw_paths(ax, paths)
-    draw_trees(ax, trees)
-
-    # Отступы от границ парка
-    min_x, min_y, max_x, max_y = park.bounds
-    margin = 1.0
-    ax.set_xlim(min_x - margin, max_x + margin)
-    ax.set_ylim(min_y - margin, max_y + margin)
-
-    ax.set_title("Сгенерированный парк (shapely + matplotlib)")
-    ax.grid(True, alpha=0.2)
-
-    plt.show()
-
-
-if __name__ == "__main__":
-    random.seed(42)
-    plot_park()
+    if park.is_empty:
+        return ParkContents(trees=np.empty((0, 2)), lawns=[], paths=[])
+    rng = random.Random(seed)
+    return ParkContents(
+        trees=sample_points(park, n_trees, rng),
+        lawns=generate_lawns(park, n_lawns, rng, lawn_width, lawn_height),
+        paths=generate_paths(park, n_paths, rng),
+    )
 
 
 class ParkGenerator:
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng if rng is not None else random
+
     def generate_polygon(self) -> Polygon:
         return generate_park_polygon()
 
@@ -213,10 +207,23 @@ class ParkGenerator:
         return generate_park_polygon_from(right_side, top_side)
 
     def generate_trees(self, park: Polygon, n_trees: int = 80) -> List[Point]:
-        return generate_trees(park, n_trees)
+        return generate_trees(park, n_trees, self.rng)
 
     def generate_lawns(self, park: Polygon, n_lawns: int = 3) -> List[Polygon]:
-        return generate_lawns(park, n_lawns)
+        return generate_lawns(park, n_lawns, self.rng)
 
     def generate_paths(self, park: Polygon, n_paths: int = 4) -> List[LineString]:
-        return generate_paths(park, n_paths)
+        return generate_paths(park, n_paths, self.rng)
+
+
+_PLOTTING = ("draw_polygon", "draw_lawns", "draw_paths", "draw_trees", "plot_park")
+
+
+def __getattr__(name: str):
+    # отрисовка переехала в plotting; старые импорты из park продолжают работать,
+    # а геометрия парка не тянет matplotlib
+    if name in _PLOTTING:
+        from . import plotting
+
+        return getattr(plotting, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
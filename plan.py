@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from shapely.geometry import LineString, Polygon
+
+from .block import BlockBuilder
+from .config import CityConfig
+from .generate_node import NodeGenerator
+from .models import CitySkeleton, Point2D
+from .rng import STREAM_STREETS, SeedTree
+
+Nodes = List[List[Point2D]]
+
+
+@dataclass
+class PlanColumn:
+    """
+    Один столбец плана: очередные участки всех магистралей и кварталы над, между и под ними.
+    """
+    index: int
+    street_chunks: List[List[Point2D]]
+    blocks: List[Tuple[int, Nodes]]
+
+
+class TiledPlan:
+    """
+    Город из config.N_STREETS горизонтальных магистралей, по config.BLOCKS_PER_STREET кварталов вдоль каждой.
+
+    Ряды кварталов: над первой магистралью (nodes_up), между соседними магистралями
+    (nodes_between_roads) и под последней (nodes_down). Квартал в ряду сшивается с левым соседом
+    по его последнему столбцу узлов, поэтому план строится столбцами слева направо, и между
+    столбцами хранится только по одному граничному столбцу на ряд.
+    """
+
+    def __init__(self, config: CityConfig, block_builder: BlockBuilder, seeds: SeedTree):
+        self.config = config
+        self.block_builder = block_builder
+        self.seeds = seeds
+
+    @property
+    def block_rows(self) -> int:
+        return self.config.N_STREETS + 1
+
+    def block_id(self, row: int, column: int) -> int:
+        return row * self.config.BLOCKS_PER_STREET + column
+
+    def _street_chunk(self, street: int, column: int, last_node: Optional[Point2D]) -> List[Point2D]:
+        """
+        Участок магистрали под столбцом column: GRID узлов, первый совпадает с последним узлом предыдущего участка.
+        """
+        node_generator = NodeGenerator(self.config, self.seeds.random(STREAM_STREETS, street, column))
+        if last_node is None:
+            return node_generator.generate_main_street_nodes_from(self.config.GRID, (0.0, -street * self.config.STREET_SPACING), base=self.config.CELL)
+        chunk = node_generator.generate_main_street_nodes_from(self.config.GRID, last_node, base=self.config.CELL)
+        return [last_node] + chunk[1:]
+
+    def iter_columns(self) -> Iterator[PlanColumn]:
+        config = self.config
+        rows = config.ROWS_PER_BLOCK
+        spacing = (config.MIN_D, config.MAX_D)
+        last_nodes: List[Optional[Point2D]] = [None] * config.N_STREETS
+        left_columns: List[Optional[LineString]] = [None] * self.block_rows
+
+        for column in range(config.BLOCKS_PER_STREET):
+            chunks = [self._street_chunk(street, column, last_nodes[street]) for street in range(config.N_STREETS)]
+            last_nodes = [chunk[-1] for chunk in chunks]
+
+            blocks: List[Tuple[int, Nodes]] = []
+            for row in range(self.block_rows):
+                block_id = self.block_id(row, column)
+                left = left_columns[row]
+                # ряды всегда отсчитываются от столбцов своего участка магистрали: шаги вправо от левого
+                # соседа (up_right / right_down) в среднем длиннее участка, и на длинных магистралях
+                # внешние ряды уезжают от неё, а кварталы налезают друг на друга
+                if row == 0:
+                    nodes = self.block_builder.nodes_up(LineString(chunks[0]), block_id, rows, spacing)
+                elif row == config.N_STREETS:
+                    nodes = self.block_builder.nodes_down(LineString(chunks[-1]), block_id, rows, spacing)
+                else:
+                    nodes = self.block_builder.nodes_between_roads(LineString(chunks[row - 1]), LineString(chunks[row]), block_id, rows)
+                if left is not None:
+                    # узлы общего столбца берём у левого соседа
+                    for line, point in zip(nodes, left.coords):
+                        line[0] = point
+                blocks.append((block_id, nodes))
+                left_columns[row] = LineString(line[-1] for line in nodes)
+
+            yield PlanColumn(index=column, street_chunks=chunks, blocks=blocks)
+
+    def resolve(self) -> CitySkeleton:
+        streets: List[List[Point2D]] = [[] for _ in range(self.config.N_STREETS)]
+        blocks: List[Tuple[int, Nodes]] = []
+        for plan_column in self.iter_columns():
+            for street, chunk in zip(streets, plan_column.street_chunks):
+                street.extend(chunk if not street else chunk[1:])
+            blocks.extend(plan_column.blocks)
+        return CitySkeleton(streets=streets, park_polygon=Polygon(), blocks=blocks)
@@ -0,0 +1,175 @@
+"""
+Интерактивная отрисовка через pyplot: функции draw_* для парка и CityPlotter.
+
+Ядро генерации (config, models, generate_node, roads, block, houses, park) не импортирует
+этот модуль и matplotlib; он загружается только когда нужна картинка. matplotlib.pyplot
+импортируется внутри функций, поэтому и сам импорт plotting дешёвый.
+"""
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING, List
+
+from shapely.geometry import LineString, Point, Polygon
+
+from .animation import CityAnimation
+from .config import CityConfig
+from .houses import HouseGenerator
+from .models import CityLayout
+from .park import generate_lawns, generate_park_polygon, generate_paths, generate_trees
+from .render import render_layout
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
+
+# ==============================
+# ОТДЕЛЬНЫЕ ФУНКЦИИ ОТРИСОВКИ
+# ==============================
+
+def draw_polygon(ax: plt.Axes, poly: Polygon) -> None:
+    """
+    Отрисовать многоугольник: точки, рёбра, заливка.
+    """
+    # точки
+    coords = list(poly.exterior.coords)[:-1]
+    vx = [p[0] for p in coords]
+    vy = [p[1] for p in coords]
+    ax.scatter(vx, vy, color="red", s=10, zorder=3)
+
+    # рёбра
+    x, y = poly.exterior.xy
+    ax.plot(x, y, color="black", linewidth=2, zorder=2)
+
+    # заливка
+    ax.fill(x, y, color="#c8f7c5", alpha=0.7, zorder=1)
+
+
+def draw_lawns(ax: plt.Axes, lawns: List[Polygon]) -> None:
+    """
+    Отрисовать все лужайки.
+    """
+    for lawn in lawns:
+        if lawn.is_empty:
+            continue
+        x, y = lawn.exterior.xy
+        ax.fill(x, y, color="#a8e6a3", alpha=0.9, zorder=1.5)
+
+
+def draw_paths(ax: plt.Axes, paths: List[LineString]) -> None:
+    """
+    Отрисовать тропинки.
+    """
+    for path in paths:
+        if path.is_empty:
+            continue
+        x, y = path.xy
+        ax.plot(x, y, color="gray", linewidth=2, linestyle="--", zorder=2.5)
+
+
+def draw_trees(ax: plt.Axes, trees: List[Point]) -> None:
+    """
+    Отрисовать деревья.
+    """
+    tx = [t.x for t in trees]
+    ty = [t.y for t in trees]
+    ax.scatter(tx, ty, color="green", s=15, zorder=3)
+
+
+# ==============================
+# ПАРК ОТДЕЛЬНО
+# ==============================
+
+def plot_park() -> None:
+    import matplotlib.pyplot as plt
+
+    park = generate_park_polygon()
+    trees = generate_trees(park, n_trees=80)
+    lawns = generate_lawns(park, n_lawns=4)
+    paths = generate_paths(park, n_paths=4)
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.set_aspect("equal", "box")
+
+    draw_polygon(ax, park)
+    draw_lawns(ax, lawns)
+    draw_paths(ax, paths)
+    draw_trees(ax, trees)
+
+    # Отступы от границ парка
+    min_x, min_y, max_x, max_y = park.bounds
+    margin = 1.0
+    ax.set_xlim(min_x - margin, max_x + margin)
+    ax.set_ylim(min_y - margin, max_y + margin)
+
+    ax.set_title("Сгенерированный парк (shapely + matplotlib)")
+    ax.grid(True, alpha=0.2)
+
+    plt.show()
+
+
+# ==============================
+# ГОРОД
+# ==============================
+
+class CityPlotter:
+    """
+    Отвечает только за отрисовку результата.
+    """
+
+    def __init__(self, config: CityConfig, house_generator: HouseGenerator):
+        self.config = config
+        self.house_generator = house_generator
+
+    def render(self, layout: CityLayout, path: str, **kwargs) -> None:
+        """
+        Неинтерактивная отрисовка в файл (PNG/SVG), см. render.render_layout.
+        """
+        render_layout(layout, path, **kwargs)
+
+    def plot(self, layout: CityLayout):
+        if not self.config.SHOW_LOCAL:
+            return
+        if self.config.ANIMATE_HOUSES:
+            # дома уже в layout — анимация только показывает их в порядке генерации
+            CityAnimation(layout, self.config.HOUSES_PER_FRAME).show()
+            return
+
+        import matplotlib.pyplot as plt
+
+        plt.ion()
+        fig, ax = plt.subplots(figsize=(10, 10))
+        ax.set_aspect("equal")
+        m = 3000
+        ax.set_xlim(-m, m)
+        ax.set_ylim(-m, m)
+
+        for node in layout.main_street_nodes:
+            x, y = node
+            ax.scatter(x, y, color="red", s=10)
+
+
+        for block in layout.blocks:
+            for row in block.nodes:
+                for x, y in row:
+                    ax.scatter(x, y, color="red", s=10)
+
+            for house in block.houses:
+                x, y = house.exterior.xy
+                ax.fill(x, y, color="brown", alpha=1, edgecolor="black", linewidth=1)
+            plt.show()
+            plt.pause(0.1)
+
+        for road in layout.all_roads:
+            x, y = road.xy
+            ax.plot(x, y, color="black", linewidth=1)
+
+        if not layout.park_polygon.is_empty:
+            draw_polygon(ax=ax, poly=layout.park_polygon)
+        plt.draw()
+        plt.pause(1000)
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    plot_park()
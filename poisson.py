@@ -0,0 +1,122 @@
+"""
+Выборка Пуассоновского диска (Бриджсон) для квадратных домов.
+
+Точки — левые нижние углы квадратов со стороной size; любые два квадрата отстоят друг от друга
+больше чем на gap (расстояние между квадратами, а не между центрами). Из этого следует, что центры
+не ближе r = size + gap, поэтому в ячейке фоновой сетки со стороной r / sqrt(2) не больше одной
+точки, а все, кто может помешать кандидату, лежат в окрестности 5 x 5 ячеек. Новые кандидаты
+берутся в кольце [r, 2r] вокруг случайной активной точки; после attempts неудач точка перестаёт
+быть активной. Ожидаемая работа — O(n * attempts) на n точек, независимо от формы области.
+"""
+import math
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+Bounds = Tuple[float, float, float, float]
+
+ATTEMPTS = 30
+# счётчики poisson_squares(stats=...): кандидаты, отказы вне области и из-за соседей, вызовы inside
+POISSON_STATS = ("attempts", "rejected_outside", "rejected_overlap", "contains_checks")
+
+
+def _separated(x: float, y: float, px: float, py: float, size: float, gap2: float) -> bool:
+    ax = abs(x - px) - size
+    ay = abs(y - py) - size
+    if ax <= 0 and ay <= 0:
+        return False
+    return max(ax, 0.0) ** 2 + max(ay, 0.0) ** 2 > gap2
+
+
+def _add_stats(stats: Dict[str, int], *values: int) -> None:
+    for name, value in zip(POISSON_STATS, values):
+        stats[name] += value
+
+
+def poisson_squares(
+    bounds: Bounds,
+    size: float,
+    gap: float,
+    inside: Callable[[float, float], bool],
+    rng: random.Random,
+    attempts: int = ATTEMPTS,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[float, float]]:
+    """
+    Плотная выборка углов (x, y) квадратов внутри bounds (min_x, min_y, max_x, max_y — границы самих
+    квадратов), принятых предикатом inside(x, y). Порядок — порядок принятия.
+    stats — словарь, к значениям которого прибавляются счётчики POISSON_STATS.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    max_x -= size
+    max_y -= size
+    if max_x < min_x or max_y < min_y:
+        return []
+
+    r = size + gap
+    step = r / math.sqrt(2)
+    nx = int((max_x - min_x) / step) + 1
+    ny = int((max_y - min_y) / step) + 1
+    grid = [-1] * (nx * ny)
+    gap2 = gap * gap
+    points: List[Tuple[float, float]] = []
+
+    # вне области, из-за соседа, вызовы inside — для stats
+    counts = [0, 0, 0]
+
+    def fits(x: float, y: float) -> bool:
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            counts[0] += 1
+            return False
+        gi = int((x - min_x) / step)
+        gj = int((y - min_y) / step)
+        for j in range(max(gj - 2, 0), min(gj + 3, ny)):
+            row = j * nx
+            for i in range(max(gi - 2, 0), min(gi + 3, nx)):
+                k = grid[row + i]
+                if k >= 0 and not _separated(x, y, points[k][0], points[k][1], size, gap2):
+                    counts[1] += 1
+                    return False
+        counts[2] += 1
+        if inside(x, y):
+            return True
+        counts[0] += 1
+        return False
+
+    def add(x: float, y: float) -> None:
+        grid[int((y - min_y) / step) * nx + int((x - min_x) / step)] = len(points)
+        points.append((x, y))
+
+    # первая точка: несколько равномерных попыток, область может занимать малую часть bounds
+    first_tries = 0
+    for first_tries in range(1, attempts + 1):
+        x, y = rng.uniform(min_x, max_x), rng.uniform(min_y, max_y)
+        if inside(x, y):
+            add(x, y)
+            break
+    else:
+        if stats is not None:
+            _add_stats(stats, attempts, attempts, 0, attempts)
+        return []
+
+    candidates = 0
+    active = [0]
+    while active:
+        a = rng.randrange(len(active))
+        px, py = points[active[a]]
+        for _ in range(attempts):
+            candidates += 1
+            angle = rng.uniform(0, 2 * math.pi)
+            dist = rng.uniform(r, 2 * r)
+            x, y = px + dist * math.cos(angle), py + dist * math.sin(angle)
+            if fits(x, y):
+                active.append(len(points))
+                add(x, y)
+                break
+        else:
+            # удаление из середины за O(1): на место выбывшей ставим последнюю
+            active[a] = active[-1]
+            active.pop()
+    if stats is not None:
+        outside, overlap, checks = counts
+        _add_stats(stats, first_tries + candidates, first_tries - 1 + outside, overlap, first_tries + checks)
+    return points
@@ -0,0 +1,174 @@
+"""
+Профилирование пайплайна генерации.
+
+Profiler записывает интервалы этапов (время, поток, свойства вроде block_id и числа объектов)
+и счётчики событий. Отчёт — ProfileReport: сводка по этапам, по кварталам и счётчики; интервалы
+можно выгрузить в формате Chrome trace (chrome://tracing, Perfetto).
+
+NULL_PROFILER — выключенный профилировщик: stage возвращает один и тот же пустой контекст,
+count ничего не делает. Горячие циклы считают события в локальные переменные и передают их
+в count один раз на квартал, поэтому с выключенным профилировщиком накладные расходы —
+несколько вызовов пустых методов на квартал.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import IO, Dict, List, Union
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    objects: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ProfileReport:
+    """
+    stages — сводка по этапам; blocks — время этапов каждого квартала; counters — счётчики событий.
+    """
+    stages: Dict[str, StageStats]
+    blocks: Dict[int, Dict[str, float]]
+    counters: Dict[str, int]
+
+    def format(self) -> str:
+        lines = [f"{'stage':<22} {'calls':>7} {'total':>10} {'mean':>10} {'max':>10}  objects"]
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            objects = ", ".join(f"{key}={value}" for key, value in sorted(stats.objects.items()))
+            lines.append(
+                f"{name:<22} {stats.calls:>7} {stats.seconds * 1000:>8.1f}ms "
+                f"{stats.seconds / stats.calls * 1000:>8.2f}ms {stats.max_seconds * 1000:>8.2f}ms  {objects}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<22} {value:>7}")
+        return "\n".join(lines)
+
+
+class Span(dict):
+    """
+    Свойства открытого интервала: span["houses"] = n добавляет число объектов к этапу.
+    """
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def __setitem__(self, key, value) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullProfiler:
+    enabled = False
+
+    def stage(self, name: str, **args) -> _NullSpan:
+        return _NULL_SPAN
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "span", "start")
+
+    def __init__(self, profiler: "Profiler", name: str, span: Span):
+        self.profiler = profiler
+        self.name = name
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc) -> None:
+        self.profiler._record(self.name, self.start, time.perf_counter() - self.start, self.span)
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self.events: List[tuple] = []  # (name, start, duration, pid, tid, args)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, **args) -> _Stage:
+        """
+        Контекст этапа; свойства args (например, block=block_id) попадают в интервал и отчёт.
+        """
+        return _Stage(self, name, Span(args))
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def _record(self, name: str, start: float, duration: float, args: Span) -> None:
+        # list.append атомарен, потоки пула не мешают друг другу
+        self.events.append((name, start, duration, os.getpid(), threading.get_ident(), args))
+
+    def report(self) -> ProfileReport:
+        stages: Dict[str, StageStats] = defaultdict(StageStats)
+        blocks: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for name, _start, duration, _pid, _tid, args in self.events:
+            stats = stages[name]
+            stats.calls += 1
+            stats.seconds += duration
+            stats.max_seconds = max(stats.max_seconds, duration)
+            for key, value in args.items():
+                if key != "block" and isinstance(value, int):
+                    stats.objects[key] = stats.objects.get(key, 0) + value
+            if args.get("block") is not None:
+                blocks[args["block"]][name] += duration
+        return ProfileReport(
+            stages=dict(stages),
+            blocks={block_id: dict(times) for block_id, times in blocks.items()},
+            counters=dict(self.counters),
+        )
+
+    def chrome_trace(self) -> Dict[str, list]:
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": dict(args),
+            }
+            for name, start, duration, pid, tid, args in self.events
+        ]
+        end = max((start + duration for _name, start, duration, *_rest in self.events), default=self._origin)
+        events.extend(
+            {"name": name, "ph": "C", "ts": (end - self._origin) * 1e6, "pid": os.getpid(), "args": {name: value}}
+            for name, value in self.counters.items()
+        )
+        return {"traceEvents": events}
+
+    def write_chrome_trace(self, target: Union[str, IO[str]]) -> None:
+        if isinstance(target, str):
+            with open(target, "w", encoding="utf-8") as f:
+                json.dump(self.chrome_trace(), f)
+        else:
+            json.dump(self.chrome_trace(), target)
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def make_profiler(enabled: bool) -> Union[Profiler, NullProfiler]:
+    return Profiler() if enabled else NULL_PROFILER
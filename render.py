@@ -0,0 +1,182 @@
+"""
+Неинтерактивная отрисовка города в файл.
+
+Все дома рисуются одной PolyCollection, все дороги — одной LineCollection, все узлы — одним
+scatter, поэтому число вызовов matplotlib не зависит от размера города. Фигура создаётся
+напрямую через Figure и холст Agg, без pyplot: отрисовка работает на сервере без дисплея
+и не трогает глобальное состояние pyplot (можно вызывать из воркеров пула).
+
+Поток кварталов (CityGenerator.iter_blocks) рисует StreamRenderer: от квартала остаются только
+массивы вершин, геометрии города целиком в памяти не собираются.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from .models import CityLayout, StreamedBlock
+
+Extent = Tuple[float, float, float, float]
+
+HOUSE_COLOR = "brown"
+ROAD_COLOR = "black"
+NODE_COLOR = "red"
+PARK_COLOR = "#c8f7c5"
+
+
+def split_coords(geometries: np.ndarray) -> List[np.ndarray]:
+    """
+    Массив линий/колец -> список массивов координат (k, 2), по одному на геометрию.
+    """
+    if not len(geometries):
+        return []
+    coords = shapely.get_coordinates(geometries)
+    counts = shapely.get_num_coordinates(geometries)
+    return np.split(coords, np.cumsum(counts)[:-1])
+
+
+def _as_array(geometries: Sequence[BaseGeometry]) -> np.ndarray:
+    # ленивые колонки хранилища отдают массив сразу, без поштучного создания объектов
+    if hasattr(geometries, "materialize"):
+        return geometries.materialize()
+    return np.asarray(list(geometries), dtype=object)
+
+
+def layout_nodes(layout: CityLayout) -> np.ndarray:
+    """
+    Все узлы города (магистрали и сетки кварталов) одним массивом (n, 2).
+    """
+    parts = [np.asarray(layout.main_street_nodes, dtype=np.float64).reshape(-1, 2)]
+    parts.extend(np.asarray(block.nodes, dtype=np.float64).reshape(-1, 2) for block in layout.blocks)
+    return np.concatenate(parts)
+
+
+def layout_houses(layout: CityLayout) -> np.ndarray:
+    parts = [_as_array(block.houses) for block in layout.blocks]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=object)
+
+
+def _figure(size: float, dpi: int):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(size, size), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_aspect("equal")
+    return fig, ax
+
+
+def _draw(ax, houses: List[np.ndarray], roads: List[np.ndarray], branches: List[np.ndarray], points: Optional[np.ndarray]) -> None:
+    """
+    Дома, дороги, ответвления и узлы — по одной коллекции на слой; на входе списки вершин (k, 2).
+    """
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    ax.add_collection(PolyCollection(houses, facecolors=HOUSE_COLOR, edgecolors=ROAD_COLOR, linewidths=1, zorder=2))
+    ax.add_collection(LineCollection(roads, colors=ROAD_COLOR, linewidths=1, zorder=3))
+    if branches:
+        ax.add_collection(LineCollection(branches, colors=ROAD_COLOR, linewidths=0.5, zorder=3))
+    if points is not None:
+        ax.scatter(points[:, 0], points[:, 1], color=NODE_COLOR, s=10, zorder=4)
+
+
+def _save(fig, ax, path: str, bounds: Extent, extent: Optional[Extent], fmt: Optional[str]) -> None:
+    if extent is None:
+        xmin, ymin, xmax, ymax = bounds
+        pad = 0.02 * max(xmax - xmin, ymax - ymin)
+        extent = (xmin - pad, ymin - pad, xmax + pad, ymax + pad)
+    xmin, ymin, xmax, ymax = extent
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    fig.savefig(path, format=fmt)
+
+
+def render_layout(
+    layout: CityLayout,
+    path: str,
+    size: float = 10,
+    dpi: int = 100,
+    extent: Optional[Extent] = None,
+    nodes: bool = True,
+    fmt: Optional[str] = None,
+) -> None:
+    """
+    Рисует город в файл path (PNG, SVG и всё, что умеет Figure.savefig; формат — по расширению или fmt).
+    size — сторона квадратной фигуры в дюймах, extent — (xmin, ymin, xmax, ymax), по умолчанию границы города.
+    """
+    from matplotlib.collections import PolyCollection
+
+    fig, ax = _figure(size, dpi)
+
+    houses = layout_houses(layout)
+    roads = _as_array(layout.all_roads)
+    branches = _as_array(layout.branches)
+
+    if not layout.park_polygon.is_empty:
+        park = np.asarray([layout.park_polygon.exterior], dtype=object)
+        ax.add_collection(PolyCollection(split_coords(park), facecolors=PARK_COLOR, edgecolors=ROAD_COLOR, linewidths=2, alpha=0.7, zorder=1))
+    _draw(
+        ax,
+        split_coords(shapely.get_exterior_ring(houses)),
+        split_coords(roads),
+        split_coords(branches),
+        layout_nodes(layout) if nodes else None,
+    )
+    _save(fig, ax, path, shapely.total_bounds(np.concatenate([roads, houses])), extent, fmt)
+
+
+class StreamRenderer:
+    """
+    Накопитель для отрисовки потока кварталов: add(item) на каждый квартал, затем save(path).
+    """
+
+    def __init__(self, nodes: bool = True):
+        self.nodes = nodes
+        self.houses: List[np.ndarray] = []
+        self.roads: List[np.ndarray] = []
+        self.branches: List[np.ndarray] = []
+        self.points: List[np.ndarray] = []
+        self.bounds = np.array([np.inf, np.inf, -np.inf, -np.inf])
+
+    def add(self, item: StreamedBlock) -> None:
+        houses = _as_array(item.block.houses)
+        roads = np.asarray(list(item.block.roads) + list(item.street_roads), dtype=object)
+        self.houses += split_coords(shapely.get_exterior_ring(houses))
+        self.roads += split_coords(roads)
+        self.branches += split_coords(np.asarray(item.branches, dtype=object))
+        if self.nodes:
+            self.points.append(np.asarray(item.street_nodes, dtype=np.float64).reshape(-1, 2))
+            self.points.append(np.asarray(item.block.nodes, dtype=np.float64).reshape(-1, 2))
+        # у пустого набора границы nan; fmin/fmax их пропускают
+        bounds = shapely.total_bounds(np.concatenate([roads, houses]))
+        self.bounds[:2] = np.fmin(self.bounds[:2], bounds[:2])
+        self.bounds[2:] = np.fmax(self.bounds[2:], bounds[2:])
+
+    def save(self, path: str, size: float = 10, dpi: int = 100, extent: Optional[Extent] = None, fmt: Optional[str] = None) -> None:
+        fig, ax = _figure(size, dpi)
+        points = np.concatenate(self.points) if self.nodes and self.points else None
+        _draw(ax, self.houses, self.roads, self.branches, points)
+        _save(fig, ax, path, tuple(self.bounds), extent, fmt)
+
+
+def render_stream(
+    blocks: Iterable[StreamedBlock],
+    path: str,
+    size: float = 10,
+    dpi: int = 100,
+    extent: Optional[Extent] = None,
+    nodes: bool = True,
+    fmt: Optional[str] = None,
+) -> int:
+    """
+    Рисует поток CityGenerator.iter_blocks в файл path, как render_layout. Возвращает число кварталов.
+    """
+    renderer = StreamRenderer(nodes)
+    count = 0
+    for item in blocks:
+        renderer.add(item)
+        count += 1
+    renderer.save(path, size, dpi, extent, fmt)
+    return count
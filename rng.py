@@ -0,0 +1,48 @@
+import random
+from typing import Optional
+
+import numpy as np
+
+# Ключи независимых потоков случайности. Поток определяется только сидом города
+# и своим ключом, поэтому результат подсистемы не зависит от порядка вызовов остальных.
+STREAM_STREETS = 0
+STREAM_PARK = 1
+STREAM_BLOCKS = 2
+STREAM_BRANCHES = 3
+STREAM_UNNAMED_BLOCKS = 4  # кварталы, построенные без block_id
+STREAM_PARK_CONTENTS = 5
+
+# Подпотоки внутри квартала
+BLOCK_NODES = 0
+BLOCK_HOUSES = 1
+
+
+class SeedTree:
+    """
+    Дерево сидов поверх numpy.random.SeedSequence.
+    Каждый ключ (например, (STREAM_BLOCKS, block_id, BLOCK_HOUSES)) даёт свой воспроизводимый поток.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.entropy = np.random.SeedSequence(seed).entropy
+
+    def sequence(self, *key: int) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.entropy, spawn_key=key)
+
+    def child_seed(self, *key: int) -> int:
+        """
+        Целочисленный сид для ключа — например, сид отдельного города в пакетной генерации.
+        """
+        return int(self.sequence(*key).generate_state(1, np.uint64)[0])
+
+    def random(self, *key: int) -> random.Random:
+        """
+        Поток random.Random для скалярного кода.
+        """
+        return random.Random(self.child_seed(*key))
+
+    def numpy(self, *key: int) -> np.random.Generator:
+        """
+        Поток numpy.random.Generator для векторизованного кода.
+        """
+        return np.random.default_rng(self.sequence(*key))
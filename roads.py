@@ -1,5 +1,5 @@
 import random
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 from shapely import LineString
@@ -8,13 +8,16 @@ Point2D = Tuple[float, float]
 
 
 class RoadBuilder:
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng if rng is not None else random
+
     def slightly_noisy_curve(self, p1: Point2D, p2: Point2D, rate: int) -> LineString:
         x1, y1 = p1
         x2, y2 = p2
 
         mid = np.array([(x1 + x2) / 2, (y1 + y2) / 2])
-        angle = random.uniform(0, 2 * np.pi)
-        dist = random.uniform(1, 4)
+        angle = self.rng.uniform(0, 2 * np.pi)
+        dist = self.rng.uniform(1, 4)
         offset = np.array([np.cos(angle) * dist, np.sin(angle) * dist])
 
         mid = mid + offset + rate
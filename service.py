@@ -0,0 +1,529 @@
+"""
+HTTP-сервис генерации городов на asyncio (только стандартная библиотека).
+
+Запуск: python -m citygen.service --port 8080 --workers 4
+
+    GET /city?seed=7&topology=tiled&blocks_per_street=20[&deadline=5]
+        — GeoJSON города; параметры — поля CityConfig в любом регистре, влияющие на геометрию.
+          Ответ идёт chunked-потоком по кварталам, по мере того как воркер их достраивает
+          (CityGenerator.iter_blocks), парк в поток не входит.
+    GET /stats — JSON со счётчиками сервиса.
+
+Генерация идёт в пуле из workers процессов; кварталы возвращаются через общую очередь
+multiprocessing, её читает отдельный поток и передаёт в цикл событий. Одинаковые запросы
+(тот же конфиг и сид, ключ как у GenerationCache), пришедшие, пока город считается, подписываются
+на уже идущую задачу: каждый подписчик получает все кварталы с начала.
+
+Нагрузка ограничена: задач (считающихся и ждущих воркера) не больше workers + max_queue, сверх
+этого — 503 с Retry-After. Объём одной задачи ограничен числом кварталов и узлов и пределами
+полей (FIELD_LIMITS), запрос сверх них получает 400. Медленный клиент тормозит только себя: запись ждёт drain, а готовые
+кварталы задачи остаются в памяти до её завершения. У каждого запроса есть срок (deadline);
+по его истечении до начала ответа отдаётся 504, после — соединение обрывается без последнего
+chunk. Когда у задачи не остаётся подписчиков, она отменяется: ждущая — снимается с очереди пула,
+считающаяся — останавливается воркером перед следующим кварталом. Если процесс воркера упал,
+пул (вместе с очередью результатов) пересоздаётся, его задачи завершаются ошибкой 500.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from .batch import percentile
+from .cache import NEUTRAL_FIELDS, layout_key
+from .config import CityConfig
+from .export import COLLECTION_FOOTER, COLLECTION_HEADER, FEATURE_SEPARATOR, feature_json, stream_features
+from .generate import CityGenerator
+from .rng import SeedTree
+
+# допустимые значения числовых полей запроса (для кортежей — каждого элемента); объём работы
+# дополнительно ограничен числом кварталов и узлов в parse_request
+FIELD_LIMITS: Dict[str, Tuple[float, float]] = {
+    "GRID": (2, 64),
+    "ROWS_PER_BLOCK": (1, 64),
+    "N_STREETS": (1, 1000),
+    "BLOCKS_PER_STREET": (1, 100_000),
+    "CELL": (50, 2000),
+    "OFFSET": (0, 100),
+    "MIN_D": (50, 2000),
+    "MAX_D": (50, 2000),
+    "STREET_SPACING": (100, 20_000),
+    "CURVED_PROB": (0, 1),
+    "BRANCH_PROB": (0, 1),
+    "BRANCH_MIN": (0, 1),
+    "BRANCH_MAX": (0, 1),
+    "HOUSE_INSIDE_MIN": (0, 100),
+    "INTERIOR_DENSITY": (0, 1),
+    "INTERIOR_SPACING": (0, 200),
+    "PARK_TREES": (0, 10_000),
+    "PARK_LAWNS": (0, 100),
+    "PARK_PATHS": (0, 100),
+    "PARK_LAWN_WIDTH": (1, 1000),
+    "PARK_LAWN_HEIGHT": (1, 1000),
+}
+# ячейка квартала не больше MAX_CELL_RATIO шагов магистрали (CELL) — иначе домов на ячейку
+# становится квадратично больше
+MAX_CELL_RATIO = 4
+
+
+def _requestable(config_field) -> bool:
+    # числовое поле без пределов в запрос не попадает
+    return config_field.name not in NEUTRAL_FIELDS and (config_field.type in (str, bool) or config_field.name in FIELD_LIMITS)
+
+
+# поля конфига, которые можно задать в запросе (по имени в любом регистре)
+REQUEST_FIELDS = {f.name.lower(): f for f in fields(CityConfig) if _requestable(f)}
+
+_CHUNK, _DONE, _CANCELLED, _ERROR = "chunk", "done", "cancelled", "error"
+
+# состояние воркера пула: общая очередь результатов и флаги отмены по слотам задач
+_results = None
+_cancel = None
+
+
+def _init_worker(results, cancel) -> None:
+    global _results, _cancel
+    _results = results
+    _cancel = cancel
+
+
+def _stream_city(job_id: int, slot: int, config: CityConfig, seed: int) -> None:
+    """
+    Задача воркера: кварталы города по одному в общую очередь, уже сериализованными в GeoJSON.
+    """
+    try:
+        blocks = 0
+        # задача могла пролежать в очереди пула уже после отмены: не строим даже скелет города
+        if _cancel[slot]:
+            _results.put((job_id, _CANCELLED, blocks))
+            return
+        for item in CityGenerator(config, seed=seed).iter_blocks():
+            if _cancel[slot]:
+                _results.put((job_id, _CANCELLED, blocks))
+                return
+            _results.put((job_id, _CHUNK, FEATURE_SEPARATOR.join(feature_json(p, g) for p, g in stream_features([item]))))
+            blocks += 1
+        _results.put((job_id, _DONE, blocks))
+    except Exception as exc:
+        _results.put((job_id, _ERROR, f"{type(exc).__name__}: {exc}"))
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _parse_value(config_field, text: str):
+    kind = config_field.type
+    if typing.get_origin(kind) is typing.Union:
+        if text.lower() in ("", "none", "null"):
+            return None
+        kind = next(arg for arg in typing.get_args(kind) if arg is not type(None))
+    if kind is bool:
+        if text.lower() not in ("1", "0", "true", "false", "yes", "no"):
+            raise ValueError(text)
+        return text.lower() in ("1", "true", "yes")
+    if kind is tuple:
+        return tuple(int(part) if part.strip().lstrip("-").isdigit() else float(part) for part in text.split(","))
+    return kind(text)
+
+
+def _check_limits(name: str, value) -> None:
+    low, high = FIELD_LIMITS.get(name, (None, None))
+    if low is None or value is None:
+        return
+    for item in value if isinstance(value, tuple) else (value,):
+        if not low <= item <= high:
+            raise ServiceError(400, f"{name.lower()} вне пределов [{low}, {high}]")
+
+
+def parse_request(query: str, base: CityConfig, max_blocks: int, max_nodes: int) -> Tuple[CityConfig, int, bool, Optional[float]]:
+    """
+    Параметры /city -> (конфиг, сид, задан ли сид, срок в секундах или None).
+    Без seed город случаен, и такие запросы не объединяются. Поля проверяются по FIELD_LIMITS,
+    город — по числу кварталов и узлов (кварталы x GRID x (ROWS_PER_BLOCK + 1)).
+    """
+    changes = {}
+    seed: Optional[int] = None
+    deadline: Optional[float] = None
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        name = name.lower()
+        try:
+            if name == "seed":
+                seed = int(value)
+            elif name == "deadline":
+                deadline = float(value)
+                if not 0 < deadline < float("inf"):
+                    raise ValueError(value)
+            elif name in REQUEST_FIELDS:
+                config_field = REQUEST_FIELDS[name]
+                changes[config_field.name] = _parse_value(config_field, value)
+                _check_limits(config_field.name, changes[config_field.name])
+            else:
+                raise ServiceError(400, f"неизвестный параметр: {name}")
+        except ValueError:
+            raise ServiceError(400, f"неверное значение {name}={value!r}") from None
+    config = replace(base, **changes)
+    n_blocks = (config.N_STREETS + 1) * config.BLOCKS_PER_STREET if config.TOPOLOGY == "tiled" else 5
+    if n_blocks > max_blocks:
+        raise ServiceError(400, f"слишком большой город: {n_blocks} кварталов, допустимо {max_blocks}")
+    n_nodes = n_blocks * config.GRID * (config.ROWS_PER_BLOCK + 1)
+    if n_nodes > max_nodes:
+        raise ServiceError(400, f"слишком большой город: {n_nodes} узлов, допустимо {max_nodes}")
+    if config.MIN_D > config.MAX_D or config.MAX_D > config.CELL * MAX_CELL_RATIO:
+        raise ServiceError(400, f"нужно min_d <= max_d <= {MAX_CELL_RATIO} * cell")
+    try:
+        CityGenerator(replace(config, CACHE_DIR=None, PROFILE=False))
+    except ValueError as exc:
+        raise ServiceError(400, str(exc)) from None
+    if seed is None:
+        return config, random.getrandbits(63), False, deadline
+    return config, seed, True, deadline
+
+
+class _Job:
+    """
+    Одна генерация и её подписчики. chunks — готовые кварталы в GeoJSON; changed пересоздаётся
+    при каждом событии, поэтому ждущие подписчики просыпаются все сразу.
+    """
+
+    def __init__(self, job_id: int, key: Optional[str], slot: int):
+        self.job_id = job_id
+        self.key = key
+        self.slot = slot
+        self.chunks: List[str] = []
+        self.finished = False
+        self.error: Optional[str] = None
+        self.subscribers = 0
+        self.future: Optional[Future] = None
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+@dataclass
+class ServiceStats:
+    requests: int = 0
+    deduplicated: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    cancelled_jobs: int = 0
+    completed_jobs: int = 0
+    failed_jobs: int = 0
+    pool_restarts: int = 0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+
+class CityService:
+    def __init__(
+        self,
+        workers: int = os.cpu_count() or 1,
+        max_queue: int = 16,
+        deadline: float = 30.0,
+        max_blocks: int = 10_000,
+        max_nodes: int = 200_000,
+        config: Optional[CityConfig] = None,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.max_blocks = max_blocks
+        self.max_nodes = max_nodes
+        # воркер считает кварталы последовательно: пул и так занимает все процессы
+        self.config = replace(config or CityConfig(), SHOW_LOCAL=False, ANIMATE_HOUSES=False, WORKERS=1, CACHE_DIR=None, PROFILE=False)
+        self.stats = ServiceStats()
+        self._jobs: Dict[int, _Job] = {}
+        self._inflight: Dict[str, _Job] = {}
+        self._ids = itertools.count()
+        self._slots = list(range(workers + max_queue))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- пул и очередь результатов ----------
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        # не fork: порождённый посреди работы процесс унаследовал бы сокеты открытых соединений
+        # (клиент не получит EOF, пока жив воркер) и блокировки потоков сервиса
+        self._context = multiprocessing.get_context("spawn")
+        self._cancel = self._context.Array("b", len(self._slots), lock=False)
+        self._start_pool()
+
+    def _start_pool(self) -> None:
+        # у каждого пула своя очередь: убитый посреди put воркер мог оставить в ней
+        # недописанное сообщение и захваченную блокировку записи
+        self._results = self._context.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=self._context, initializer=_init_worker, initargs=(self._results, self._cancel))
+        self._reader = threading.Thread(target=self._read_results, args=(self._results,), name="city-results", daemon=True)
+        self._reader.start()
+
+    def _restart_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Замена сломанного пула (упал процесс воркера). Задачи старого пула завершаются
+        с BrokenProcessPool и освобождают слоты в _on_future_done.
+        """
+        if pool is not self._pool:
+            return  # уже заменён по другой задаче того же пула
+        results = self._results
+        self.stats.pool_restarts += 1
+        self._start_pool()
+        pool.shutdown(wait=False, cancel_futures=True)
+        # читатель старой очереди остановится, если она цела; иначе так и останется ждать (daemon)
+        results.put(None)
+
+    def close(self) -> None:
+        for job in list(self._jobs.values()):
+            self._cancel_job(job)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._results.put(None)
+        self._reader.join()
+
+    def _read_results(self, results) -> None:
+        while True:
+            message = results.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._on_message, *message)
+
+    def _on_message(self, job_id: int, kind: str, payload) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if job.finished:
+            # отменённая задача: ждём только последнего сообщения воркера, чтобы вернуть слот
+            if kind != _CHUNK:
+                self._release(job)
+            return
+        if kind == _CHUNK:
+            job.chunks.append(payload)
+        else:
+            if kind == _ERROR:
+                job.error = payload
+                self.stats.failed_jobs += 1
+            else:
+                self.stats.completed_jobs += 1
+            job.finished = True
+            self._release(job)
+        job.notify()
+
+    def _on_future_done(self, job: _Job, pool: ProcessPoolExecutor, future: Future) -> None:
+        # сбой пула (упавший процесс): сообщений из очереди уже не будет; обычное завершение приходит через неё
+        if future.cancelled() or future.exception() is None:
+            return
+        if isinstance(future.exception(), BrokenProcessPool):
+            self._restart_pool(pool)
+        if job.job_id not in self._jobs:
+            return
+        if not job.finished:
+            job.error = f"{type(future.exception()).__name__}: {future.exception()}"
+            job.finished = True
+            self.stats.failed_jobs += 1
+        self._release(job)
+        job.notify()
+
+    def _release(self, job: _Job) -> None:
+        self._jobs.pop(job.job_id, None)
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        self._cancel[job.slot] = 0
+        self._slots.append(job.slot)
+
+    def _cancel_job(self, job: _Job) -> None:
+        if job.finished:
+            return
+        job.finished = True
+        job.error = "cancelled"
+        self.stats.cancelled_jobs += 1
+        # новые такие же запросы запускают новую задачу, а не подписываются на отменённую
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        if job.future.cancel():
+            self._release(job)
+        else:
+            # воркер уже считает: остановится перед следующим кварталом и сообщит об этом,
+            # до тех пор слот занят — процесс пула ведь тоже занят
+            self._cancel[job.slot] = 1
+        job.notify()
+
+    def submit(self, config: CityConfig, seed: int, shared: bool) -> _Job:
+        """
+        Задача для (config, seed): уже идущая с тем же ключом или новая. Без свободного слота — 503.
+        """
+        key = layout_key(config, SeedTree(seed).entropy) if shared else None
+        if key is not None and key in self._inflight:
+            self.stats.deduplicated += 1
+            return self._inflight[key]
+        if not self._slots:
+            self.stats.rejected += 1
+            raise ServiceError(503, "сервис перегружен", {"Retry-After": "1"})
+        # слот забирается только после удачной постановки в пул
+        job = _Job(next(self._ids), key, self._slots[-1])
+        self._cancel[job.slot] = 0
+        pool = self._pool
+        try:
+            job.future = pool.submit(_stream_city, job.job_id, job.slot, config, seed)
+        except BrokenProcessPool:
+            # пул сломался раньше, чем об этом сообщили его задачи
+            self._restart_pool(pool)
+            raise ServiceError(503, "пул воркеров перезапускается", {"Retry-After": "1"}) from None
+        self._slots.pop()
+        job.future.add_done_callback(lambda future: self._loop.call_soon_threadsafe(self._on_future_done, job, pool, future))
+        self._jobs[job.job_id] = job
+        if key is not None:
+            self._inflight[key] = job
+        return job
+
+    # ---------- HTTP ----------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                raise ServiceError(400, "неверный запрос")
+            method, target, _version = parts
+            if method != "GET":
+                raise ServiceError(405, "поддерживается только GET", {"Allow": "GET"})
+            url = urlsplit(target)
+            if url.path == "/stats":
+                await self._send(writer, 200, json.dumps(self.stats_json()), "application/json")
+            elif url.path == "/city":
+                await self._city(url.query, writer)
+            else:
+                raise ServiceError(404, "нет такого пути")
+        except ServiceError as exc:
+            await self._send(writer, exc.status, json.dumps({"error": str(exc)}, ensure_ascii=False), "application/json", exc.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: str, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        data = body.encode()
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", f"Content-Length: {len(data)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+        await writer.drain()
+
+    async def _city(self, query: str, writer: asyncio.StreamWriter) -> None:
+        self.stats.requests += 1
+        start = time.perf_counter()
+        config, seed, shared, deadline = parse_request(query, self.config, self.max_blocks, self.max_nodes)
+        # срок из запроса может только сократить срок сервиса
+        expires = self._loop.time() + (min(deadline, self.deadline) if deadline is not None else self.deadline)
+        job = self.submit(config, seed, shared)
+        job.subscribers += 1
+        started = False
+        try:
+            sent = 0
+            while True:
+                while sent < len(job.chunks):
+                    if not started:
+                        writer.write(
+                            "HTTP/1.1 200 OK\r\nContent-Type: application/geo+json\r\nTransfer-Encoding: chunked\r\n"
+                            f"X-City-Seed: {seed}\r\nConnection: close\r\n\r\n".encode()
+                        )
+                        _write_chunk(writer, COLLECTION_HEADER)
+                        started = True
+                    _write_chunk(writer, (FEATURE_SEPARATOR if sent else "") + job.chunks[sent])
+                    sent += 1
+                    await asyncio.wait_for(writer.drain(), max(expires - self._loop.time(), 0))
+                if job.finished:
+                    break
+                await asyncio.wait_for(job.changed.wait(), max(expires - self._loop.time(), 0))
+            if job.error is not None:
+                if started:
+                    return  # обрыв без последнего chunk: клиент видит неполный ответ
+                raise ServiceError(500, job.error)
+            if not started:
+                raise ServiceError(500, "пустой город")
+            _write_chunk(writer, COLLECTION_FOOTER)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            self.stats.latencies.append(time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            self.stats.timed_out += 1
+            if not started:
+                raise ServiceError(504, "истёк срок запроса") from None
+        finally:
+            job.subscribers -= 1
+            if job.subscribers == 0 and not job.finished:
+                self._cancel_job(job)
+
+    def stats_json(self) -> Dict[str, object]:
+        ordered = sorted(self.stats.latencies[-1000:])
+        return {
+            "requests": self.stats.requests,
+            "deduplicated": self.stats.deduplicated,
+            "rejected": self.stats.rejected,
+            "timed_out": self.stats.timed_out,
+            "completed_jobs": self.stats.completed_jobs,
+            "cancelled_jobs": self.stats.cancelled_jobs,
+            "failed_jobs": self.stats.failed_jobs,
+            "pool_restarts": self.stats.pool_restarts,
+            "active_jobs": len(self._jobs),
+            "free_slots": len(self._slots),
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+        }
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def _write_chunk(writer: asyncio.StreamWriter, text: str) -> None:
+    data = text.encode()
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+async def serve(host: str, port: int, service: CityService) -> None:
+    service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"citygen: http://{host}:{port}/city, {service.workers} воркеров", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="процессов генерации")
+    parser.add_argument("--max-queue", type=int, default=16, help="задач сверх workers, ждущих воркера")
+    parser.add_argument("--deadline", type=float, default=30.0, help="срок запроса по умолчанию и наибольший, с")
+    parser.add_argument("--max-blocks", type=int, default=10_000, help="наибольший город в кварталах")
+    parser.add_argument("--max-nodes", type=int, default=200_000, help="наибольший город в узлах сетки")
+    args = parser.parse_args(argv)
+
+    service = CityService(args.workers, args.max_queue, args.deadline, args.max_blocks, args.max_nodes)
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
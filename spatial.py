@@ -0,0 +1,51 @@
+import math
+from collections import defaultdict
+from typing import DefaultDict, Iterator, List, Tuple
+
+from shapely.geometry.base import BaseGeometry
+
+Bounds = Tuple[float, float, float, float]
+
+
+class GridIndex:
+    """
+    Инкрементальный пространственный индекс: равномерная хеш-сетка по bbox геометрий.
+    Каждая геометрия регистрируется во всех ячейках, которые задевает её bbox,
+    поэтому запрос по окрестности возвращает всех кандидатов без пропусков.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.items: List[BaseGeometry] = []
+        self._cells: DefaultDict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _cell_range(self, bounds: Bounds) -> Iterator[Tuple[int, int]]:
+        min_x, min_y, max_x, max_y = bounds
+        size = self.cell_size
+        for cx in range(math.floor(min_x / size), math.floor(max_x / size) + 1):
+            for cy in range(math.floor(min_y / size), math.floor(max_y / size) + 1):
+                yield cx, cy
+
+    def insert(self, geom: BaseGeometry) -> int:
+        idx = len(self.items)
+        self.items.append(geom)
+        for key in self._cell_range(geom.bounds):
+            self._cells[key].append(idx)
+        return idx
+
+    def query(self, bounds: Bounds, margin: float = 0.0) -> List[BaseGeometry]:
+        """
+        Все геометрии, чей bbox может оказаться ближе margin к прямоугольнику bounds.
+        Порядок — порядок вставки.
+        """
+        min_x, min_y, max_x, max_y = bounds
+        expanded = (min_x - margin, min_y - margin, max_x + margin, max_y + margin)
+        found = set()
+        for key in self._cell_range(expanded):
+            bucket = self._cells.get(key)
+            if bucket:
+                found.update(bucket)
+        return [self.items[i] for i in sorted(found)]
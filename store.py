@@ -0,0 +1,244 @@
+"""
+Колоночное хранилище геометрии города.
+
+Каждый слой (дома, дороги кварталов, магистрали, контуры кварталов, парк, ответвления) хранится как
+один непрерывный массив координат float64, массивы смещений колец/геометрий и колонка
+номеров кварталов — отдельными .npy, которые открываются через np.load(mmap_mode="r").
+Объекты shapely создаются только при обращении к элементу, поэтому многогигабайтный
+город можно открыть, не загружая его в память.
+"""
+import json
+import os
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
+
+from .export import LAYER_TYPES, layout_layers, to_ragged
+from .models import Block, ChainedSequence, CityLayout
+
+META_FILE = "meta.json"
+
+
+class GeometryColumn(Sequence):
+    """
+    Ленивый список геометрий одного типа поверх ragged-массивов.
+    Срез возвращает такое же ленивое представление без копирования координат.
+    """
+
+    def __init__(
+        self,
+        geometry_type: shapely.GeometryType,
+        coords: np.ndarray,
+        offsets: Tuple[np.ndarray, ...],
+        start: int = 0,
+        stop: Optional[int] = None,
+    ):
+        self.geometry_type = geometry_type
+        self.coords = coords
+        self.offsets = offsets
+        self.start = start
+        self.stop = len(offsets[-1]) - 1 if stop is None else stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, item: Union[int, slice, Sequence[int], np.ndarray]):
+        if isinstance(item, (np.ndarray, list)):
+            return self._take(np.asarray(item, dtype=np.int64))
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return list(self.materialize())[item]
+            return GeometryColumn(self.geometry_type, self.coords, self.offsets, self.start + start, self.start + max(start, stop))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("индекс геометрии вне диапазона")
+        return self._build(self.start + item, self.start + item + 1)[0]
+
+    def __iter__(self) -> Iterator[BaseGeometry]:
+        # геометрии создаются пачками, чтобы не платить за вызов shapely на каждый объект
+        chunk = 4096
+        for chunk_start in range(self.start, self.stop, chunk):
+            yield from self._build(chunk_start, min(chunk_start + chunk, self.stop))
+
+    def materialize(self) -> np.ndarray:
+        """
+        Все геометрии среза разом — массив объектов shapely.
+        """
+        return self._build(self.start, self.stop)
+
+    def bounds(self, chunk: int = 65536) -> np.ndarray:
+        """
+        Прямоугольники (n, 4) геометрий среза прямо по массиву координат, без объектов shapely;
+        у пустых геометрий — NaN. Координаты читаются пачками по chunk геометрий.
+        """
+        out = np.full((len(self), 4), np.nan)
+        for chunk_start in range(self.start, self.stop, chunk):
+            lo, hi = self._coord_ranges(np.arange(chunk_start, min(chunk_start + chunk, self.stop)))
+            filled = hi > lo
+            if not filled.any():
+                continue
+            coords = np.asarray(self.coords[lo[0]:hi[-1]])
+            starts = lo[filled] - lo[0]
+            rows = out[chunk_start - self.start:chunk_start - self.start + len(lo)]
+            # отрезок reduceat тянется до начала следующей непустой геометрии: пустые координат не занимают
+            rows[filled, :2] = np.minimum.reduceat(coords, starts)
+            rows[filled, 2:] = np.maximum.reduceat(coords, starts)
+        return out
+
+    def _coord_ranges(self, geometries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Диапазоны [lo, hi) массива координат для геометрий с номерами geometries (от начала колонки).
+        """
+        geom_offsets = self.offsets[-1]
+        lo, hi = np.asarray(geom_offsets[geometries]), np.asarray(geom_offsets[geometries + 1])
+        if len(self.offsets) > 1:
+            lo, hi = np.asarray(self.offsets[0][lo]), np.asarray(self.offsets[0][hi])
+        return lo.astype(np.int64), hi.astype(np.int64)
+
+    def _take(self, items: np.ndarray) -> np.ndarray:
+        """
+        Геометрии с номерами items (внутри среза) одним вызовом shapely; читаются только их координаты.
+        """
+        if not len(items):
+            return np.empty(0, dtype=object)
+        items = np.where(items < 0, items + len(self), items)
+        if items.min() < 0 or items.max() >= len(self):
+            raise IndexError("индекс геометрии вне диапазона")
+        items = items + self.start
+        geom_offsets = self.offsets[-1]
+        parts_lo, parts_hi = np.asarray(geom_offsets[items]), np.asarray(geom_offsets[items + 1])
+        if len(self.offsets) == 1:
+            local = (_offsets(parts_hi - parts_lo),)
+            coords = np.asarray(self.coords[_ranges(parts_lo, parts_hi)])
+        else:
+            rings = _ranges(parts_lo, parts_hi)
+            ring_lo, ring_hi = np.asarray(self.offsets[0][rings]), np.asarray(self.offsets[0][rings + 1])
+            local = (_offsets(ring_hi - ring_lo), _offsets(parts_hi - parts_lo))
+            coords = np.asarray(self.coords[_ranges(ring_lo, ring_hi)])
+        return shapely.from_ragged_array(self.geometry_type, coords, local)
+
+    def _build(self, start: int, stop: int) -> np.ndarray:
+        if stop <= start:
+            return np.empty(0, dtype=object)
+        geom_offsets = np.asarray(self.offsets[-1][start:stop + 1])
+        if len(self.offsets) == 1:
+            lo, hi = geom_offsets[0], geom_offsets[-1]
+            local = (geom_offsets - lo,)
+        else:
+            ring_offsets = np.asarray(self.offsets[0][geom_offsets[0]:geom_offsets[-1] + 1])
+            lo, hi = ring_offsets[0], ring_offsets[-1]
+            local = (ring_offsets - lo, geom_offsets - geom_offsets[0])
+        coords = np.asarray(self.coords[lo:hi])
+        return shapely.from_ragged_array(self.geometry_type, coords, local)
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=out[1:])
+    return out
+
+
+def _ranges(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    Склеенные np.arange(lo[i], hi[i]) без цикла по i.
+    """
+    lengths = (hi - lo).astype(np.int64)
+    starts = _offsets(lengths)
+    return np.arange(starts[-1], dtype=np.int64) + np.repeat(lo.astype(np.int64) - starts[:-1], lengths)
+
+
+def save_store(layout: CityLayout, directory: str) -> None:
+    """
+    Раскладывает город по колонкам в каталог directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta: Dict[str, object] = {"layers": {}}
+    for name, (geometries, block_ids) in layout_layers(layout).items():
+        coords, offsets = to_ragged(geometries, LAYER_TYPES[name])
+        np.save(os.path.join(directory, f"{name}.coords.npy"), np.ascontiguousarray(coords, dtype=np.float64))
+        for level, offset in enumerate(offsets):
+            np.save(os.path.join(directory, f"{name}.offsets{level}.npy"), offset.astype(np.int64))
+        np.save(os.path.join(directory, f"{name}.block.npy"), np.asarray(block_ids, dtype=np.int32))
+        meta["layers"][name] = {"count": len(geometries), "levels": len(offsets)}
+
+    grids = [np.asarray(block.nodes, dtype=np.float64) for block in layout.blocks]
+    shapes = np.asarray([grid.shape[:2] for grid in grids], dtype=np.int64).reshape(-1, 2)
+    np.save(os.path.join(directory, "nodes.shapes.npy"), shapes)
+    np.save(os.path.join(directory, "nodes.coords.npy"), np.concatenate([g.reshape(-1, 2) for g in grids]) if grids else np.empty((0, 2)))
+    np.save(os.path.join(directory, "main_street_nodes.npy"), np.asarray(layout.main_street_nodes, dtype=np.float64).reshape(-1, 2))
+    meta["blocks"] = len(grids)
+    meta["main_street_roads"] = len(layout.main_street_roads)
+
+    with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+class ColumnarStore:
+    """
+    Открытое хранилище: колонки слоёв и их представление в виде CityLayout.
+    """
+
+    def __init__(self, directory: str, mmap: bool = True):
+        self.directory = directory
+        self._mmap_mode = "r" if mmap else None
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.columns: Dict[str, GeometryColumn] = {}
+        self.block_ids: Dict[str, np.ndarray] = {}
+        for name, info in self.meta["layers"].items():
+            offsets = tuple(self._load(f"{name}.offsets{level}") for level in range(info["levels"]))
+            self.columns[name] = GeometryColumn(LAYER_TYPES[name], self._load(f"{name}.coords"), offsets)
+            self.block_ids[name] = self._load(f"{name}.block")
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode=self._mmap_mode)
+
+    def block_slice(self, layer: str, block_id: int) -> GeometryColumn:
+        """
+        Геометрии слоя, принадлежащие кварталу; колонка кварталов отсортирована, поиск двоичный.
+        """
+        ids = self.block_ids[layer]
+        start, stop = np.searchsorted(ids, [block_id, block_id + 1])
+        return self.columns[layer][int(start):int(stop)]
+
+    def layout(self) -> CityLayout:
+        """
+        CityLayout поверх хранилища: дома и дороги кварталов — ленивые колонки,
+        узлы — представления memmap-массива, all_roads — цепочка колонок без копирования.
+        """
+        shapes = self._load("nodes.shapes")
+        node_coords = self._load("nodes.coords")
+        blocks: List[Block] = []
+        start = 0
+        for block_id, (rows, cols) in enumerate(np.asarray(shapes)):
+            grid = node_coords[start:start + rows * cols].reshape(rows, cols, 2)
+            start += rows * cols
+            blocks.append(
+                Block(
+                    nodes=grid,
+                    roads=self.block_slice("side_roads", block_id),
+                    houses=self.block_slice("houses", block_id),
+                )
+            )
+
+        main_roads = self.columns["main_roads"]
+        park = self.columns["park"]
+        return CityLayout(
+            main_street_nodes=[tuple(p) for p in np.asarray(self._load("main_street_nodes")).tolist()],
+            main_street_roads=main_roads[:self.meta["main_street_roads"]],
+            blocks=blocks,
+            park_polygon=park[0] if len(park) else Polygon(),
+            all_roads=ChainedSequence(self.columns["side_roads"], main_roads),
+            branches=self.columns["branches"] if "branches" in self.columns else [],
+        )
+
+
+def open_store(directory: str, mmap: bool = True) -> CityLayout:
+    return ColumnarStore(directory, mmap=mmap).layout()
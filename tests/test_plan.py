@@ -0,0 +1,26 @@
+import pytest
+from shapely.strtree import STRtree
+
+from ..block import BlockBuilder
+from ..city_border import get_city_border
+from ..config import CityConfig
+from ..plan import TiledPlan
+from ..rng import SeedTree
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_long_streets_keep_blocks_apart(seed, vectorized):
+    # на длинных магистралях внешние ряды не должны уезжать от своей улицы
+    config = CityConfig(TOPOLOGY="tiled", N_STREETS=2, BLOCKS_PER_STREET=40, SEED=seed, VECTORIZED_NODES=vectorized)
+    seeds = SeedTree(seed)
+    skeleton = TiledPlan(config, BlockBuilder(config, seeds), seeds).resolve()
+    outlines = [get_city_border(nodes) for _block_id, nodes in skeleton.blocks]
+
+    assert all(outline.is_valid for outline in outlines)
+    first, second = STRtree(outlines).query(outlines, predicate="intersects")
+    overlaps = [
+        (i, j) for i, j in zip(first, second)
+        if i < j and outlines[i].intersection(outlines[j]).area > 1e-6
+    ]
+    assert overlaps == []
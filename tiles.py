@@ -0,0 +1,288 @@
+"""
+Тайловая отрисовка больших городов (схема XYZ).
+
+Границы города вписываются в квадрат; на уровне z он делится на 2^z x 2^z тайлов,
+тайл (x, y) отсчитывается от левого верхнего угла, как в slippy map. Источник — колоночное
+хранилище (store.save_store): воркеры открывают его через mmap и один раз строят по слоям индекс
+прямоугольников (BoundsIndex, без объектов shapely); для тайла создаются только найденные им геометрии.
+
+Детализация зависит от масштаба: пока пиксель крупнее detail_resolution метров, вместо домов
+рисуются упрощённые контуры кварталов, а из дорог — только магистрали.
+
+Запуск: python -m citygen.tiles --store DIR --out DIR --zoom 0 6 --workers W
+"""
+import argparse
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import shapely
+
+from .render import HOUSE_COLOR, PARK_COLOR, ROAD_COLOR, split_coords
+from .store import ColumnarStore
+
+Tile = Tuple[int, int, int]  # (z, x, y)
+
+TILE_SIZE = 256
+DPI = 64
+BLOCK_COLOR = "#d9b99b"
+
+
+@dataclass
+class TileGrid:
+    """
+    Квадрат со стороной size и левым верхним углом (left, top), разбиваемый на тайлы.
+    """
+    left: float
+    top: float
+    size: float
+
+    @classmethod
+    def from_bounds(cls, bounds: Sequence[float], pad: float = 0.02) -> "TileGrid":
+        xmin, ymin, xmax, ymax = bounds
+        size = max(xmax - xmin, ymax - ymin) * (1 + 2 * pad)
+        cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+        return cls(left=cx - size / 2, top=cy + size / 2, size=size)
+
+    def tile_bounds(self, z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+        span = self.size / 2 ** z
+        left = self.left + x * span
+        top = self.top - y * span
+        return left, top - span, left + span, top
+
+    def resolution(self, z: int, tile_size: int = TILE_SIZE) -> float:
+        """
+        Метров на пиксель на уровне z.
+        """
+        return self.size / 2 ** z / tile_size
+
+    def covering(self, z: int, bounds: np.ndarray) -> Set[Tuple[int, int]]:
+        """
+        Тайлы уровня z, которые задевают хотя бы один прямоугольник из bounds (n, 4).
+        """
+        n = 2 ** z
+        span = self.size / n
+        x0 = np.clip(((bounds[:, 0] - self.left) // span).astype(np.int64), 0, n - 1)
+        x1 = np.clip(((bounds[:, 2] - self.left) // span).astype(np.int64), 0, n - 1)
+        y0 = np.clip(((self.top - bounds[:, 3]) // span).astype(np.int64), 0, n - 1)
+        y1 = np.clip(((self.top - bounds[:, 1]) // span).astype(np.int64), 0, n - 1)
+        tiles: Set[Tuple[int, int]] = set()
+        for ax0, ax1, ay0, ay1 in zip(x0.tolist(), x1.tolist(), y0.tolist(), y1.tolist()):
+            tiles.update((x, y) for x in range(ax0, ax1 + 1) for y in range(ay0, ay1 + 1))
+        return tiles
+
+
+class BoundsIndex:
+    """
+    Индекс прямоугольников (n, 4) на равномерной сетке не больше MAX_CELLS x MAX_CELLS ячеек.
+    Хранит только номера объектов по ячейкам (CSR: items и границы ячеек starts), сами геометрии
+    не нужны. Объект регистрируется во всех ячейках, которые задевает его прямоугольник.
+    """
+    MAX_CELLS = 512
+
+    def __init__(self, bounds: np.ndarray):
+        self.bounds = bounds
+        valid = np.flatnonzero(~np.isnan(bounds[:, 0]))
+        if not len(valid):
+            self.nx = self.ny = 0
+            return
+        b = bounds[valid]
+        self.origin = (b[:, 0].min(), b[:, 1].min())
+        extent = max(b[:, 2].max() - self.origin[0], b[:, 3].max() - self.origin[1])
+        # ячейка порядка типичного объекта, но сетка не больше MAX_CELLS по стороне
+        typical = float(np.median(np.maximum(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])))
+        self.cell = max(typical * 2, extent / self.MAX_CELLS, 1e-9)
+        self.nx = self.ny = min(int(extent / self.cell) + 1, self.MAX_CELLS)
+        i0, j0, i1, j1 = (self._cells(b[:, k], self.origin[k % 2]) for k in range(4))
+        widths = i1 - i0 + 1
+        counts = widths * (j1 - j0 + 1)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        local = np.arange(counts.sum()) - first
+        keys = (np.repeat(j0, counts) + local // np.repeat(widths, counts)) * self.nx + np.repeat(i0, counts) + local % np.repeat(widths, counts)
+        order = np.argsort(keys, kind="stable")
+        self.items = np.repeat(valid, counts)[order]
+        self.starts = np.searchsorted(keys[order], np.arange(self.nx * self.ny + 1))
+
+    def _cells(self, values: np.ndarray, origin: float) -> np.ndarray:
+        return np.clip(((values - origin) // self.cell).astype(np.int64), 0, self.nx - 1)
+
+    def query(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        """
+        Номера объектов, чей прямоугольник пересекает данный, по возрастанию.
+        """
+        if not self.nx:
+            return np.empty(0, dtype=np.int64)
+        i0, i1 = self._cells(np.array([xmin, xmax]), self.origin[0])
+        j0, j1 = self._cells(np.array([ymin, ymax]), self.origin[1])
+        # ячейки одной строки сетки идут в items подряд
+        parts = [self.items[self.starts[j * self.nx + i0]:self.starts[j * self.nx + i1 + 1]] for j in range(j0, j1 + 1)]
+        found = np.unique(np.concatenate(parts))
+        b = self.bounds[found]
+        return found[(b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)]
+
+
+class TileRenderer:
+    """
+    Рисует тайлы одного хранилища. Индекс слоя строится при первом обращении по одним
+    прямоугольникам из memmap-координат; геометрии создаются только для объектов тайла.
+    """
+
+    def __init__(self, store_dir: str, grid: TileGrid, tile_size: int = TILE_SIZE, detail_resolution: float = 4.0):
+        self.store = ColumnarStore(store_dir, mmap=True)
+        self.grid = grid
+        self.tile_size = tile_size
+        self.detail_resolution = detail_resolution
+        self._indexes: Dict[str, BoundsIndex] = {}
+
+    def _index(self, name: str) -> BoundsIndex:
+        if name not in self._indexes:
+            self._indexes[name] = BoundsIndex(self.store.columns[name].bounds())
+        return self._indexes[name]
+
+    def _query(self, name: str, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+        if name not in self.store.columns:
+            # хранилища, сохранённые до появления слоя ответвлений
+            return np.empty(0, dtype=object)
+        return self.store.columns[name][self._index(name).query(*bounds)]
+
+    def is_detailed(self, z: int) -> bool:
+        return self.grid.resolution(z, self.tile_size) <= self.detail_resolution
+
+    def render(self, tile: Tile, path: str) -> bool:
+        """
+        Рисует тайл в path. Возвращает False, если в тайл ничего не попало (файл не создаётся).
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection, PolyCollection
+        from matplotlib.figure import Figure
+
+        z, x, y = tile
+        box = self.grid.tile_bounds(z, x, y)
+        xmin, ymin, xmax, ymax = box
+        resolution = self.grid.resolution(z, self.tile_size)
+
+        park = self._query("park", box)
+        main_roads = self._query("main_roads", box)
+        if self.is_detailed(z):
+            areas = shapely.get_exterior_ring(self._query("houses", box))
+            lines = np.concatenate([self._query("side_roads", box), self._query("branches", box), main_roads])
+            area_color = HOUSE_COLOR
+        else:
+            # упрощение до размера пикселя: мельче всё равно не видно
+            areas = shapely.get_exterior_ring(shapely.simplify(self._query("blocks", box), resolution))
+            lines = shapely.simplify(main_roads, resolution)
+            area_color = BLOCK_COLOR
+        if not (len(park) or len(areas) or len(lines)):
+            return False
+
+        fig = Figure(figsize=(self.tile_size / DPI, self.tile_size / DPI), dpi=DPI)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        ax.set_axis_off()
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+        if len(park):
+            ax.add_collection(PolyCollection(split_coords(shapely.get_exterior_ring(park)), facecolors=PARK_COLOR, edgecolors="none", zorder=1))
+        ax.add_collection(PolyCollection(split_coords(areas), facecolors=area_color, edgecolors=ROAD_COLOR, linewidths=0.5, zorder=2))
+        ax.add_collection(LineCollection(split_coords(lines), colors=ROAD_COLOR, linewidths=1, zorder=3))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fig.savefig(path + ".tmp", format="png", transparent=True)
+        os.replace(path + ".tmp", path)
+        return True
+
+
+def tile_path(out_dir: str, tile: Tile) -> str:
+    z, x, y = tile
+    return os.path.join(out_dir, str(z), str(x), f"{y}.png")
+
+
+def footprint_bounds(store: ColumnarStore) -> np.ndarray:
+    """
+    Прямоугольники (n, 4) контуров кварталов, магистралей и парка — всего, что видно на карте.
+    """
+    bounds = np.concatenate([store.columns[name].bounds() for name in ("blocks", "main_roads", "park")])
+    return bounds[~np.isnan(bounds[:, 0])]
+
+
+def iter_tiles(grid: TileGrid, bounds: np.ndarray, zooms: Sequence[int]) -> Iterator[Tile]:
+    """
+    Непустые тайлы уровней zooms: те, что задевают хотя бы один прямоугольник из bounds.
+    """
+    for z in zooms:
+        for x, y in sorted(grid.covering(z, bounds)):
+            yield z, x, y
+
+
+# Состояние воркера пула: рендерер создаётся один раз в initializer
+_renderer: Optional[TileRenderer] = None
+
+
+def _init_worker(store_dir: str, grid: TileGrid, tile_size: int, detail_resolution: float) -> None:
+    global _renderer
+    _renderer = TileRenderer(store_dir, grid, tile_size, detail_resolution)
+
+
+def _render_chunk(tiles: List[Tile], out_dir: str) -> int:
+    return sum(_renderer.render(tile, tile_path(out_dir, tile)) for tile in tiles)
+
+
+def render_tiles(
+    store_dir: str,
+    out_dir: str,
+    zooms: Sequence[int],
+    workers: int = 1,
+    tile_size: int = TILE_SIZE,
+    detail_resolution: float = 4.0,
+    chunk: int = 32,
+) -> int:
+    """
+    Рисует все непустые тайлы уровней zooms в out_dir/z/x/y.png и пишет out_dir/tiles.json
+    с привязкой сетки. Возвращает число записанных тайлов.
+    """
+    bounds = footprint_bounds(ColumnarStore(store_dir, mmap=True))
+    grid = TileGrid.from_bounds((bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()))
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "tiles.json"), "w", encoding="utf-8") as f:
+        json.dump({"grid": asdict(grid), "zooms": list(zooms), "tile_size": tile_size}, f)
+
+    written = 0
+    max_in_flight = max(1, workers) * 2
+    tiles = iter_tiles(grid, bounds, zooms)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store_dir, grid, tile_size, detail_resolution)) as pool:
+        pending: Set[Future] = set()
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) < max_in_flight:
+                batch = [tile for _, tile in zip(range(chunk), tiles)]
+                if not batch:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_render_chunk, batch, out_dir))
+            if pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+    return written
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", required=True, help="каталог колоночного хранилища города")
+    parser.add_argument("--out", required=True, help="каталог тайлов")
+    parser.add_argument("--zoom", type=int, nargs=2, default=[0, 5], metavar=("MIN", "MAX"), help="диапазон уровней")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--detail-resolution", type=float, default=4.0, help="метров на пиксель, с которых рисуются дома")
+    args = parser.parse_args(argv)
+
+    zooms = range(args.zoom[0], args.zoom[1] + 1)
+    written = render_tiles(args.store, args.out, zooms, args.workers, args.tile_size, args.detail_resolution)
+    print(f"тайлов: {written}")
+
+
+if __name__ == "__main__":
+    main()